@@ -0,0 +1,268 @@
+"""
+Node-local cache shared by every gunicorn worker: a SQLite database in WAL mode.
+
+LocMemCache gives each worker its own copy of every cached sitemap and feed,
+and loses them all on restart. This backend keeps entries in one file on
+the local disk, so all workers on the node read and write the same entries
+and they survive a restart, without running a cache server.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': '/var/tmp/storefront-cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'MAX_BYTES': 256 * 1024 * 1024},
+    }}
+
+Eviction is LRU-ish: reads refresh an entry's access time (at most every
+TOUCH_INTERVAL seconds, to keep hits read-only) and the least recently used
+entries are culled whenever the entry count or total size passes its cap.
+Hit/miss counters are per process, shared by the backend instances Django
+creates for each thread; `stats()` adds the shared totals.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entries ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL, size INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)',
+)
+
+# Counters per cache file; `caches[alias]` is a new backend instance in every thread
+_lock = threading.Lock()
+_counters = {}
+
+
+def _counters_for(location):
+    with _lock:
+        return _counters.setdefault(location, {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'writes': 0})
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_bytes = int(options.get('MAX_BYTES', 256 * 1024 * 1024))
+        self.touch_interval = float(options.get('TOUCH_INTERVAL', 30))
+        # Checking the caps costs a COUNT/SUM scan; do it every N writes
+        self.cull_every = int(options.get('CULL_EVERY', 50))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+        self._counters = _counters_for(location)
+
+    # --- connection -------------------------------------------------------
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # Connections must never cross a fork: reopen in each worker
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def close(self, **kwargs):
+        # Keep the per-thread connection open across requests
+        pass
+
+    # --- helpers ----------------------------------------------------------
+
+    def _expiry(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        # Zero/negative timeouts store an already-expired entry
+        return time.time() + timeout if timeout > 0 else -1
+
+    def _count(self, name, amount=1):
+        with _lock:
+            self._counters[name] += amount
+
+    def _read(self, key, now):
+        row = self._connection().execute(
+            'SELECT value, expires, accessed FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            self._connection().execute('DELETE FROM cache_entries WHERE key = ? AND expires <= ?', (key, now))
+            return None
+        if now - accessed > self.touch_interval:
+            self._connection().execute('UPDATE cache_entries SET accessed = ? WHERE key = ?', (now, key))
+        return value
+
+    def _write(self, key, value, timeout, only_if_missing=False):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        expires = self._expiry(timeout)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if only_if_missing:
+                row = conn.execute('SELECT expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+                if row is not None and (row[0] is None or row[0] > now):
+                    conn.execute('COMMIT')
+                    return False
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)',
+                (key, blob, expires, now, len(blob) + len(key)),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._count('sets')
+        self._maybe_cull()
+        return True
+
+    def _maybe_cull(self):
+        with _lock:
+            self._counters['writes'] += 1
+            if self._counters['writes'] % self.cull_every:
+                return
+        self.cull()
+
+    def cull(self):
+        """Drop expired entries, then least recently used ones until both caps are met."""
+        conn = self._connection()
+        conn.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries').fetchone()
+        if count <= self._max_entries and total <= self.max_bytes:
+            return 0
+        # Trim below the caps (by 1/CULL_FREQUENCY of the entries) so we don't cull on every write
+        target_count = min(self._max_entries, count - count // max(self._cull_frequency, 1))
+        target_bytes = int(self.max_bytes * 0.9)
+        evicted = 0
+        rows = conn.execute('SELECT key, size FROM cache_entries ORDER BY accessed').fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= target_count and total <= target_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        conn.executemany('DELETE FROM cache_entries WHERE key = ?', doomed)
+        self._count('evictions', evicted)
+        return evicted
+
+    # --- BaseCache API ----------------------------------------------------
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        blob = self._read(key, time.time())
+        if blob is None:
+            self._count('misses')
+            return default
+        self._count('hits')
+        return pickle.loads(blob)
+
+    def get_many(self, keys, version=None):
+        """One query for all keys (the default implementation runs one per key)."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        now = time.time()
+        placeholders = ','.join('?' * len(key_map))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            (*key_map, now),
+        ).fetchall()
+        found = {key_map[key]: pickle.loads(value) for key, value in rows}
+        self._count('hits', len(found))
+        self._count('misses', len(keys) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._write(key, value, timeout, only_if_missing=True)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), now, key, now),
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache_entries WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Atomic across workers: the read-modify-write runs under SQLite's write lock."""
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            if row is None or (row[1] is not None and row[1] <= now):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            conn.execute(
+                'UPDATE cache_entries SET value = ?, accessed = ?, size = ? WHERE key = ?',
+                (blob, now, len(blob) + len(key), key),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+    # --- metrics ----------------------------------------------------------
+
+    def stats(self):
+        count, total = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries'
+        ).fetchone()
+        with _lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'backend': 'sqlite-wal',
+            'location': self.path,
+            'entries': count,
+            'bytes': total,
+            'max_entries': self._max_entries,
+            'max_bytes': self.max_bytes,
+            'hits': counters['hits'],
+            'misses': counters['misses'],
+            'hit_ratio': round(counters['hits'] / lookups, 3) if lookups else None,
+            'sets': counters['sets'],
+            'evictions': counters['evictions'],
+        }
@@ -1,10 +1,22 @@
 """Middleware to parse subdomain from request host and attach it to the request.
 
-Sets `request.subdomain` to a string (e.g. 'alice') or None for bare/root domains.
+Sets `request.subdomain` to a string (e.g. 'alice') or None for bare/root domains,
+and `request.tenant` to the matching business profile (or None).
+
+Hosts whose subdomain is confirmed not to be a shop are answered with a bare
+404 right here, before sessions, views or templates do any work.
 """
+import logging
 from typing import Optional
 
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+from django.utils.cache import add_never_cache_headers
+
+from storefront.tenants import registry, rejections
+from storefront.utils.identity_map import request_scope
+
+logger = logging.getLogger(__name__)
 
 
 class SubdomainMiddleware:
@@ -48,6 +60,63 @@ class SubdomainMiddleware:
 
         request.full_host = host
         request.subdomain = self._extract_subdomain(host)
+        request.tenant = None
+
+        if self._needs_tenant(request):
+            request.tenant = registry.resolve(request.subdomain)
+            if request.tenant is None and registry.is_missing(request.subdomain):
+                return self._reject(request)
 
         response = self.get_response(request)
         return response
+
+    def _needs_tenant(self, request):
+        if not request.subdomain:
+            return False
+        if request.subdomain in getattr(settings, 'TENANT_EXEMPT_SUBDOMAINS', ()):
+            return False
+        # Static assets are served by WhiteNoise further down and never need the shop
+        static_prefix = '/' + settings.STATIC_URL.lstrip('/')
+        return not request.path.startswith(static_prefix)
+
+    def _reject(self, request):
+        rejections.record(request.full_host.split(':')[0])
+        response = HttpResponseNotFound('Shop not found', content_type='text/plain')
+        # Let browsers/CDNs absorb repeat probes for as long as we cache the miss
+        response['Cache-Control'] = f'public, max-age={registry.negative_ttl}'
+        return response
+
+
+class IdentityMapMiddleware:
+    """Deduplicate identical upstream reads within one request (storefront/utils/identity_map.py).
+
+    The per-request counters are logged at DEBUG level and, with DEBUG on,
+    returned in the X-Upstream-Reads header.
+
+    Responses built from stale fallback data while a circuit breaker was
+    open (storefront/utils/circuit.py) are marked with `X-Served-Stale` and
+    not cached downstream. A 404/500 caused by an open breaker with no
+    fallback becomes a 503, so nothing treats the page as gone.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with request_scope() as memo:
+            request.identity_map = memo
+            response = self.get_response(request)
+
+        stats = memo.stats()
+        if stats['rejected'] and response.status_code in (404, 500):
+            response = HttpResponse('Service temporarily unavailable', status=503, content_type='text/plain')
+            response['Retry-After'] = str(settings.CIRCUIT_OPEN_SECONDS)
+        if stats['stale']:
+            response['X-Served-Stale'] = '1'
+        if stats['stale'] or stats['rejected']:
+            add_never_cache_headers(response)
+        if stats['reads']:
+            logger.debug("%s: %s upstream reads, %s deduplicated", request.path, stats['upstream'], stats['deduplicated'])
+            if settings.DEBUG:
+                response['X-Upstream-Reads'] = f"upstream={stats['upstream']}, deduplicated={stats['deduplicated']}"
+        return response
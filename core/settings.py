@@ -50,6 +50,65 @@ else:
 # Set the environment variable ALLOW_LOCALHOST_SUBDOMAINS to 'False' to disable.
 ALLOW_LOCALHOST_SUBDOMAINS = os.getenv('ALLOW_LOCALHOST_SUBDOMAINS', 'True').lower() in ('1', 'true', 'yes')
 
+# Shared secret for internal endpoints (/_internal/stats/). When empty they are only reachable with DEBUG on.
+INTERNAL_API_TOKEN = os.getenv('INTERNAL_API_TOKEN', '')
+
+# Tenant registry: how long (seconds) a resolved business profile is reused, and how many are kept per worker.
+TENANT_CACHE_TTL = int(os.getenv('TENANT_CACHE_TTL', '60'))
+TENANT_CACHE_MAX_ENTRIES = int(os.getenv('TENANT_CACHE_MAX_ENTRIES', '1000'))
+# Unknown subdomains are remembered (and rejected by SubdomainMiddleware) for this long, in a bounded store.
+TENANT_NEGATIVE_TTL = int(os.getenv('TENANT_NEGATIVE_TTL', '300'))
+TENANT_NEGATIVE_MAX_ENTRIES = int(os.getenv('TENANT_NEGATIVE_MAX_ENTRIES', '10000'))
+# Normalized component trees kept per worker (keyed by business id + version).
+COMPONENT_CACHE_MAX_ENTRIES = int(os.getenv('COMPONENT_CACHE_MAX_ENTRIES', '500'))
+# Subdomains that are never treated as shops (no lookup, no rejection).
+TENANT_EXEMPT_SUBDOMAINS = [s.strip() for s in os.getenv('TENANT_EXEMPT_SUBDOMAINS', 'www,static').split(',') if s.strip()]
+# Concurrent upstream queries inside a view (storefront/utils/fanout.py): threads per worker and per-query timeout (seconds).
+FANOUT_MAX_WORKERS = int(os.getenv('FANOUT_MAX_WORKERS', '8'))
+FANOUT_TIMEOUT = float(os.getenv('FANOUT_TIMEOUT', '10'))
+# Warn when a view/template reads a column its projection didn't select (storefront/projections.py).
+PROJECTION_CHECKS = os.getenv('PROJECTION_CHECKS', str(DEBUG)).lower() in ('1', 'true', 'yes')
+# Storefront product grid: products rendered with the page, and per 'load more' request.
+SHOP_PAGE_SIZE = int(os.getenv('SHOP_PAGE_SIZE', '48'))
+SHOP_MORE_PAGE_SIZE = int(os.getenv('SHOP_MORE_PAGE_SIZE', '24'))
+# Product review counts/averages via PostgREST aggregate functions (falls back to folding rows when disabled).
+REVIEW_AGGREGATES_SERVER_SIDE = os.getenv('REVIEW_AGGREGATES_SERVER_SIDE', 'True').lower() in ('1', 'true', 'yes')
+# Full-page cache for anonymous storefront views (storefront/utils/page_cache.py)
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+# Seconds a stale page is still served while one request rebuilds it.
+PAGE_CACHE_GRACE = int(os.getenv('PAGE_CACHE_GRACE', '600'))
+# Rebuild lock lifetime, and how long concurrent cold misses wait for the builder (seconds).
+PAGE_CACHE_LOCK_TIMEOUT = int(os.getenv('PAGE_CACHE_LOCK_TIMEOUT', '60'))
+PAGE_CACHE_LOCK_WAIT = float(os.getenv('PAGE_CACHE_LOCK_WAIT', '10'))
+# Mixed into page ETags (storefront/utils/conditional.py); set per release so template changes revalidate.
+PAGE_VERSION_SALT = os.getenv('RELEASE_VERSION', '')
+# Shared secret for the database change webhook (/_internal/cache/invalidate/). When empty it is only reachable with DEBUG on.
+CACHE_WEBHOOK_SECRET = os.getenv('CACHE_WEBHOOK_SECRET', '')
+# Cache warm-up (storefront/utils/warmup.py): shops primed, pages rendered at once, and the public host they're rendered under.
+# WARM_CACHES_ON_BOOT is read by gunicorn.conf.py to warm every worker as it starts.
+WARM_CACHES_LIMIT = int(os.getenv('WARM_CACHES_LIMIT', '50'))
+WARM_CACHES_CONCURRENCY = int(os.getenv('WARM_CACHES_CONCURRENCY', '4'))
+WARM_CACHES_HOST = os.getenv('WARM_CACHES_HOST', 'nexassearch.com')
+# Per-endpoint circuit breakers for Supabase calls (storefront/utils/circuit.py): open after this many
+# failures (errors, 5xx, calls slower than CIRCUIT_SLOW_CALL seconds) within CIRCUIT_WINDOW seconds.
+CIRCUIT_BREAKER_ENABLED = os.getenv('CIRCUIT_BREAKER_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_WINDOW = int(os.getenv('CIRCUIT_WINDOW', '30'))
+CIRCUIT_SLOW_CALL = float(os.getenv('CIRCUIT_SLOW_CALL', '2.0'))
+# Seconds an open breaker rejects calls before letting one trial through.
+CIRCUIT_OPEN_SECONDS = int(os.getenv('CIRCUIT_OPEN_SECONDS', '30'))
+# How long last-known-good answers are kept for serving while a breaker is open.
+CIRCUIT_FALLBACK_TTL = int(os.getenv('CIRCUIT_FALLBACK_TTL', str(60 * 60 * 24)))
+# Hedged reads (storefront/utils/hedging.py), opt-in per table, e.g. HEDGE_TABLES=posts,business_profiles.
+HEDGE_TABLES = {t.strip() for t in os.getenv('HEDGE_TABLES', '').split(',') if t.strip()}
+# Never wait less than this before hedging (seconds), however fast the observed p95 is.
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '0.05'))
+HEDGE_MAX_WORKERS = int(os.getenv('HEDGE_MAX_WORKERS', '8'))
+# Extra calls (hedges + retries) allowed per read, plus a floor per second for quiet periods.
+HEDGE_BUDGET_RATIO = float(os.getenv('HEDGE_BUDGET_RATIO', '0.1'))
+HEDGE_BUDGET_MIN_PER_SECOND = float(os.getenv('HEDGE_BUDGET_MIN_PER_SECOND', '1'))
+
 
 # Application definition
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -66,6 +125,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
+    'core.middleware.IdentityMapMiddleware',
     'core.middleware.SubdomainMiddleware',    
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -140,6 +200,19 @@ DATABASES = {
     }
 }
 
+# Cache shared by all gunicorn workers on the node (SQLite in WAL mode, see core/cache.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache' / 'cache.sqlite3')),
+        'TIMEOUT': int(os.getenv('CACHE_DEFAULT_TIMEOUT', '300')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '20000')),
+            'MAX_BYTES': int(os.getenv('CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+        },
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
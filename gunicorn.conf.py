@@ -0,0 +1,13 @@
+"""
+gunicorn settings picked up automatically from the working directory.
+
+Workers, bind address and the rest stay on the command line (see Procfile).
+"""
+import os
+
+
+def post_worker_init(worker):
+    # Prime caches in each freshly started worker (storefront/utils/warmup.py)
+    if os.getenv('WARM_CACHES_ON_BOOT', 'False').lower() in ('1', 'true', 'yes'):
+        from storefront.utils.warmup import warm_in_background
+        warm_in_background()
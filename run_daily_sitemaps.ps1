@@ -1,4 +1,4 @@
-# Run daily sitemap generation and ping Google
+# Run daily sitemap generation and ping Google, plus the full rating aggregate refresh
 $ErrorActionPreference = 'Stop'
 
 Write-Host "Running sitemap generation: $(Get-Date)"
@@ -11,6 +11,12 @@ $python = if (Test-Path $venvPython) { $venvPython } else { 'python' }
 
 Push-Location $projectDir
 
+# Full rating refresh: picks up review edits and deletes the incremental runs miss
+& $python manage.py update_rating_aggregates --full
+if ($LASTEXITCODE -ne 0) {
+    Write-Host "Rating aggregate refresh failed with exit code $LASTEXITCODE" -ForegroundColor Yellow
+}
+
 # Run generator
 & $python run_sitemap_generation.py
 $exit = $LASTEXITCODE
@@ -22,14 +28,16 @@ if ($exit -ne 0) {
 
 Write-Host "Sitemap generation completed successfully." -ForegroundColor Green
 
-# Ping Google to notify of new sitemap
-$sitemapUrl = 'https://static.nexassearch.com/static/sitemaps/sitemap_index.xml'
-try {
-    Write-Host "Pinging Google for sitemap: $sitemapUrl"
-    $resp = Invoke-WebRequest -Uri "https://www.google.com/ping?sitemap=$([System.Uri]::EscapeDataString($sitemapUrl))" -UseBasicParsing -Method Get -TimeoutSec 30
-    Write-Host "Google ping response status: $($resp.StatusCode)"
-} catch {
-    Write-Host "Google ping failed: $($_.Exception.Message)" -ForegroundColor Yellow
+# Ping Google to notify of new sitemaps (sitemap_index_<n>.xml continue the index past 50,000 entries)
+foreach ($index in Get-ChildItem -Path "storefront\static\sitemaps" -Filter "sitemap_index*.xml") {
+    $sitemapUrl = "https://static.nexassearch.com/static/sitemaps/$($index.Name)"
+    try {
+        Write-Host "Pinging Google for sitemap: $sitemapUrl"
+        $resp = Invoke-WebRequest -Uri "https://www.google.com/ping?sitemap=$([System.Uri]::EscapeDataString($sitemapUrl))" -UseBasicParsing -Method Get -TimeoutSec 30
+        Write-Host "Google ping response status: $($resp.StatusCode)"
+    } catch {
+        Write-Host "Google ping failed: $($_.Exception.Message)" -ForegroundColor Yellow
+    }
 }
 
 Pop-Location
@@ -3,3 +3,19 @@ from django.apps import AppConfig
 
 class StorefrontConfig(AppConfig):
     name = 'storefront'
+
+    def ready(self):
+        from .tenants import tenant_invalidated
+        from .utils.component_cache import component_cache
+        from .utils.page_cache import purge_tenant
+
+        def _drop_component_tree(sender, business_id=None, **kwargs):
+            if business_id:
+                component_cache.invalidate(business_id)
+
+        def _purge_pages(sender, business_id=None, **kwargs):
+            if business_id:
+                purge_tenant(business_id)
+
+        tenant_invalidated.connect(_drop_component_tree, weak=False, dispatch_uid='storefront.component_cache')
+        tenant_invalidated.connect(_purge_pages, weak=False, dispatch_uid='storefront.page_cache')
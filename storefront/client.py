@@ -1,7 +1,18 @@
 import os
+import logging
+import threading
+import time
 from pathlib import Path
+
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+
+from .utils.circuit import (
+    FALLBACK_TABLES, CircuitOpenError, breakers_enabled, get_breaker, last_known_good, remember,
+)
+from .utils.hedging import hedged_call, hedging_enabled
+from .utils.identity_map import MEMO_PATH_PREFIX, current_map, request_key
 
 # Build paths inside the project like this: BASE_DIR / '.env'
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -10,17 +21,288 @@ env_path = BASE_DIR / '.env'
 # Force load the .env file
 load_dotenv(dotenv_path=env_path)
 
-def get_supabase_client() -> Client:
+logger = logging.getLogger(__name__)
+
+# Connection pool tuning (per gunicorn worker). All values can be overridden
+# from the environment without touching code.
+POOL_MAX_CONNECTIONS = int(os.getenv('SUPABASE_POOL_MAX_CONNECTIONS', '20'))
+POOL_MAX_KEEPALIVE = int(os.getenv('SUPABASE_POOL_MAX_KEEPALIVE', '10'))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv('SUPABASE_POOL_KEEPALIVE_EXPIRY', '30'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('SUPABASE_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.getenv('SUPABASE_READ_TIMEOUT', '15'))
+HTTP_POOL_TIMEOUT = float(os.getenv('SUPABASE_POOL_TIMEOUT', '5'))
+HTTP2_ENABLED = os.getenv('SUPABASE_HTTP2', 'True').lower() in ('1', 'true', 'yes')
+
+_lock = threading.Lock()
+_client = None
+_http_client = None
+_owner_pid = None
+_counters = {'requests': 0, 'connections_opened': 0, 'clients_created': 0, 'deduplicated': 0}
+
+
+def _get_credentials():
     # Now we read from the environment variables securely
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_KEY")
-    
+
     if not url or not key:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.debug("Looking for .env at: %s", env_path)
         logger.debug("URL found? %s", url is not None)
         logger.debug("Key found? %s", key is not None)
         raise ValueError("Supabase URL or Key is missing in .env file")
 
-    return create_client(url, key)
\ No newline at end of file
+    return url, key
+
+
+def _http2_available():
+    """HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it."""
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _count(name):
+    # Transport hooks run on every thread sharing the pool (fan_out, hedging)
+    with _lock:
+        _counters[name] += 1
+
+
+def _trace(event_name, info):
+    # httpcore emits this once per freshly dialled TCP connection, so every
+    # request that doesn't trigger it rode on a pooled keep-alive connection.
+    if event_name == 'connection.connect_tcp.complete':
+        _count('connections_opened')
+
+
+def _on_request(request):
+    _count('requests')
+    request.extensions['trace'] = _trace
+
+
+class UpstreamTransport(httpx.HTTPTransport):
+    """
+    Pooled transport of the shared data client. PostgREST calls are guarded
+    by a circuit breaker per table or RPC endpoint, with a fallback to
+    last-known-good data (utils/circuit.py), repeated reads are answered
+    from the request's identity map (utils/identity_map.py), and reads of
+    HEDGE_TABLES are hedged (utils/hedging.py).
+    """
+
+    def handle_request(self, request):
+        path = request.url.path
+        if not path.startswith(MEMO_PATH_PREFIX):
+            return self._send(request)
+        endpoint = path[len(MEMO_PATH_PREFIX):].strip('/')
+        memo = current_map()
+
+        if request.method not in ('GET', 'HEAD'):
+            if memo is not None:
+                memo.clear()
+            return self._write(request, endpoint)
+
+        key = request_key(request)
+        entry = memo.get(key) if memo is not None else None
+        if entry is not None:
+            _count('deduplicated')
+            return self._response(request, entry)
+
+        entry = self._read(request, endpoint, key)
+        if memo is not None and 200 <= entry[0] < 300:
+            memo.put(key, entry)
+        return self._response(request, entry)
+
+    def _send(self, request):
+        _on_request(request)
+        return super().handle_request(request)
+
+    def _write(self, request, endpoint):
+        if not breakers_enabled():
+            return self._send(request)
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            return self._fallback(request, endpoint, None)
+        started = time.monotonic()
+        try:
+            response = self._send(request)
+        except httpx.TransportError:
+            breaker.record(failed=True)
+            raise
+        breaker.record(time.monotonic() - started, failed=response.status_code >= 500)
+        return response
+
+    def _read(self, request, endpoint, key):
+        """`(status, headers, content)` of a read, from upstream or its fallback."""
+        if not breakers_enabled():
+            return self._fetch_read(request, endpoint)
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            return self._fallback(request, endpoint, key)
+        started = time.monotonic()
+        try:
+            entry = self._fetch_read(request, endpoint, may_amplify=lambda: breaker.state == 'closed')
+        except httpx.TransportError as e:
+            breaker.record(failed=True)
+            return self._fallback(request, endpoint, key, error=e)
+        failed = entry[0] >= 500
+        breaker.record(time.monotonic() - started, failed=failed)
+        if failed:
+            return self._fallback(request, endpoint, key, upstream_entry=entry)
+        if 200 <= entry[0] < 300 and endpoint.split('/')[0] in FALLBACK_TABLES:
+            remember(key, entry)
+        return entry
+
+    def _fetch_read(self, request, endpoint, may_amplify=lambda: True):
+        if hedging_enabled(endpoint):
+            return hedged_call(lambda: self._fetch(request), endpoint, may_amplify)
+        return self._fetch(request)
+
+    def _fetch(self, request):
+        response = self._send(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        # read() decoded the body, so it is replayed without its transfer headers
+        headers = [(k, v) for k, v in response.headers.multi_items()
+                   if k.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')]
+        return response.status_code, headers, content
+
+    def _fallback(self, request, endpoint, key, error=None, upstream_entry=None):
+        """
+        The last-known-good answer for `key`; otherwise fail fast (or pass the upstream error on).
+
+        Only inside a request scope, which records that the answer is stale;
+        elsewhere (scripts, jobs) nothing would, so the error is raised.
+        """
+        memo = current_map()
+        entry = None
+        if memo is not None and key is not None and endpoint.split('/')[0] in FALLBACK_TABLES:
+            entry = last_known_good(key)
+        if entry is not None:
+            memo.mark_stale()
+            status_code, headers, content = entry
+            return status_code, headers + [('x-stale-fallback', '1')], content
+        if upstream_entry is not None:
+            return upstream_entry
+        if error is not None:
+            raise error
+        if memo is not None:
+            memo.mark_rejected()
+        raise CircuitOpenError(f"Circuit open for {endpoint}", request=request)
+
+    @staticmethod
+    def _response(request, entry):
+        status_code, headers, content = entry
+        return httpx.Response(status_code, headers=headers, content=content, request=request)
+
+
+def _build_http_client():
+    transport = UpstreamTransport(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(
+            HTTP_READ_TIMEOUT,
+            connect=HTTP_CONNECT_TIMEOUT,
+            pool=HTTP_POOL_TIMEOUT,
+        ),
+        follow_redirects=True,
+    )
+
+
+def _reset_after_fork():
+    """
+    Drop the inherited client in a forked child (gunicorn workers).
+    Sockets must never be shared between processes, so the child builds its own pool.
+    """
+    global _client, _http_client, _owner_pid, _lock
+    _client = None
+    _http_client = None
+    _owner_pid = None
+    _lock = threading.Lock()
+    _counters.update(requests=0, connections_opened=0, clients_created=0, deduplicated=0)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_supabase_client() -> Client:
+    """
+    Return the process-wide Supabase client.
+
+    The client is built once per worker process and shares a keep-alive
+    connection pool, so views no longer pay for client construction and
+    fresh TCP/TLS handshakes on every call. Do not use it for `.auth`
+    sign-in flows: those mutate client session state, see
+    `get_supabase_auth_client()`.
+    """
+    global _client, _http_client, _owner_pid
+
+    pid = os.getpid()
+    if _client is not None and _owner_pid == pid:
+        return _client
+
+    url, key = _get_credentials()
+    with _lock:
+        if _client is None or _owner_pid != pid:
+            _http_client = _build_http_client()
+            _client = create_client(url, key, options=ClientOptions(httpx_client=_http_client))
+            _owner_pid = pid
+            _counters['clients_created'] += 1
+            logger.info(
+                "Supabase client pool created (pid=%s, max_connections=%s, http2=%s)",
+                pid, POOL_MAX_CONNECTIONS, _http2_available(),
+            )
+    return _client
+
+
+def get_supabase_auth_client() -> Client:
+    """
+    Return a fresh, unshared Supabase client for auth flows (sign in/up, OAuth, get_user).
+
+    Signing in stores the user's session on the client and switches its
+    Authorization header, which must never leak into the shared data client.
+    """
+    url, key = _get_credentials()
+    return create_client(url, key)
+
+
+def get_pool_stats():
+    """Snapshot of the shared connection pool for this worker."""
+    stats = {
+        'pid': os.getpid(),
+        'http2': _http2_available(),
+        'max_connections': POOL_MAX_CONNECTIONS,
+        'max_keepalive': POOL_MAX_KEEPALIVE,
+        'clients_created': _counters['clients_created'],
+        'requests': _counters['requests'],
+        'deduplicated': _counters['deduplicated'],
+        'connections_opened': _counters['connections_opened'],
+        'connections_reused': max(_counters['requests'] - _counters['connections_opened'], 0),
+        'connections_open': 0,
+        'connections_idle': 0,
+        'requests_waiting': 0,
+    }
+
+    pool = getattr(getattr(_http_client, '_transport', None), '_pool', None)
+    if pool is not None:
+        try:
+            connections = list(pool.connections)
+            stats['connections_open'] = len(connections)
+            stats['connections_idle'] = sum(1 for c in connections if c.is_idle())
+            stats['requests_waiting'] = sum(1 for r in list(getattr(pool, '_requests', [])) if r.is_queued())
+        except Exception as e:
+            logger.debug("Could not inspect Supabase connection pool: %s", e)
+
+    return stats
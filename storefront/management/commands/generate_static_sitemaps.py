@@ -1,14 +1,69 @@
 import os
+import re
 import logging
 import json
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
 from django.core.management.base import BaseCommand
-from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 from storefront.client import get_supabase_client
+from storefront.projections import PRODUCT_SITEMAP, PRODUCT_SITEMAP_SCAN
+from storefront.utils.circuit import breakers_bypassed
+from storefront.utils.pagination import scan
+from storefront.utils.product_cards import data_value, product_image_urls
+from storefront.utils.sitemap_xml import MAX_SITEMAPS, ShardedSitemap, save_gzip_index, write_sitemap_index
 
 logger = logging.getLogger(__name__)
 
+# Files this command owns: `<domain>_sitemap.xml.gz` (per-business index) and
+# `<domain>_sitemap_<n>.xml.gz` shards; plain `<domain>_sitemap.xml` is the old layout
+SITEMAP_FILE = re.compile(r'^(?P<domain>.+)_sitemap(?:_\d+)?\.xml(?:\.gz)?$')
+
+# The master index, continued in `sitemap_index_<n>.xml` past MAX_SITEMAPS entries
+MASTER_INDEX_FILE = re.compile(r'^sitemap_index(?:_(?P<number>\d+))?\.xml$')
+
+# Posts updated this long before the last run are re-checked (clock skew, in-flight writes)
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# Business ids per `in.()` filter when an incremental --bulk run scans only the changed ones
+BULK_ID_BATCH = 100
+
+
+class BusinessTimeout(Exception):
+    pass
+
+
+def _timestamp(value):
+    try:
+        return parse_datetime(value) if value else None
+    except ValueError:
+        return None
+
+
+def master_index_name(number):
+    return 'sitemap_index.xml' if number == 1 else f'sitemap_index_{number}.xml'
+
+
+def shard_url(domain, number):
+    """Public URL of a business's sitemap shard (served by sitemap_static.sitemap_shard)."""
+    return f"https://{domain}.nexassearch.com/sitemap-{number}.xml"
+
+
+def _latest(current, candidate):
+    """The later of two ISO timestamps (either may be None)."""
+    if not candidate:
+        return current
+    if not current:
+        return candidate
+    a, b = _timestamp(current), _timestamp(candidate)
+    if a is None or b is None:
+        return candidate if b is not None else current
+    return candidate if b > a else current
+
 
 class Command(BaseCommand):
     help = 'Generate static XML sitemap files for all  businesses (production-grade)'
@@ -25,10 +80,56 @@ class Command(BaseCommand):
             action='store_true',
             help='Show detailed output',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Businesses generated concurrently (upstream fetch + render + write overlap)',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=120,
+            help='Seconds one business may take before it is counted as failed',
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Read every business\'s posts in one keyset scan instead of one query per business',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=1000,
+            help='Rows per upstream page (businesses and posts)',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the watermark and regenerate every business',
+        )
+        parser.add_argument(
+            '--watermark-file',
+            type=str,
+            default='storefront/data/sitemap_watermark.json',
+            help='Where the last run time and each business\'s newest post time are kept between runs',
+        )
 
     def handle(self, *args, **options):
+        # Straight to upstream: a failed read fails the run instead of feeding it
+        # last-known-good data, and long scans don't trip the breakers
+        with breakers_bypassed():
+            self._generate(**options)
+
+    def _generate(self, **options):
         output_dir = options['output_dir']
         verbose = options['verbose']
+        workers = max(1, options['workers'])
+        timeout = options['timeout']
+        bulk = options['bulk']
+        page_size = max(1, options['page_size'])
+        watermark_file = options['watermark_file']
+        started = time.monotonic()
         
         # Create output directory
         os.makedirs(output_dir, exist_ok=True)
@@ -48,16 +149,18 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS('✅ Generated empty sitemap index and metadata'))
             return
 
-        # Step 1: Fetch all published businesses
+        # Step 1: Fetch all published businesses (keyset pages, no row cap)
         self.stdout.write('📦 Fetching published businesses...')
-        biz_response = supabase.table('business_profiles')\
-            .select('id,domain,business_name,created_at,logo_url')\
-            .eq('status', 'active')\
-            .order('created_at', desc=True)\
-            .limit(50000)\
-            .execute()
-
-        businesses = getattr(biz_response, 'data', []) or []
+        businesses = [
+            business
+            for rows in scan(
+                lambda: supabase.table('business_profiles')
+                .select('id,domain,business_name,created_at,logo_url')
+                .eq('status', 'active'),
+                ('id',), page_size,
+            )
+            for business in rows
+        ]
         business_count = len(businesses)
 
         if business_count == 0:
@@ -68,45 +171,82 @@ class Command(BaseCommand):
 
         self.stdout.write(f'✅ Found {business_count} published businesses')
 
-        # Step 2: Generate master sitemap index
-        self.stdout.write('\n📋 Generating master sitemap index...')
-        self._generate_sitemap_index(supabase, businesses, output_dir, verbose)
-        self.stdout.write(f'✅ Saved: {output_dir}/sitemap_index.xml')
+        # Step 2: Pick the businesses that changed since the last run, drop the ones that are gone
+        run_started = datetime.now(timezone.utc)
+        watermark = None if options['full'] else self._load_watermark(watermark_file)
+        if watermark is None:
+            targets = businesses
+            self.stdout.write('\n🔁 Full rebuild' + (' (--full)' if options['full'] else ' (no watermark yet)'))
+        else:
+            targets = self._changed_businesses(supabase, businesses, watermark, output_dir, page_size)
+            self.stdout.write(
+                f"\n🔁 Incremental: {len(targets)} of {business_count} businesses changed "
+                f"since {watermark['generated_at']}"
+            )
+        removed_count = self._remove_orphans(businesses, output_dir, verbose)
 
         # Step 3: Generate individual business sitemaps
-        self.stdout.write(f'\n🏪 Generating {business_count} business sitemaps...')
+        target_count = len(targets)
+        if bulk:
+            self.stdout.write(f'\n🏪 Generating {target_count} business sitemaps (bulk posts scan)...')
+            results = self._generate_bulk(supabase, targets, output_dir, page_size,
+                                          restrict=target_count < business_count)
+        else:
+            self.stdout.write(f'\n🏪 Generating {target_count} business sitemaps ({workers} worker(s))...')
+            results = self._generate_all(supabase, targets, output_dir, workers, timeout, page_size)
         success_count = 0
         error_count = 0
+        generated = {}
+        failed = set()
 
-        for idx, business in enumerate(businesses, 1):
-            try:
-                self._generate_business_sitemap(
-                    supabase, business, output_dir, verbose
-                )
+        for idx, (business, result, error) in enumerate(results, 1):
+            domain = business.get('domain') if isinstance(business, dict) else str(business)
+            if error is None:
                 success_count += 1
-
-                # Show progress every 100 businesses
-                if idx % 100 == 0:
-                    self.stdout.write(f'  Progress: {idx}/{business_count} ✓')
-
-            except Exception as e:
+                generated[str(business['id'])] = result
+                if verbose:
+                    url_count, product_count, _, shards = result
+                    self.stdout.write(f'  ✓ {domain}: {url_count} URLs ({product_count} products, {shards} file(s))')
+            else:
                 error_count += 1
-                domain = business.get('domain') if isinstance(business, dict) else str(business)
+                failed.add(str(business['id']))
                 logger.error(
-                    f'Error generating sitemap for {domain}: {str(e)}'
+                    f'Error generating sitemap for {domain}: {str(error)}'
                 )
                 if verbose:
                     self.stdout.write(
-                        self.style.ERROR(f'  ❌ {domain}: {str(e)}')
+                        self.style.ERROR(f'  ❌ {domain}: {str(error)}')
                     )
-            
-        # Step 4: Generate summary report
+
+            # Show progress every 100 businesses
+            if idx % 100 == 0:
+                self.stdout.write(f'  Progress: {idx}/{target_count} ✓')
+
+        entries = self._save_watermark(watermark_file, run_started, businesses, watermark, generated, failed)
+
+        # Step 4: Generate master sitemap index (it lists every shard, so it comes last)
+        self.stdout.write('\n📋 Generating master sitemap index...')
+        index_files = self._generate_sitemap_index(supabase, businesses, output_dir, verbose, entries)
+        self.stdout.write(f'✅ Saved: {output_dir}/sitemap_index.xml')
+        if index_files > 1:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ Index split into {index_files} files: submit '
+                f'{", ".join(master_index_name(n) for n in range(2, index_files + 1))} too'
+            ))
+
+        # Step 5: Generate summary report
         self.stdout.write('\n' + '='*60)
         self.stdout.write(self.style.SUCCESS('✅ SITEMAP GENERATION COMPLETE'))
         self.stdout.write('='*60)
         self.stdout.write(f'Businesses processed: {business_count}')
         self.stdout.write(f'  ✅ Successful: {success_count}')
         self.stdout.write(f'  ❌ Failed: {error_count}')
+        self.stdout.write(f'  ⏭️ Unchanged: {business_count - target_count}')
+        self.stdout.write(f'  🗑️ Removed: {removed_count}')
+        if bulk:
+            self.stdout.write(f'Duration: {time.monotonic() - started:.1f}s (bulk scan)')
+        else:
+            self.stdout.write(f'Duration: {time.monotonic() - started:.1f}s with {workers} worker(s)')
         self.stdout.write(f'\nSitemaps location: {output_dir}')
         self.stdout.write(f'Master index: {output_dir}/sitemap_index.xml')
         self.stdout.write(f'\nNext step: Deploy to production server')
@@ -114,125 +254,416 @@ class Command(BaseCommand):
         self.stdout.write('='*60 + '\n')
 
         # Save metadata
-        self._save_metadata(output_dir, business_count, success_count, error_count)
-        self.stdout.write('📊 Metadata saved to sitemaps_metadata.json')
+        self._save_metadata(output_dir, business_count, success_count, error_count,
+                            workers=1 if bulk else workers, duration=time.monotonic() - started,
+                            mode='bulk' if bulk else 'per_business', incremental=watermark is not None,
+                            unchanged=business_count - target_count, removed=removed_count)
+        self.stdout.write('📊 Metadata saved to metadata.json')
 
-    def _generate_sitemap_index(self, supabase, businesses, output_dir, verbose):
-        """Generate master sitemap_index.xml listing all businesses."""
+    def _generate_all(self, supabase, businesses, output_dir, workers, timeout, page_size=1000):
+        """
+        Yield `(business, result, error)` for every business, in input order.
+
+        With more than one worker the businesses run on a bounded thread pool,
+        so one business's upstream fetch overlaps another's render and write.
+        A business still running `timeout` seconds after it started is
+        reported as failed; it stops at its next checkpoint without writing.
+        """
+        if workers == 1:
+            for business in businesses:
+                try:
+                    deadline = time.monotonic() + timeout
+                    result = self._generate_business_sitemap(supabase, business, output_dir, deadline, page_size=page_size)
+                    yield business, result, None
+                except Exception as e:
+                    yield business, None, e
+            return
+
+        started_at = {}
+        abandoned = set()
+        lock = threading.Lock()
+
+        def run(idx, business):
+            with lock:
+                started_at[idx] = time.monotonic()
+            deadline = started_at[idx] + timeout
+            return self._generate_business_sitemap(
+                supabase, business, output_dir, deadline, abandoned=lambda: idx in abandoned, page_size=page_size,
+            )
+
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sitemap')
         try:
-            sitemaps = []
-            # Use the origin per-subdomain sitemap URL (dynamic endpoint) as the primary
-            # reference so newly-created businesses are discoverable immediately.
+            futures = [pool.submit(run, idx, business) for idx, business in enumerate(businesses)]
+            for idx, (business, future) in enumerate(zip(businesses, futures)):
+                while True:
+                    done, _ = wait([future], timeout=min(1, timeout))
+                    if done:
+                        break
+                    with lock:
+                        running_for = time.monotonic() - started_at.get(idx, time.monotonic())
+                    if running_for > timeout:
+                        abandoned.add(idx)
+                        break
+                if idx in abandoned:
+                    yield business, None, BusinessTimeout(f'timed out after {timeout:g}s')
+                    continue
+                try:
+                    yield business, future.result(), None
+                except Exception as e:
+                    yield business, None, e
+        finally:
+            # Don't wait for abandoned businesses: they stop at their next checkpoint
+            pool.shutdown(wait=not abandoned, cancel_futures=True)
+
+    def _generate_bulk(self, supabase, businesses, output_dir, page_size, restrict=False):
+        """
+        Yield `(business, result, error)` for every business from one posts scan.
+
+        Posts of all businesses are read in `(business_id, id)` order, one page
+        at a time, so upstream round trips grow with the number of posts rather
+        than the number of businesses. Each business's sitemap is streamed to
+        disk while the scan passes its posts and committed once it moves on,
+        so only one page is held in memory; businesses without posts follow,
+        in input order. If the scan fails, the businesses it hadn't finished
+        are reported as failed and their files are left untouched.
+
+        With `restrict` (an incremental run) only the posts of `businesses`
+        are read, BULK_ID_BATCH business ids per scan, instead of every post.
+        """
+        by_id = {str(business['id']): business for business in businesses}
+        finished = set()
+        current_id, sitemap, post_count, last_updated = None, None, 0, None
+        scan_error = None
+
+        def pages():
+            if not restrict:
+                yield from scan(
+                    lambda: supabase.table('posts').select(PRODUCT_SITEMAP_SCAN),
+                    ('business_id', 'id'), page_size,
+                )
+                return
+            ids = sorted(by_id)
+            for start in range(0, len(ids), BULK_ID_BATCH):
+                batch = ids[start:start + BULK_ID_BATCH]
+                yield from scan(
+                    lambda: supabase.table('posts').select(PRODUCT_SITEMAP_SCAN).in_('business_id', batch),
+                    ('business_id', 'id'), page_size,
+                )
+
+        try:
+            for rows in pages():
+                for post in rows:
+                    business_id = str(post.get('business_id'))
+                    if business_id != current_id:
+                        if sitemap is not None:
+                            finished.add(current_id)
+                            yield self._commit_bulk(by_id[current_id], sitemap, post_count, last_updated)
+                        current_id, sitemap, post_count, last_updated = business_id, None, 0, None
+                        if business_id in by_id:
+                            sitemap = self._open_sitemap(by_id[business_id], output_dir)
+                    if sitemap is not None:
+                        sitemap.add(self._product_url(by_id[business_id], post, with_title=False))
+                        post_count += 1
+                        last_updated = _latest(last_updated, post.get('updated_at'))
+            if sitemap is not None:
+                finished.add(current_id)
+                yield self._commit_bulk(by_id[current_id], sitemap, post_count, last_updated)
+        except Exception as e:
+            logger.error(f'Bulk posts scan failed: {str(e)}')
+            scan_error = e
+            if sitemap is not None and current_id not in finished:
+                sitemap.discard()
+
+        for business_id, business in by_id.items():
+            if business_id in finished:
+                continue
+            if scan_error is not None:
+                yield business, None, scan_error
+                continue
+            try:
+                sitemap = self._open_sitemap(business, output_dir)
+            except Exception as e:
+                yield business, None, e
+                continue
+            yield self._commit_bulk(business, sitemap, 0, None)
+
+    def _open_sitemap(self, business, output_dir):
+        """A business's sharded sitemap with its home page entry already written."""
+        sitemap = ShardedSitemap(output_dir, f"{business['domain']}_sitemap")
+        sitemap.add(self._home_url(business))
+        return sitemap
+
+    def _commit_sitemap(self, business, sitemap, last_updated):
+        """Publish the shards and the business's own index of them; returns the shard count."""
+        shards = sitemap.commit()
+        lastmod = (last_updated or business.get('created_at') or datetime.now().isoformat())[:10]
+        save_gzip_index(
+            os.path.join(sitemap.directory, f"{business['domain']}_sitemap.xml.gz"),
+            ({'loc': shard_url(business['domain'], n), 'lastmod': lastmod} for n in range(1, shards + 1)),
+        )
+        return shards
+
+    def _commit_bulk(self, business, sitemap, post_count, last_updated):
+        try:
+            shards = self._commit_sitemap(business, sitemap, last_updated)
+        except Exception as e:
+            sitemap.discard()
+            return business, None, e
+        return business, (sitemap.count, post_count, last_updated, shards), None
+
+    def _generate_sitemap_index(self, supabase, businesses, output_dir, verbose, entries=None):
+        """
+        Generate master sitemap_index.xml listing every business's sitemap shards.
+
+        `entries` are the watermark entries (shard count and newest post per
+        business). Index files can't be nested, so shards are listed directly;
+        a business without static shards yet is listed by its origin
+        /sitemap.xml, which is generated dynamically for it. An index file
+        holds at most MAX_SITEMAPS entries; past that it continues in
+        sitemap_index_2.xml and so on. Returns the number of index files.
+        """
+        entries = entries or {}
+
+        def sitemaps():
             for business in businesses:
                 domain = business.get('domain')
-                sitemaps.append({
-                    'loc': f"https://{domain}.nexassearch.com/sitemap.xml",
-                    'lastmod': business['created_at'][:10] if business.get('created_at') else datetime.now().isoformat()[:10],
-                })
-            
-            xml = render_to_string('storefront/sitemaps/sitemap_index.xml', {
-                'sitemaps': sitemaps,
-                'now': datetime.now().isoformat()[:10]
-            })
-            
-            filepath = os.path.join(output_dir, 'sitemap_index.xml')
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(xml)
-            
+                entry = entries.get(str(business.get('id'))) or {}
+                lastmod = (entry.get('max_updated_at') or business.get('created_at') or datetime.now().isoformat())[:10]
+                if not entry.get('shards'):
+                    yield {'loc': f"https://{domain}.nexassearch.com/sitemap.xml", 'lastmod': lastmod}
+                    continue
+                for number in range(1, entry['shards'] + 1):
+                    yield {'loc': shard_url(domain, number), 'lastmod': lastmod}
+
+        try:
+            remaining = sitemaps()
+            files, count = 0, 0
+            while True:
+                batch = islice(remaining, MAX_SITEMAPS)
+                first = next(batch, None)
+                if first is None and files:
+                    break
+                files += 1
+                filepath = os.path.join(output_dir, master_index_name(files))
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    count += write_sitemap_index(f, chain([first], batch) if first else ())
+
+            # Continuation files of a bigger previous index
+            for name in os.listdir(output_dir):
+                match = MASTER_INDEX_FILE.match(name)
+                if match and match.group('number') and int(match.group('number')) > files:
+                    os.remove(os.path.join(output_dir, name))
+
+            if files > 1:
+                logger.warning(
+                    f'Master sitemap index has {count} sitemaps, split into {files} files; '
+                    f'submit {", ".join(master_index_name(n) for n in range(2, files + 1))} to search engines too'
+                )
             if verbose:
-                self.stdout.write(f'  ✓ Master index with {len(sitemaps)} sitemaps')
+                self.stdout.write(f'  ✓ Master index with {count} sitemaps in {files} file(s)')
+            return files
         
         except Exception as e:
             logger.error(f'Error generating sitemap index: {str(e)}')
             raise
 
-    def _generate_business_sitemap(self, supabase, business, output_dir, verbose):
-        """Generate sitemap.xml for a single business with all its products."""
+    def _generate_business_sitemap(self, supabase, business, output_dir, deadline=None, abandoned=None,
+                                   page_size=1000):
+        """
+        Generate the sitemap shards for a single business with all its products.
+
+        Products are read in keyset pages of `page_size` and streamed into
+        the shards, so no product is dropped. Returns `(url_count,
+        product_count, newest_post_update, shard_count)`. Raises
+        BusinessTimeout instead of publishing once `deadline` (monotonic) has
+        passed or `abandoned()` is true.
+        """
+        def check_deadline():
+            if (deadline is not None and time.monotonic() > deadline) or (abandoned and abandoned()):
+                raise BusinessTimeout('timed out')
+
         try:
             business_id = business['id']
-            domain = business['domain']
-            
-            # Fetch all products for this business
-            # Try with created_at first (safer fallback)
-            posts_response = supabase.table('posts')\
-                .select('id,data,created_at')\
-                .eq('business_id', business_id)\
-                .order('created_at', desc=True)\
-                .limit(50000)\
-                .execute()
-            
-            posts = posts_response.data
-            
-            # Build URL list
-            urls = [
-                {
-                    'loc': f"https://{domain}.nexassearch.com/",
-                    'lastmod': business['created_at'][:10] if business.get('created_at') else datetime.now().isoformat()[:10],
-                    'changefreq': 'weekly',
-                    'priority': '0.8',
-                    'images': []
-                }
-            ]
-            
-            # Add each product
-            for post in posts:
-                post_data = post.get('data', {})
-                if isinstance(post_data, str):
-                    post_data = json.loads(post_data)
-                
-                # Extract images
-                images = []
-                if 'images' in post_data and isinstance(post_data['images'], list):
-                    for img in post_data['images'][:3]:  # Max 3 images per product
-                        img_url = None
-                        if isinstance(img, dict):
-                            img_url = img.get('url')
-                        elif isinstance(img, str):
-                            img_url = img
-                        
-                        if img_url and img_url.startswith('http'):
-                            images.append({
-                                'loc': img_url,
-                                'title': post_data.get('productName', 'Product Image')
-                            })
-                
-                url_entry = {
-                    'loc': f"https://{domain}.nexassearch.com/product/{post['id']}/",
-                    'lastmod': post.get('created_at', business['created_at'])[:10],
-                    'changefreq': 'weekly',
-                    'priority': '0.7',
-                    'images': images
-                }
-                urls.append(url_entry)
-            
-            # Render sitemap XML
-            xml = render_to_string('storefront/sitemaps/sitemap.xml', {
-                'urls': urls
-            })
-            
-            # Save to file
-            filename = f"{domain}_sitemap.xml"
-            filepath = os.path.join(output_dir, filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(xml)
-            
-            if verbose:
-                self.stdout.write(
-                    f'  ✓ {domain}: {len(urls)} URLs ({len(posts)} products)'
-                )
-        
+            pages = scan(
+                lambda: supabase.table('posts').select(PRODUCT_SITEMAP).eq('business_id', business_id),
+                ('id',), page_size,
+            )
+
+            # Opened once the first page is in, so a stuck fetch leaves no partial file
+            sitemap = None
+            post_count, last_updated = 0, None
+            try:
+                for posts in pages:
+                    check_deadline()
+                    if sitemap is None:
+                        sitemap = self._open_sitemap(business, output_dir)
+                    for post in posts:
+                        sitemap.add(self._product_url(business, post))
+                        last_updated = _latest(last_updated, post.get('updated_at') or post.get('created_at'))
+                    post_count += len(posts)
+                check_deadline()
+                if sitemap is None:
+                    sitemap = self._open_sitemap(business, output_dir)
+                shards = self._commit_sitemap(business, sitemap, last_updated)
+            except BaseException:
+                if sitemap is not None:
+                    sitemap.discard()
+                raise
+
+            return sitemap.count, post_count, last_updated, shards
+
         except Exception as e:
             logger.error(f'Error generating sitemap for {business["domain"]}: {str(e)}')
             raise
 
-    def _save_metadata(self, output_dir, business_count, success_count, error_count):
+    def _home_url(self, business):
+        return {
+            'loc': f"https://{business['domain']}.nexassearch.com/",
+            'lastmod': business['created_at'][:10] if business.get('created_at') else datetime.now().isoformat()[:10],
+            'changefreq': 'weekly',
+            'priority': '0.8',
+            'images': []
+        }
+
+    def _product_url(self, business, post, with_title=True):
+        # Extract images (max 3 per product); bulk scans don't fetch names, titles are optional
+        title = data_value(post, 'productName', 'Product Image') if with_title else None
+        lastmod = post.get('updated_at') or post.get('created_at') or business.get('created_at')
+        return {
+            'loc': f"https://{business['domain']}.nexassearch.com/product/{post['id']}/",
+            'lastmod': lastmod[:10] if lastmod else datetime.now().isoformat()[:10],
+            'changefreq': 'weekly',
+            'priority': '0.7',
+            'images': [{'loc': img_url, 'title': title} for img_url in product_image_urls(post, limit=3)]
+        }
+
+    def _changed_businesses(self, supabase, businesses, watermark, output_dir, page_size):
+        """
+        Businesses whose sitemap is out of date according to the watermark.
+
+        That is: new businesses, changed domains, failed last time, missing
+        files, and any business with a post updated after the newest one it
+        was generated from. Posts are found with one scan of rows updated
+        since the last run. If that scan fails, every business is returned.
+        Deleted posts don't move `updated_at`; `--full` picks those up.
+        """
+        previous = watermark.get('businesses') or {}
+        since = _timestamp(watermark.get('generated_at'))
+        if since is None:
+            return businesses
+        updated = {}
+        try:
+            pages = scan(
+                lambda: supabase.table('posts').select('id,business_id,updated_at')
+                .gt('updated_at', (since - WATERMARK_OVERLAP).isoformat()),
+                ('business_id', 'id'), page_size,
+            )
+            for rows in pages:
+                for post in rows:
+                    business_id = str(post.get('business_id'))
+                    updated[business_id] = _latest(updated.get(business_id), post.get('updated_at'))
+        except Exception as e:
+            logger.warning(f'Could not list changed posts, regenerating every business: {str(e)}')
+            return businesses
+
+        changed = []
+        for business in businesses:
+            business_id = str(business['id'])
+            entry = previous.get(business_id)
+            path = os.path.join(output_dir, f"{business['domain']}_sitemap.xml.gz")
+            if (entry is None or entry.get('pending') or entry.get('domain') != business['domain']
+                    or not os.path.exists(path)
+                    or (business_id in updated
+                        and _latest(entry.get('max_updated_at'), updated[business_id]) != entry.get('max_updated_at'))):
+                changed.append(business)
+        return changed
+
+    def _remove_orphans(self, businesses, output_dir, verbose):
+        """
+        Delete sitemap files of businesses that are no longer active (or changed
+        domain), old-layout files, and temporary files left by a crashed run.
+        """
+        active = {business['domain'] for business in businesses}
+        removed = 0
+        for name in os.listdir(output_dir):
+            if name.endswith('.tmp'):
+                if not SITEMAP_FILE.match(name[:-len('.tmp')]):
+                    continue
+            else:
+                match = SITEMAP_FILE.match(name)
+                if not match or (match.group('domain') in active and name.endswith('.gz')):
+                    continue
+            try:
+                os.remove(os.path.join(output_dir, name))
+                removed += 1
+                if verbose:
+                    self.stdout.write(f'  🗑️ Removed {name}')
+            except OSError as e:
+                logger.warning(f'Could not remove stale sitemap {name}: {e}')
+        return removed
+
+    def _load_watermark(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                watermark = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f'Could not read sitemap watermark {path}: {e}')
+            return None
+        if not isinstance(watermark, dict) or not watermark.get('generated_at'):
+            return None
+        return watermark
+
+    def _save_watermark(self, path, run_started, businesses, watermark, generated, failed):
+        """
+        Record this run; failed businesses are marked pending so the next run retries them.
+        Returns the new entries.
+        """
+        previous = (watermark or {}).get('businesses') or {}
+        entries = {}
+        for business in businesses:
+            business_id = str(business['id'])
+            if business_id in generated:
+                _, _, last_updated, shards = generated[business_id]
+                entries[business_id] = {'domain': business['domain'], 'max_updated_at': last_updated, 'shards': shards}
+            elif business_id in failed:
+                entries[business_id] = {
+                    'domain': business['domain'],
+                    'max_updated_at': (previous.get(business_id) or {}).get('max_updated_at'),
+                    'shards': (previous.get(business_id) or {}).get('shards'),
+                    'pending': True,
+                }
+            elif business_id in previous:
+                entries[business_id] = previous[business_id]
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'generated_at': run_started.isoformat(), 'businesses': entries}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f'Could not save sitemap watermark {path}: {e}')
+        return entries
+
+    def _save_metadata(self, output_dir, business_count, success_count, error_count, workers=1, duration=None,
+                       mode='per_business', incremental=False, unchanged=0, removed=0):
         """Save generation metadata for monitoring."""
         metadata = {
             'generated_at': datetime.now().isoformat(),
             'total_businesses': business_count,
             'successful': success_count,
             'failed': error_count,
-            'status': 'success' if error_count == 0 else 'partial'
+            'status': 'success' if error_count == 0 else 'partial',
+            'mode': mode,
+            'incremental': incremental,
+            'unchanged': unchanged,
+            'removed': removed,
+            'workers': workers,
+            'duration_seconds': round(duration, 2) if duration is not None else None,
         }
         
         metadata_path = os.path.join(output_dir, 'metadata.json')
@@ -0,0 +1,45 @@
+import json
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import requests
+
+from storefront.utils.cache_events import EVENT_TYPES, HANDLERS, build_event
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Send a database change event to the cache invalidation webhook, '
+            'standing in for the Supabase database webhook in development and tests')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--table', required=True, choices=sorted(HANDLERS), help='Table the change happened in')
+        parser.add_argument('--type', default='UPDATE', choices=EVENT_TYPES, help='Kind of change')
+        parser.add_argument('--record', type=json.loads, default=None,
+                            help='New row as JSON, e.g. \'{"id": "p1", "business_id": "b1"}\'')
+        parser.add_argument('--old-record', type=json.loads, default=None, help='Previous row as JSON')
+        parser.add_argument(
+            '--url',
+            default='http://localhost:8000/_internal/cache/invalidate/',
+            help='Webhook endpoint',
+        )
+        parser.add_argument('--secret', default=None, help='Webhook secret (defaults to CACHE_WEBHOOK_SECRET)')
+        parser.add_argument('--dry-run', action='store_true', help='Print the payload instead of sending it')
+
+    def handle(self, *args, **options):
+        event = build_event(options['table'], options['type'], options['record'], options['old_record'])
+        if options['dry_run']:
+            self.stdout.write(json.dumps(event, indent=2))
+            return
+
+        secret = options['secret'] if options['secret'] is not None else settings.CACHE_WEBHOOK_SECRET
+        headers = {'Authorization': f'Bearer {secret}'} if secret else {}
+        try:
+            response = requests.post(options['url'], json=event, headers=headers, timeout=10)
+        except requests.RequestException as e:
+            raise CommandError(f'Could not reach {options["url"]}: {e}')
+        if response.status_code != 200:
+            raise CommandError(f'Webhook answered {response.status_code}: {response.text[:200]}')
+        self.stdout.write(self.style.SUCCESS(f"Purged: {', '.join(response.json().get('purged', [])) or 'nothing'}"))
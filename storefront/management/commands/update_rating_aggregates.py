@@ -0,0 +1,158 @@
+"""
+Refresh business_profiles.average_rating/total_reviews from new reviews.
+
+Incremental runs walk reviews by (created_at, id) from a watermark and
+recompute the businesses they touch. Schedule them often (e.g. every 15
+minutes). Review edits and deletes don't move created_at, so they are only
+picked up by a business's next new review or by a `--full` run: schedule one
+daily too (run_daily_sitemaps.ps1 does).
+"""
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+from storefront.client import get_supabase_client
+from storefront.utils.circuit import breakers_bypassed
+from storefront.utils.pagination import decode_cursor, encode_cursor, fetch_page
+from storefront.utils.ratings import get_review_aggregates
+
+logger = logging.getLogger(__name__)
+
+# Reviews created this long before the watermark are rescanned: a review that
+# commits late can carry an older created_at than rows an earlier run already saw
+WATERMARK_OVERLAP = timedelta(minutes=10)
+NIL_UUID = '00000000-0000-0000-0000-000000000000'
+
+
+def _rewind(cursor):
+    """A cursor WATERMARK_OVERLAP before `cursor`, or None to scan from the start."""
+    if not cursor:
+        return None
+    try:
+        created_at = parse_datetime(cursor[0])
+    except ValueError:
+        created_at = None
+    if created_at is None:
+        return None
+    # reviews.id is a uuid: every id sorts after the nil UUID, so rows at exactly that time are included
+    return (created_at - WATERMARK_OVERLAP).isoformat(), NIL_UUID
+
+
+class Command(BaseCommand):
+    help = 'Refresh business_profiles.average_rating/total_reviews from reviews added since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watermark-file',
+            type=str,
+            default='storefront/data/rating_aggregates_watermark.json',
+            help='Where the position of the last processed review is kept between runs',
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the watermark and rescan every review',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Reviews read per upstream page',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute aggregates without writing profiles or the watermark',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Show detailed output',
+        )
+
+    def handle(self, *args, **options):
+        # Straight to upstream: a failed read fails the run instead of feeding it
+        # last-known-good data, and long scans don't trip the breakers
+        with breakers_bypassed():
+            self._refresh(**options)
+
+    def _refresh(self, **options):
+        watermark_file = options['watermark_file']
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        verbose = options['verbose']
+
+        supabase = get_supabase_client()
+
+        token = None if options['full'] else self._load_watermark(watermark_file)
+        cursor = _rewind(decode_cursor(token))
+        if token and not cursor:
+            self.stdout.write(self.style.WARNING('⚠️ Unreadable watermark; rescanning every review'))
+        self.stdout.write(f"⭐ Refreshing rating aggregates {'from the start' if not cursor else f'after {cursor[0]}'}...")
+
+        scanned = 0
+        updated = 0
+        while True:
+            query = supabase.table('reviews').select('id,product_id,created_at')
+            rows, next_token = fetch_page(query, cursor, batch_size, descending=False)
+            if not rows:
+                break
+            scanned += len(rows)
+
+            # Business reviews are stored with product_id = the business id
+            touched = list(dict.fromkeys(str(r['product_id']) for r in rows if r.get('product_id')))
+            biz_response = supabase.table('business_profiles').select('id').in_('id', touched).execute()
+            business_ids = [b['id'] for b in biz_response.data or []]
+
+            if business_ids:
+                # Recompute from scratch for touched businesses: also correct after edits/deletes
+                aggregates = get_review_aggregates(supabase, business_ids)
+                for business_id in business_ids:
+                    agg = aggregates.get(str(business_id), {'count': 0, 'avg': 0})
+                    if verbose:
+                        self.stdout.write(f"  {business_id}: {agg['count']} reviews, avg {agg['avg']:.2f}")
+                    if not dry_run:
+                        supabase.table('business_profiles').update({
+                            'average_rating': round(agg['avg'], 2),
+                            'total_reviews': agg['count'],
+                        }).eq('id', business_id).execute()
+                    updated += 1
+
+            # Checkpoint after every batch so an interrupted run resumes here
+            last = rows[-1]
+            cursor = (last['created_at'], str(last['id']))
+            if not dry_run:
+                self._save_watermark(watermark_file, rows[-1], scanned)
+            if not next_token:
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Scanned {scanned} reviews, refreshed {updated} business aggregates'
+            + (' (dry run)' if dry_run else '')
+        ))
+
+    def _load_watermark(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('cursor')
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f'Could not read rating watermark {path}: {e}')
+            return None
+
+    def _save_watermark(self, path, last_review, scanned):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'cursor': encode_cursor(last_review),
+                'last_review_created_at': last_review.get('created_at'),
+                'reviews_scanned': scanned,
+                'saved_at': datetime.now().isoformat(),
+            }, f, indent=2)
+        os.replace(tmp_path, path)
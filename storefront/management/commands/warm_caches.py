@@ -0,0 +1,46 @@
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from storefront.utils.warmup import warm_caches
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Prime tenant, component, template and page caches for the busiest shops'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=settings.WARM_CACHES_LIMIT,
+            help='Number of shops to warm',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.WARM_CACHES_CONCURRENCY,
+            help='Pages rendered at the same time',
+        )
+        parser.add_argument(
+            '--no-pages',
+            action='store_true',
+            help='Only prime in-process caches, do not render pages into the shared page cache',
+        )
+
+    def handle(self, *args, **options):
+        report = warm_caches(
+            limit=options['limit'],
+            concurrency=options['concurrency'],
+            pages=not options['no_pages'],
+        )
+        primed = report['tenants'] + report['components'] + report['templates'] + report['pages_rendered']
+        self.stdout.write(self.style.SUCCESS(
+            f"Warmed {report['businesses']} shops in {report['seconds']}s: {primed} entries primed "
+            f"({report['tenants']} tenants, {report['components']} component trees, "
+            f"{report['templates']} templates, {report['pages_rendered']} pages; "
+            f"{report['pages_already_cached']} pages already cached)"
+        ))
+        if report['errors']:
+            self.stdout.write(self.style.WARNING(f"{report['errors']} errors, see the log"))
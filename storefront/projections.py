@@ -0,0 +1,163 @@
+"""
+Named column projections for Supabase queries.
+
+Views used to `select('*')` everywhere, pulling the whole `components` JSON,
+`fts` vectors and every other column on pages that render three fields. Each
+projection below lists what its consumers (view code and templates) actually
+read; pass it straight to `.select()`:
+
+    supabase.table('business_profiles').select(BUSINESS_HEADER)
+
+When a page needs a new field, add it to the projection rather than going
+back to `*`.
+
+With PROJECTION_CHECKS on (defaults to DEBUG), wrap the returned rows with
+`project(rows, PROJECTION)`: reading a key the projection didn't fetch, from
+a view or a template, logs a warning once per projection and key.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Projection(str):
+    """A `select()` column list that remembers its registry name."""
+
+    def __new__(cls, name, columns):
+        obj = super().__new__(cls, ','.join(columns))
+        obj.name = name
+        obj.columns = tuple(columns)
+        return obj
+
+    def extend(self, *columns, name=None):
+        """This projection plus extra columns or embeds, e.g. `'categories(name)'`."""
+        return Projection(name or self.name, self.columns + columns)
+
+
+# --- business_profiles ------------------------------------------------------
+
+# Every column: tenant resolution and the owner's own profile need `components`.
+BUSINESS_FULL = Projection('BUSINESS_FULL', ('*',))
+
+# Directory cards on the landing page.
+BUSINESS_HEADER = Projection('BUSINESS_HEADER', (
+    'id', 'business_name', 'business_description', 'category', 'domain', 'slug',
+    'logo_url', 'logo_small_url', 'is_verified', 'average_rating', 'total_reviews',
+    'created_at',
+))
+
+# Public business page (/business/<slug>/) and its LocalBusiness schema.
+BUSINESS_PROFILE = BUSINESS_HEADER.extend(
+    'business_address', 'business_phone_number', 'website_url', 'price_range',
+    'currency', 'latitude', 'longitude', 'opening_hours', 'place_name',
+    name='BUSINESS_PROFILE',
+)
+
+# --- posts ----------------------------------------------------------------
+
+# Listing cards: denormalized columns plus JSON-path extracts aliased to their
+# `data` key, never the whole blob. Read them with utils/product_cards.py.
+PRODUCT_CARD = Projection('PRODUCT_CARD', (
+    'id', 'business_id', 'category_id', 'title', 'price', 'currency', 'stock_status',
+    'created_at', 'updated_at',
+    'productName:data->>productName', 'name:data->>name',
+    'productPrice:data->productPrice', 'productCurrency:data->>productCurrency',
+    'firstImage:data->images->0', 'thumbnailUrl:data->>thumbnailUrl',
+    'imageUrl:data->>imageUrl', 'videoUrl:data->>videoUrl',
+    'categoryName:data->category->>name',
+))
+
+# Merchant feeds: cards plus the description and product identifiers.
+PRODUCT_FEED = PRODUCT_CARD.extend(
+    'textContent:data->>textContent', 'brand:data->>brand', 'gtin:data->>gtin', 'mpi:data->>mpi',
+    name='PRODUCT_FEED',
+)
+
+# Sitemaps: URL, lastmod and up to a few image URLs.
+PRODUCT_SITEMAP = Projection('PRODUCT_SITEMAP', (
+    'id', 'title', 'created_at', 'updated_at',
+    'productName:data->>productName', 'images:data->images',
+))
+
+# Bulk sitemap builds scanning every shop's posts at once: the bare minimum.
+PRODUCT_SITEMAP_SCAN = Projection('PRODUCT_SITEMAP_SCAN', (
+    'id', 'business_id', 'updated_at', 'images:data->images',
+))
+
+PRODUCT_DETAIL = Projection('PRODUCT_DETAIL', (
+    'id', 'business_id', 'category_id', 'type', 'slug', 'title', 'price', 'currency',
+    'stock_status', 'share_link', 'wish_count', 'comment_count', 'order_count',
+    'created_at', 'updated_at', 'data',
+))
+
+# --- nexususers -----------------------------------------------------------
+
+# Signed-in user for the navbar and the profile page.
+USER_SESSION = Projection('USER_SESSION', (
+    'id', 'name', 'email', 'phone_number', 'avatar_url', 'slug', 'is_verified',
+))
+
+# Public profile page (/u/<slug>/).
+USER_PUBLIC = Projection('USER_PUBLIC', (
+    'id', 'name', 'slug', 'avatar_url', 'bio', 'is_verified', 'rating', 'trust_score',
+    'follower_count', 'following_count', 'social_links', 'created_at',
+))
+
+# --- wishlists ------------------------------------------------------------
+
+WISHLIST_ENTRY = Projection('WISHLIST_ENTRY', ('user_id', 'product_id'))
+
+
+# --- debug guard ----------------------------------------------------------
+
+_warned = set()
+_warned_lock = threading.Lock()
+
+
+def _warn_unfetched(projection, key):
+    if not isinstance(key, str) or hasattr(dict, key):
+        # Template engine probing dict methods (`.items`) or list-style indexes
+        return
+    with _warned_lock:
+        if (projection.name, key) in _warned:
+            return
+        _warned.add((projection.name, key))
+    logger.warning(f"'{key}' read from a {projection.name} row but not fetched by that projection")
+
+
+class ProjectedRow(dict):
+    """Row dict that reports reads of keys its projection didn't select."""
+
+    def __init__(self, data, projection):
+        super().__init__(data)
+        self.projection = projection
+
+    def __missing__(self, key):
+        _warn_unfetched(self.projection, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key not in self:
+            _warn_unfetched(self.projection, key)
+        return super().get(key, default)
+
+
+def checks_enabled():
+    return getattr(settings, 'PROJECTION_CHECKS', settings.DEBUG)
+
+
+def project(rows, projection):
+    """
+    Wrap row dicts (a list or a single row) for unfetched-key checks.
+
+    A no-op returning `rows` unchanged when checks are off or the projection
+    selects `*`.
+    """
+    if not rows or '*' in projection.columns or not checks_enabled():
+        return rows
+    if isinstance(rows, dict):
+        return ProjectedRow(rows, projection)
+    return [ProjectedRow(row, projection) if isinstance(row, dict) else row for row in rows]
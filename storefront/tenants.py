@@ -0,0 +1,271 @@
+"""
+Tenant registry: resolves a shop subdomain to its business profile.
+
+`SubdomainMiddleware` resolves the tenant once per request and exposes it as
+`request.tenant`. Profiles are kept in a small in-process LRU with a TTL so
+the `business_profiles` lookup no longer runs in every view of every request.
+
+Domains that don't exist are remembered in a separate, bounded negative
+cache so scanners and typo hosts cost one upstream query per TTL instead of
+one per request; the middleware rejects them before any view runs.
+
+When a profile changes call `invalidate_tenant(domain=...)` (or by
+`business_id`); listeners of `tenant_invalidated` can drop derived data.
+That only reaches the worker it runs in, so each entry also remembers the
+tenant's shared generation token (utils/page_cache.py) and is refetched
+once another worker purges the tenant.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.dispatch import Signal
+
+from .client import get_supabase_client
+from .projections import BUSINESS_FULL
+from .utils.component_cache import components_version
+
+logger = logging.getLogger(__name__)
+
+# Sent with `domain` and `business_id` kwargs whenever a tenant is invalidated.
+tenant_invalidated = Signal()
+
+
+def _parse_business(row):
+    """Parse the `components` JSON once so views receive a ready-to-use list."""
+    # Version the raw payload before parsing; the component tree cache keys on it
+    row['components_version'] = components_version(row)
+    components = row.get('components')
+    if isinstance(components, str):
+        try:
+            components = json.loads(components) or []
+        except (TypeError, ValueError):
+            logger.warning("Invalid components JSON for business %s", row.get('id'))
+            components = []
+    if not isinstance(components, list):
+        components = []
+    row['components'] = components
+    return row
+
+
+def shared_tenant_token(business_id):
+    """The tenant's generation token in the cache shared by all workers."""
+    from .utils.page_cache import tenant_token
+    return tenant_token(business_id)
+
+
+def fetch_business_by_domain(domain):
+    """Query Supabase for a business profile. Returns the parsed row or None if it doesn't exist."""
+    supabase = get_supabase_client()
+    response = supabase.table('business_profiles').select(BUSINESS_FULL).eq('domain', domain).execute()
+    if not response.data:
+        return None
+    return _parse_business(response.data[0])
+
+
+class TenantRegistry:
+    """Thread-safe LRU of `domain -> business profile` with a per-entry TTL, plus a negative cache."""
+
+    def __init__(self, ttl=60, max_entries=1000, negative_ttl=300, negative_max_entries=10000,
+                 fetch=fetch_business_by_domain, generation=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.negative_max_entries = negative_max_entries
+        self._fetch = fetch
+        self._generation = generation
+        self._entries = OrderedDict()
+        self._missing = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.errors = 0
+        self.stale = 0
+
+    def _get_cached(self, domain):
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None:
+                return None
+            expires_at, business, token = entry
+            if expires_at < time.monotonic():
+                del self._entries[domain]
+                return None
+            self._entries.move_to_end(domain)
+        if token is not None and self._current_token(business) != token:
+            # Purged by another worker since we fetched it
+            self.stale += 1
+            with self._lock:
+                self._entries.pop(domain, None)
+            return None
+        return business
+
+    def _current_token(self, business):
+        if self._generation is None:
+            return None
+        try:
+            return self._generation(business.get('id'))
+        except Exception as e:
+            logger.warning("Could not read tenant generation for %s: %s", business.get('id'), e)
+            return None
+
+    def _store(self, domain, business):
+        token = self._current_token(business)
+        with self._lock:
+            self._entries[domain] = (time.monotonic() + self.ttl, business, token)
+            self._entries.move_to_end(domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _store_missing(self, domain):
+        with self._lock:
+            self._missing[domain] = time.monotonic() + self.negative_ttl
+            self._missing.move_to_end(domain)
+            while len(self._missing) > self.negative_max_entries:
+                self._missing.popitem(last=False)
+
+    def is_missing(self, domain):
+        """True if `domain` was recently looked up and confirmed not to exist."""
+        with self._lock:
+            expires_at = self._missing.get(domain)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._missing[domain]
+                return False
+            return True
+
+    def resolve(self, domain):
+        """
+        Return a per-caller copy of the business profile for `domain`, or None.
+
+        The copy is shallow: callers may set keys on it freely, but the nested
+        components are shared with the cache and must be treated as read-only.
+        """
+        if not domain:
+            return None
+
+        business = self._get_cached(domain)
+        if business is not None:
+            self.hits += 1
+            return dict(business)
+
+        if self.is_missing(domain):
+            self.negative_hits += 1
+            return None
+
+        self.misses += 1
+        try:
+            business = self._fetch(domain)
+        except Exception as e:
+            # Upstream trouble is not proof the shop is gone; don't cache it.
+            self.errors += 1
+            logger.warning("Tenant lookup failed for '%s': %s", domain, e)
+            return None
+
+        if business is None:
+            self._store_missing(domain)
+            return None
+
+        self._store(domain, business)
+        return dict(business)
+
+    def prime(self, row):
+        """Store a `business_profiles` row fetched elsewhere (cache warm-up). Returns the parsed profile."""
+        business = _parse_business(row)
+        self._store(business.get('domain'), business)
+        with self._lock:
+            self._missing.pop(business.get('domain'), None)
+        return business
+
+    def invalidate(self, domain=None, business_id=None):
+        """Drop one tenant by domain and/or business id. Returns True if something was evicted."""
+        removed = False
+        with self._lock:
+            if domain:
+                # A brand-new shop may have just claimed a domain we cached as missing
+                self._missing.pop(domain, None)
+            if domain and self._entries.pop(domain, None) is not None:
+                removed = True
+            if business_id:
+                for key, (_, business, _token) in list(self._entries.items()):
+                    if str(business.get('id')) == str(business_id):
+                        del self._entries[key]
+                        removed = True
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._missing.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'stale': self.stale,
+            'missing_entries': len(self._missing),
+            'negative_ttl': self.negative_ttl,
+            'negative_hits': self.negative_hits,
+        }
+
+
+class RejectionCounter:
+    """Counts hosts rejected as unknown tenants; per-host tallies are capped to stay bounded."""
+
+    def __init__(self, max_hosts=200):
+        self.max_hosts = max_hosts
+        self.total = 0
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def record(self, host):
+        with self._lock:
+            self.total += 1
+            if host in self._hosts or len(self._hosts) < self.max_hosts:
+                self._hosts[host] = self._hosts.get(host, 0) + 1
+
+    def stats(self, top=20):
+        with self._lock:
+            hosts = sorted(self._hosts.items(), key=lambda item: item[1], reverse=True)[:top]
+            return {'total': self.total, 'top_hosts': dict(hosts)}
+
+
+registry = TenantRegistry(
+    ttl=getattr(settings, 'TENANT_CACHE_TTL', 60),
+    max_entries=getattr(settings, 'TENANT_CACHE_MAX_ENTRIES', 1000),
+    negative_ttl=getattr(settings, 'TENANT_NEGATIVE_TTL', 300),
+    negative_max_entries=getattr(settings, 'TENANT_NEGATIVE_MAX_ENTRIES', 10000),
+    generation=shared_tenant_token,
+)
+rejections = RejectionCounter()
+
+
+def resolve_tenant(domain):
+    return registry.resolve(domain)
+
+
+def get_tenant(request):
+    """
+    Business profile for the request's subdomain (or None).
+
+    Uses `request.tenant` set by SubdomainMiddleware and resolves it on demand
+    for requests that bypassed the middleware (RequestFactory, scripts).
+    """
+    if not hasattr(request, 'tenant'):
+        request.tenant = resolve_tenant(getattr(request, 'subdomain', None))
+    return request.tenant
+
+
+def invalidate_tenant(domain=None, business_id=None):
+    """Hook to call when a business profile changes."""
+    registry.invalidate(domain=domain, business_id=business_id)
+    tenant_invalidated.send(sender=TenantRegistry, domain=domain, business_id=business_id)
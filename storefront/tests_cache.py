@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def _cache(location, **options):
+    return SQLiteCache(location, {'OPTIONS': options})
+
+
+def _incr_in_child(location, times):
+    cache = _cache(location)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.location = os.path.join(self.tmpdir, 'cache.sqlite3')
+        self.cache = _cache(self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_round_trip_and_counters(self):
+        self.cache.set('feed', {'items': [1, 2]}, 60)
+        self.assertEqual(self.cache.get('feed'), {'items': [1, 2]})
+        self.assertIsNone(self.cache.get('missing'))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['sets'], stats['entries']), (1, 1, 1, 1))
+
+    def test_counters_are_shared_between_thread_instances(self):
+        # Django's `caches` gives every thread its own backend instance
+        self.cache.set('feed', 'x', 60)
+        other = _cache(self.location)
+        other.get('feed')
+        other.get('missing')
+        self.assertEqual((self.cache.stats()['hits'], self.cache.stats()['misses']), (1, 1))
+
+    def test_entries_are_shared_between_instances(self):
+        # A second instance on the same file stands in for another worker
+        self.cache.set('sitemap', b'<xml/>', 60)
+        self.assertEqual(_cache(self.location).get('sitemap'), b'<xml/>')
+
+    def test_expired_entries_are_misses(self):
+        with patch('core.cache.time.time', return_value=1000.0):
+            self.cache.set('k', 'v', 10)
+        with patch('core.cache.time.time', return_value=1011.0):
+            self.assertIsNone(self.cache.get('k'))
+            self.assertTrue(self.cache.add('k', 'new', 10))
+
+    def test_add_does_not_overwrite_live_entry(self):
+        self.cache.set('k', 'old', 60)
+        self.assertFalse(self.cache.add('k', 'new', 60))
+        self.assertEqual(self.cache.get('k'), 'old')
+
+    def test_least_recently_used_entries_are_culled(self):
+        cache = _cache(self.location, MAX_ENTRIES=4, CULL_EVERY=1, TOUCH_INTERVAL=0)
+        clock = iter(range(1000, 2000))
+        with patch('core.cache.time.time', side_effect=lambda: float(next(clock))):
+            for key in 'abcd':
+                cache.set(key, key, None)
+            cache.get('a')
+            cache.set('e', 'e', None)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertEqual(cache.get('e'), 'e')
+        self.assertGreater(cache.stats()['evictions'], 0)
+
+    def test_byte_cap_is_enforced(self):
+        cache = _cache(self.location, MAX_BYTES=2000, CULL_EVERY=1)
+        for i in range(10):
+            cache.set(f'blob{i}', b'x' * 400, None)
+        self.assertLessEqual(cache.stats()['bytes'], 2000)
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0, None)
+        ctx = multiprocessing.get_context('fork')
+        children = [ctx.Process(target=_incr_in_child, args=(self.location, 25)) for _ in range(4)]
+        for child in children:
+            child.start()
+        for child in children:
+            child.join()
+        self.assertEqual(self.cache.get('counter'), 100)
+
+    def test_incr_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('nope')
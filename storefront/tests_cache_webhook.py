@@ -0,0 +1,117 @@
+import json
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import override_settings
+
+from storefront.tenants import TenantRegistry
+from storefront.tests_page_cache import PageCacheTestCase
+from storefront.utils.cache_events import build_event
+from storefront.utils.page_cache import anonymous_page_cache, purge_tenant, tag_products, tenant_token
+from storefront.views.cache_webhook import cache_invalidate
+from storefront.views.shop import shop_home
+
+SECRET = 'hook-secret'
+# Outside PageCacheTestCase.setUp's temporary SQLite cache (class setup, late cleanups)
+# nothing may reach the project's .cache/cache.sqlite3
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cache-webhook-tests'}}
+
+
+@override_settings(CACHE_WEBHOOK_SECRET=SECRET, CACHES=LOCMEM)
+class CacheWebhookTests(PageCacheTestCase):
+    def setUp(self):
+        super().setUp()
+
+        @anonymous_page_cache(listing=True)
+        def grid(request):
+            self.calls += 1
+            tag_products(request, ['p9'])
+            return HttpResponse('grid')
+        self.grid = grid
+
+    def post(self, payload, secret=SECRET):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {secret}'} if secret else {}
+        request = self.factory.post('/_internal/cache/invalidate/', json.dumps(payload),
+                                    content_type='application/json', **headers)
+        return cache_invalidate(request)
+
+    def test_requires_the_secret(self):
+        self.assertEqual(self.post(build_event('categories'), secret=None).status_code, 403)
+        self.assertEqual(self.post(build_event('categories'), secret='wrong').status_code, 403)
+
+    def test_invalid_events_are_rejected_before_purging(self):
+        self.get()
+        response = self.post([build_event('posts', record={'id': 'p1'}), {'table': 'posts'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+
+    def test_post_update_purges_its_pages_and_both_shop_listings(self):
+        self.get()
+        self.get('/grid', view=self.grid)
+        event = build_event('posts', record={'id': 'p1', 'business_id': 'biz-2'},
+                            old_record={'id': 'p1', 'business_id': 'biz-1'})
+        body = json.loads(self.post(event).content)
+        self.assertEqual(body['purged'], ['listing:biz-1', 'listing:biz-2', 'product:p1'])
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.get('/grid', view=self.grid)['X-Page-Cache'], 'MISS')
+
+    def test_unrelated_changes_keep_pages(self):
+        self.get()
+        self.post(build_event('reviews', 'INSERT', record={'id': 'r1', 'product_id': 'p7'}))
+        self.post(build_event('news_articles', record={'id': 'n1'}))
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+
+    def test_news_change_purges_the_landing_shell(self):
+        landing = {'businesses': [], 'trending news': [], 'lost items': [], 'community posts': []}
+        with patch('storefront.views.shop.get_supabase_client'), \
+                patch('storefront.views.shop.fan_out', return_value=landing), \
+                patch('storefront.views.shop.render', return_value=HttpResponse('landing')):
+            self.get(view=shop_home, tenant=None)
+            self.assertEqual(self.get(view=shop_home, tenant=None)['X-Page-Cache'], 'HIT')
+            self.post(build_event('news_articles', 'INSERT', record={'id': 'n2'}))
+            self.assertEqual(self.get(view=shop_home, tenant=None)['X-Page-Cache'], 'MISS')
+
+    def test_business_profile_change_invalidates_the_tenant(self):
+        self.get()
+        with patch('storefront.utils.cache_events.invalidate_tenant') as invalidate:
+            invalidate.side_effect = lambda domain, business_id: purge_tenant(business_id)
+            body = json.loads(self.post(build_event(
+                'business_profiles', record={'id': 'biz-1', 'domain': 'myshop', 'status': 'active'},
+                old_record={'id': 'biz-1', 'domain': 'myshop', 'status': 'active'},
+            )).content)
+        invalidate.assert_called_once_with(domain='myshop', business_id='biz-1')
+        self.assertEqual(body['purged'], ['tenant:biz-1'])
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+    def test_publisher_sends_events_to_the_webhook(self):
+        self.get()
+
+        def deliver(url, **kwargs):
+            request = self.factory.post(url, json.dumps(kwargs['json']), content_type='application/json',
+                                        HTTP_AUTHORIZATION=kwargs['headers'].get('Authorization', ''))
+            response = cache_invalidate(request)
+            return MagicMock(status_code=response.status_code, text=response.content.decode(),
+                             json=lambda: json.loads(response.content))
+
+        out = StringIO()
+        with patch('storefront.management.commands.publish_cache_event.requests.post', side_effect=deliver):
+            call_command('publish_cache_event', '--table', 'posts', '--type', 'DELETE',
+                         '--old-record', '{"id": "p2", "business_id": "biz-1"}', stdout=out)
+        self.assertIn('product:p2', out.getvalue())
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+
+@override_settings(CACHES=LOCMEM)
+class TenantGenerationTests(PageCacheTestCase):
+    def test_registry_refetches_after_another_worker_purges(self):
+        fetch = MagicMock(side_effect=lambda domain: {'id': 'biz-1', 'domain': domain})
+        registry = TenantRegistry(fetch=fetch, generation=tenant_token)
+        registry.resolve('myshop')
+        registry.resolve('myshop')
+        self.assertEqual(fetch.call_count, 1)
+        # A purge in another process only changes the shared token
+        purge_tenant('biz-1')
+        registry.resolve('myshop')
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(registry.stats()['stale'], 1)
@@ -0,0 +1,122 @@
+from unittest.mock import patch
+import httpx
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import IdentityMapMiddleware
+from storefront.client import UpstreamTransport
+from storefront.utils.circuit import (
+    CircuitBreaker, CircuitOpenError, breakers_bypassed, get_breaker, reset_breakers,
+)
+from storefront.utils.identity_map import request_scope
+
+POSTS = 'https://example.supabase.co/rest/v1/posts?select=id&business_id=eq.biz-1'
+ORDERS = 'https://example.supabase.co/rest/v1/market_orders?select=id'
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_threshold_and_lets_one_trial_through(self):
+        breaker = CircuitBreaker('posts', failure_threshold=2, window=30, slow_call=1, open_seconds=0)
+        breaker.record(failed=True)
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record(duration=5)  # slow calls count as failures
+        self.assertEqual(breaker.state, 'open')
+
+        self.assertTrue(breaker.allow())   # open_seconds elapsed: trial call
+        self.assertFalse(breaker.allow())  # only one at a time
+        breaker.record(duration=0.1)
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_rejects_while_open(self):
+        breaker = CircuitBreaker('posts', failure_threshold=1, open_seconds=60)
+        breaker.record(failed=True)
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.stats()['rejected'], 1)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'circuit-tests'}},
+    CIRCUIT_FAILURE_THRESHOLD=1, CIRCUIT_OPEN_SECONDS=60, CIRCUIT_SLOW_CALL=5,
+)
+class FallbackTransportTests(SimpleTestCase):
+    def setUp(self):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+        self.upstream_down = False
+        self.sent = 0
+
+        def upstream(transport, request):
+            self.sent += 1
+            if self.upstream_down:
+                raise httpx.ConnectTimeout('timed out', request=request)
+            return httpx.Response(200, json=[{'id': 'p1'}], request=request)
+
+        patcher = patch('httpx.HTTPTransport.handle_request', upstream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.http = httpx.Client(transport=UpstreamTransport())
+        self.addCleanup(self.http.close)
+
+    def test_open_breaker_serves_last_known_good_data(self):
+        self.http.get(POSTS)
+        self.upstream_down = True
+        with request_scope() as memo:
+            response = self.http.get(POSTS)
+        self.assertEqual(response.json(), [{'id': 'p1'}])
+        self.assertEqual(response.headers['x-stale-fallback'], '1')
+        self.assertEqual(get_breaker('posts').state, 'open')
+        self.assertEqual(memo.stale, 1)
+
+        # Further calls don't even go upstream
+        with request_scope():
+            self.http.get(POSTS)
+        self.assertEqual(self.sent, 2)
+
+    def test_fails_fast_without_fallback(self):
+        self.upstream_down = True
+        with self.assertRaises(httpx.ConnectTimeout):
+            self.http.get(ORDERS)
+        with request_scope() as memo, self.assertRaises(CircuitOpenError):
+            self.http.get(ORDERS)
+        self.assertEqual((self.sent, memo.rejected), (1, 1))
+
+    def test_no_fallback_outside_a_request_scope(self):
+        self.http.get(POSTS)
+        self.upstream_down = True
+        # Nothing would record that a job read stale data: it gets the error
+        with self.assertRaises(httpx.ConnectTimeout):
+            self.http.get(POSTS)
+        with self.assertRaises(CircuitOpenError):
+            self.http.get(POSTS)
+
+    def test_bypassed_breakers_send_straight_upstream(self):
+        self.upstream_down = True
+        with self.assertRaises(httpx.ConnectTimeout):
+            self.http.get(POSTS)
+        self.assertEqual(get_breaker('posts').state, 'open')
+        self.upstream_down = False
+        with breakers_bypassed():
+            self.assertEqual(self.http.get(POSTS).json(), [{'id': 'p1'}])
+        self.assertEqual(self.sent, 2)
+
+
+@override_settings(CIRCUIT_OPEN_SECONDS=30)
+class CircuitMiddlewareTests(SimpleTestCase):
+    def run_view(self, view):
+        return IdentityMapMiddleware(view)(RequestFactory().get('/'))
+
+    def test_stale_responses_are_marked_and_not_cached(self):
+        def view(request):
+            request.identity_map.mark_stale()
+            return HttpResponse('page')
+        response = self.run_view(view)
+        self.assertEqual(response['X-Served-Stale'], '1')
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_not_found_caused_by_an_open_breaker_becomes_503(self):
+        def view(request):
+            request.identity_map.mark_rejected()
+            return HttpResponse('Shop not found', status=404)
+        response = self.run_view(view)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '30')
@@ -0,0 +1,44 @@
+import os
+from unittest.mock import patch
+from django.test import SimpleTestCase
+
+from storefront import client as client_module
+
+SUPABASE_ENV = {'SUPABASE_URL': 'https://example.supabase.co', 'SUPABASE_KEY': 'test-key'}
+
+
+class PooledClientTests(SimpleTestCase):
+    def setUp(self):
+        client_module._reset_after_fork()
+
+    def tearDown(self):
+        client_module._reset_after_fork()
+
+    @patch.dict(os.environ, SUPABASE_ENV)
+    def test_client_is_reused_within_a_process(self):
+        first = client_module.get_supabase_client()
+        second = client_module.get_supabase_client()
+        self.assertIs(first, second)
+        self.assertEqual(client_module.get_pool_stats()['clients_created'], 1)
+
+    @patch.dict(os.environ, SUPABASE_ENV)
+    def test_client_is_rebuilt_in_a_forked_child(self):
+        parent = client_module.get_supabase_client()
+        with patch('storefront.client.os.getpid', return_value=os.getpid() + 1):
+            child = client_module.get_supabase_client()
+        self.assertIsNot(parent, child)
+
+    @patch.dict(os.environ, SUPABASE_ENV)
+    def test_auth_client_is_never_the_shared_client(self):
+        shared = client_module.get_supabase_client()
+        self.assertIsNot(client_module.get_supabase_auth_client(), shared)
+
+    @patch.dict(os.environ, {'SUPABASE_URL': '', 'SUPABASE_KEY': ''})
+    def test_missing_credentials_raise(self):
+        with self.assertRaises(ValueError):
+            client_module.get_supabase_client()
+
+    def test_pool_stats_shape(self):
+        stats = client_module.get_pool_stats()
+        for key in ('connections_open', 'connections_reused', 'requests_waiting'):
+            self.assertIn(key, stats)
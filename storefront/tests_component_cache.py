@@ -0,0 +1,51 @@
+import json
+from unittest.mock import patch
+from django.test import SimpleTestCase
+
+from storefront.tenants import _parse_business
+from storefront.utils.component_cache import ComponentTreeCache, build_prepared_components
+
+COMPONENTS = [
+    {'type': 'ProfileHeroComponent', 'title': 'Welcome'},
+    {'type': 'ProfileWebsiteThemeComponent', 'accentColor': '#123456'},
+    {'type': 'ProfileTabsComponent', 'tabs': [{'components': [{'type': 'ProfileServicesComponent'}]}]},
+    {'type': 'ProfileGalleryComponent', 'images': ['https://example.com/a.jpg']},
+]
+
+
+class ComponentTreeCacheTests(SimpleTestCase):
+    def test_layout_components_are_split_out(self):
+        prepared = build_prepared_components(json.dumps(COMPONENTS))
+        self.assertEqual(prepared['hero']['title'], 'Welcome')
+        self.assertEqual(prepared['theme']['accentColor'], '#123456')
+        self.assertEqual(prepared['tabs']['tabs'][0]['components'][0]['clean_type'], 'servicelist')
+        self.assertEqual([c['clean_type'] for c in prepared['other']], ['gallery'])
+        self.assertEqual(prepared['other'][0]['imageUrls'], ['https://example.com/a.jpg'])
+
+    def test_raw_components_are_not_mutated(self):
+        raw = [dict(c) for c in COMPONENTS]
+        build_prepared_components(raw)
+        self.assertNotIn('clean_type', raw[0])
+
+    def test_same_version_is_built_once(self):
+        cache = ComponentTreeCache()
+        business = _parse_business({'id': 'biz-1', 'components': json.dumps(COMPONENTS)})
+        with patch('storefront.utils.component_cache.build_prepared_components',
+                   wraps=build_prepared_components) as build:
+            first = cache.get(business)
+            second = cache.get(dict(business))
+        self.assertIs(first, second)
+        self.assertEqual(build.call_count, 1)
+
+    def test_edited_components_rebuild(self):
+        cache = ComponentTreeCache()
+        before = cache.get(_parse_business({'id': 'biz-1', 'components': json.dumps(COMPONENTS)}))
+        after = cache.get(_parse_business({'id': 'biz-1', 'components': json.dumps(COMPONENTS[:1])}))
+        self.assertIsNot(before, after)
+        self.assertIsNone(after['theme'])
+
+    def test_invalidate_drops_business_entries(self):
+        cache = ComponentTreeCache()
+        cache.get({'id': 'biz-1', 'components': COMPONENTS})
+        cache.invalidate('biz-1')
+        self.assertEqual(cache.stats()['entries'], 0)
@@ -0,0 +1,119 @@
+import shutil
+import tempfile
+from unittest.mock import MagicMock
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from storefront.utils.conditional import PageVersion, add_business, add_shop, conditional_page
+from storefront.utils.page_cache import anonymous_page_cache, purge_listing
+
+ROW = {'id': 'p1', 'updated_at': '2026-03-01T10:00:00+00:00'}
+
+
+class PageVersionTests(SimpleTestCase):
+    def test_etag_follows_the_parts(self):
+        first = PageVersion().add_row(ROW).etag
+        self.assertEqual(first, PageVersion().add_row(dict(ROW)).etag)
+        self.assertNotEqual(first, PageVersion().add_row({**ROW, 'updated_at': '2026-03-02T10:00:00+00:00'}).etag)
+        with override_settings(PAGE_VERSION_SALT='release-2'):
+            self.assertNotEqual(first, PageVersion().add_row(ROW).etag)
+
+    def test_last_modified_needs_a_timestamp_for_every_part(self):
+        version = PageVersion().add_row(ROW).add('x', modified='2026-03-05T00:00:00Z')
+        self.assertEqual(http_date(version.last_modified), 'Thu, 05 Mar 2026 00:00:00 GMT')
+        version.add_row({'id': 'lost-1', 'status': 'open'}, timestamp_column=None)
+        self.assertIsNone(version.last_modified)
+
+
+class ConditionalPageTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.renders = 0
+        self.row = dict(ROW)
+
+        @conditional_page(lambda request: PageVersion().add_row(self.row) if self.row else None)
+        def view(request):
+            self.renders += 1
+            return HttpResponse('page')
+        self.view = view
+
+    def test_validators_are_set_on_full_responses(self):
+        response = self.view(self.factory.get('/'))
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertEqual(response['Last-Modified'], 'Sun, 01 Mar 2026 10:00:00 GMT')
+
+    def test_matching_etag_is_answered_without_rendering(self):
+        etag = self.view(self.factory.get('/'))['ETag']
+        response = self.view(self.factory.get('/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.renders, 1)
+
+    def test_if_modified_since(self):
+        response = self.view(self.factory.get('/', HTTP_IF_MODIFIED_SINCE='Sun, 01 Mar 2026 10:00:00 GMT'))
+        self.assertEqual(response.status_code, 304)
+        response = self.view(self.factory.get('/', HTTP_IF_MODIFIED_SINCE='Sat, 28 Feb 2026 10:00:00 GMT'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_changed_row_renders_again(self):
+        etag = self.view(self.factory.get('/'))['ETag']
+        self.row['updated_at'] = '2026-03-02T10:00:00+00:00'
+        response = self.view(self.factory.get('/', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_row_skips_validators(self):
+        self.row = None
+        response = self.view(self.factory.get('/'))
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_cached_pages_answer_with_their_stored_validators(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, True)
+        with override_settings(CACHES={'default': {'BACKEND': 'core.cache.SQLiteCache', 'LOCATION': f'{tmpdir}/c.sqlite3'}}):
+            view = anonymous_page_cache(self.view)
+
+            def get(**headers):
+                request = self.factory.get('/', HTTP_HOST='myshop.localhost', **headers)
+                request.session, request.tenant = {}, {'id': 'biz-1'}
+                return view(request)
+
+            etag = get()['ETag']
+            response = get(HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual((response.status_code, response['X-Page-Cache']), (304, 'HIT'))
+            self.assertEqual(self.renders, 1)
+
+
+class TenantVersionTests(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, True)
+        override = override_settings(CACHES={'default': {
+            'BACKEND': 'core.cache.SQLiteCache', 'LOCATION': f'{tmpdir}/c.sqlite3',
+        }})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.business = {'id': 'biz-1', 'business_name': 'Shop', 'average_rating': 4.5, 'total_reviews': 2}
+
+    def etag(self, business):
+        return add_business(PageVersion(), business).etag
+
+    def test_profile_and_rating_edits_change_the_etag(self):
+        etag = self.etag(self.business)
+        self.assertEqual(etag, self.etag(dict(self.business)))
+        self.assertNotEqual(etag, self.etag({**self.business, 'business_name': 'New name'}))
+        self.assertNotEqual(etag, self.etag({**self.business, 'total_reviews': 3}))
+
+    def test_shop_version_reads_the_newest_post_without_counting(self):
+        supabase = MagicMock()
+        query = supabase.table.return_value.select.return_value
+        query.eq.return_value.order.return_value.limit.return_value.execute.return_value.data = [
+            {'updated_at': '2026-03-01T10:00:00+00:00'},
+        ]
+        etag = add_shop(PageVersion(), supabase, self.business).etag
+        supabase.table.return_value.select.assert_called_with('updated_at')
+
+        # Deleting an older post leaves the newest updated_at as it was
+        purge_listing('biz-1')
+        self.assertNotEqual(etag, add_shop(PageVersion(), supabase, self.business).etag)
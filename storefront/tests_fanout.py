@@ -0,0 +1,58 @@
+import contextvars
+import threading
+import time
+from django.test import SimpleTestCase
+
+from storefront.utils.fanout import fan_out
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+class FanOutTests(SimpleTestCase):
+    def test_queries_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        def query(value):
+            # Only passes if all three are in flight at the same time
+            barrier.wait()
+            return value
+
+        results = fan_out({name: (lambda n=name: query(n)) for name in ('a', 'b', 'c')})
+        self.assertEqual(results, {'a': 'a', 'b': 'b', 'c': 'c'})
+
+    def test_failure_degrades_to_default(self):
+        def broken():
+            raise RuntimeError('upstream down')
+
+        with self.assertLogs('storefront.utils.fanout', level='WARNING'):
+            results = fan_out({'ok': lambda: [1], 'news': broken}, defaults={'news': []})
+        self.assertEqual(results, {'ok': [1], 'news': []})
+
+    def test_required_failure_is_raised(self):
+        def broken():
+            raise RuntimeError('upstream down')
+
+        with self.assertRaises(RuntimeError):
+            fan_out({'ok': lambda: 1, 'businesses': broken})
+
+    def test_per_query_timeout(self):
+        started = time.monotonic()
+        with self.assertLogs('storefront.utils.fanout', level='WARNING'):
+            results = fan_out(
+                {'fast': lambda: 1, 'slow': (lambda: time.sleep(0.5) or 2, 0.05)},
+                defaults={'slow': None},
+            )
+        self.assertEqual(results, {'fast': 1, 'slow': None})
+        self.assertLess(time.monotonic() - started, 0.4)
+
+    def test_context_is_propagated(self):
+        request_id.set('req-1')
+        results = fan_out({'a': request_id.get, 'b': request_id.get})
+        self.assertEqual(results, {'a': 'req-1', 'b': 'req-1'})
+
+    def test_nested_fan_out_runs_inline(self):
+        def outer():
+            return fan_out({'x': lambda: 1, 'y': lambda: 2})
+
+        results = fan_out({'outer': outer, 'other': lambda: 3}, timeout=2)
+        self.assertEqual(results['outer'], {'x': 1, 'y': 2})
@@ -0,0 +1,67 @@
+import json
+from unittest.mock import MagicMock, patch
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.test import RequestFactory, SimpleTestCase
+
+from storefront.views.fragments import personal_fragments
+
+BUSINESS = {'id': 'biz-1', 'business_name': 'Shop', 'logo_url': ''}
+
+
+def _table(data=None, count=None):
+    query = MagicMock()
+    for method in ('select', 'eq', 'in_'):
+        getattr(query, method).return_value = query
+    query.execute.return_value = MagicMock(data=data, count=count)
+    return query
+
+
+class PersonalFragmentsTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get(self, session=None, products='p1,p2'):
+        request = self.factory.get('/_fragments/', {'products': products})
+        request.session = SessionStore()
+        request.session.update(session or {})
+        request.tenant = dict(BUSINESS)
+        self.request = request
+        return personal_fragments(request)
+
+    @patch('storefront.views.fragments.get_supabase_client')
+    def test_anonymous_visitor_gets_sign_in_chip_without_upstream_calls(self, mock_client):
+        response = self.get()
+        body = json.loads(response.content)
+        self.assertFalse(body['signed_in'])
+        self.assertEqual(body['wishlist'], [])
+        self.assertIn('Sign In', body['user_chip'])
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        # CsrfViewMiddleware sets the cookie the wishlist buttons post with
+        self.assertTrue(self.request.META.get('CSRF_COOKIE_NEEDS_UPDATE'))
+        mock_client.assert_not_called()
+
+    @patch('storefront.views.fragments.get_supabase_client')
+    def test_signed_in_visitor_gets_chip_wishlist_and_order_badge(self, mock_client):
+        tables = {
+            'nexususers': _table([{'id': 'u1', 'name': 'Ada', 'avatar_url': 'https://example.com/a.png'}]),
+            'wishlists': _table([{'user_id': 'u1', 'product_id': 'p2'}]),
+            'market_orders': _table([], count=3),
+        }
+        mock_client.return_value.table.side_effect = lambda name: tables[name]
+
+        body = json.loads(self.get(session={'user_id': 'u1', 'user_email': 'ada@example.com'}).content)
+        self.assertTrue(body['signed_in'])
+        self.assertEqual(body['wishlist'], ['p2'])
+        self.assertEqual(body['order_count'], 3)
+        self.assertIn('Ada', body['user_chip'])
+        self.assertIn('order-badge', body['user_chip'])
+        tables['wishlists'].in_.assert_called_once_with('product_id', ['p1', 'p2'])
+
+    @patch('storefront.views.fragments.get_supabase_client')
+    def test_failed_lookups_fall_back_to_session_name(self, mock_client):
+        mock_client.return_value.table.side_effect = RuntimeError('upstream down')
+        body = json.loads(self.get(session={'user_id': 'u1', 'user_email': 'ada@example.com'}).content)
+        self.assertTrue(body['signed_in'])
+        self.assertEqual((body['wishlist'], body['order_count']), ([], 0))
+        self.assertIn('ada@example.com', body['user_chip'])
@@ -0,0 +1,95 @@
+import threading
+from unittest.mock import patch
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from storefront.utils import hedging
+from storefront.utils.hedging import LatencyTracker, RetryBudget, get_hedging_stats, hedged_call
+
+
+@override_settings(HEDGE_MIN_DELAY=0.01)
+class HedgedCallTests(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(hedging, '_budget', RetryBudget(ratio=0.1, min_per_second=0, cap=5))
+        self.budget = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def endpoint(self, samples=hedging.MIN_SAMPLES):
+        name = f'posts-{self._testMethodName}'
+        for _ in range(samples):
+            hedging._tracker(name).record(0.005)
+        return name
+
+    def slow_then_fast(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            if len(calls) == 1:
+                self.release.wait(5)
+                return 'slow'
+            return 'fast'
+        return fn, calls
+
+    def test_slow_read_is_hedged_and_the_hedge_wins(self):
+        before = get_hedging_stats()
+        fn, calls = self.slow_then_fast()
+        self.assertEqual(hedged_call(fn, self.endpoint()), 'fast')
+        after = get_hedging_stats()
+        self.assertEqual(after['hedges_fired'] - before['hedges_fired'], 1)
+        self.assertEqual(after['hedges_won'] - before['hedges_won'], 1)
+        self.assertEqual(len(calls), 2)
+
+    def test_no_hedge_without_budget_or_while_the_breaker_is_not_closed(self):
+        self.budget.balance = 0
+        fn, calls = self.slow_then_fast()
+        threading.Timer(0.1, self.release.set).start()
+        self.assertEqual(hedged_call(fn, self.endpoint()), 'slow')
+
+        self.budget.balance = 5
+        self.release.clear()
+        fn, calls = self.slow_then_fast()
+        threading.Timer(0.1, self.release.set).start()
+        self.assertEqual(hedged_call(fn, self.endpoint(), may_amplify=lambda: False), 'slow')
+        self.assertEqual(len(calls), 1)
+
+    def test_no_hedge_before_latency_is_known(self):
+        fn, calls = self.slow_then_fast()
+        threading.Timer(0.1, self.release.set).start()
+        self.assertEqual(hedged_call(fn, self.endpoint(samples=0)), 'slow')
+
+    def test_transport_errors_are_retried_once_within_budget(self):
+        attempts = []
+
+        def fn():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise httpx.ReadError('connection reset')
+            return 'ok'
+        self.assertEqual(hedged_call(fn, self.endpoint()), 'ok')
+
+        def broken():
+            raise httpx.ReadError('connection reset')
+        self.budget.balance = 0
+        with self.assertRaises(httpx.ReadError):
+            hedged_call(broken, self.endpoint(samples=0))
+
+
+class BudgetAndTrackerTests(SimpleTestCase):
+    def test_budget_allows_about_ratio_extra_calls(self):
+        budget = RetryBudget(ratio=0.25, min_per_second=0, cap=1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        for _ in range(4):
+            budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+    def test_p95_needs_enough_samples(self):
+        tracker = LatencyTracker()
+        for i in range(1, hedging.MIN_SAMPLES):
+            tracker.record(i / 100)
+        self.assertIsNone(tracker.p95)
+        tracker.record(1.0)
+        self.assertEqual(tracker.p95, 0.19)
@@ -0,0 +1,73 @@
+import gzip
+from unittest.mock import patch
+import httpx
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import IdentityMapMiddleware
+from storefront.client import UpstreamTransport
+from storefront.utils.identity_map import request_scope
+
+URL = 'https://example.supabase.co/rest/v1/business_profiles'
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'identity-map-tests'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class IdentityMapTransportTests(SimpleTestCase):
+    def setUp(self):
+        self.sent = []
+
+        def upstream(transport, request):
+            self.sent.append((request.method, str(request.url)))
+            body = gzip.compress(b'[{"id": "biz-1"}]')
+            return httpx.Response(200, headers={'Content-Encoding': 'gzip', 'Content-Range': '0-0/1'},
+                                  content=body, request=request)
+
+        patcher = patch('httpx.HTTPTransport.handle_request', upstream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.http = httpx.Client(transport=UpstreamTransport())
+        self.addCleanup(self.http.close)
+
+    def test_identical_reads_in_a_scope_go_upstream_once(self):
+        with request_scope() as memo:
+            first = self.http.get(URL, params={'select': 'id', 'domain': 'eq.alpha'})
+            second = self.http.get(URL, params={'select': 'id', 'domain': 'eq.alpha'})
+            self.http.get(URL, params={'select': 'id,domain', 'domain': 'eq.alpha'})
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(second.headers['Content-Range'], '0-0/1')
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(memo.stats(), {'reads': 3, 'deduplicated': 1, 'upstream': 2, 'writes': 0,
+                                        'stale': 0, 'rejected': 0})
+
+    def test_writes_clear_the_map(self):
+        with request_scope():
+            self.http.get(URL, params={'id': 'eq.biz-1'})
+            self.http.patch(URL, params={'id': 'eq.biz-1'}, json={'business_name': 'New'})
+            self.http.get(URL, params={'id': 'eq.biz-1'})
+        self.assertEqual([method for method, _ in self.sent], ['GET', 'PATCH', 'GET'])
+
+    def test_no_memo_outside_a_scope_or_outside_postgrest(self):
+        self.http.get(URL)
+        self.http.get(URL)
+        with request_scope():
+            self.http.get('https://example.supabase.co/storage/v1/object/public/a.png')
+            self.http.get('https://example.supabase.co/storage/v1/object/public/a.png')
+        self.assertEqual(len(self.sent), 4)
+
+
+class IdentityMapMiddlewareTests(SimpleTestCase):
+    @override_settings(DEBUG=True, CACHES=LOCMEM)
+    @patch('httpx.HTTPTransport.handle_request',
+           lambda transport, request: httpx.Response(200, content=b'[]', request=request))
+    def test_reports_per_request_counters(self):
+        def view(request):
+            with httpx.Client(transport=UpstreamTransport()) as http:
+                for _ in range(3):
+                    http.get(URL)
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/')
+        response = IdentityMapMiddleware(view)(request)
+        self.assertEqual(response['X-Upstream-Reads'], 'upstream=1, deduplicated=2')
+        self.assertEqual(request.identity_map.stats()['deduplicated'], 2)
@@ -0,0 +1,189 @@
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from storefront.utils.page_cache import (
+    _acquire, anonymous_page_cache, normalize_query, page_cache_key, purge_product, purge_tenant,
+    shared_cache_page, tag_products,
+)
+
+TENANT = {'id': 'biz-1', 'components_version': 'v1'}
+
+
+class PageCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        override = override_settings(CACHES={'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': f'{self.tmpdir}/cache.sqlite3',
+        }}, PAGE_CACHE_ENABLED=True, PAGE_CACHE_TIMEOUT=60, PAGE_CACHE_GRACE=60,
+           PAGE_CACHE_LOCK_TIMEOUT=30, PAGE_CACHE_LOCK_WAIT=5)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+        self.factory = RequestFactory()
+        self.calls = 0
+
+        @anonymous_page_cache
+        def view(request):
+            self.calls += 1
+            tag_products(request, ['p1', 'p2'])
+            return HttpResponse(f'render {self.calls}')
+        self.view = view
+
+    def request(self, path='/', session=None, tenant=TENANT):
+        request = self.factory.get(path, HTTP_HOST='myshop.localhost')
+        request.session = session or {}
+        request.tenant = dict(tenant) if tenant else None
+        return request
+
+    def get(self, path='/', session=None, tenant=TENANT, view=None):
+        return (view or self.view)(self.request(path, session, tenant))
+
+
+class PageCacheTests(PageCacheTestCase):
+    def test_second_anonymous_hit_is_served_from_cache(self):
+        first = self.get()
+        second = self.get()
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+        self.assertEqual(second.content, b'render 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_replayed_pages_keep_vary_and_require_revalidation(self):
+        @anonymous_page_cache
+        def view(request):
+            response = HttpResponse('page')
+            response['Vary'] = 'Accept-Encoding'
+            return response
+        self.get(view=view)
+        response = self.get(view=view)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_logged_in_visitors_bypass_the_cache(self):
+        self.get()
+        response = self.get(session={'user_id': 'u1'})
+        self.assertEqual(response['X-Page-Cache'], 'BYPASS')
+        self.assertEqual(self.calls, 2)
+
+    def test_shell_pages_are_shared_with_logged_in_visitors(self):
+        @anonymous_page_cache(shell=True)
+        def shell_view(request):
+            self.calls += 1
+            return HttpResponse('shell')
+        self.get(view=shell_view)
+        response = self.get(view=shell_view, session={'user_id': 'u1'})
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.calls, 1)
+
+    def test_query_is_normalized(self):
+        self.assertEqual(normalize_query('b=2&utm_source=x&a=1&gclid=z'), 'a=1&b=2')
+        self.get('/?q=shoes&page=')
+        self.assertEqual(self.get('/?utm_medium=ad&q=shoes')['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.get('/?q=boots')['X-Page-Cache'], 'MISS')
+
+    def test_tenant_version_is_part_of_the_key(self):
+        self.get()
+        self.assertEqual(self.get(tenant={'id': 'biz-1', 'components_version': 'v2'})['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.get(tenant={'id': 'biz-2', 'components_version': 'v1'})['X-Page-Cache'], 'MISS')
+
+    def test_purge_tenant(self):
+        self.get()
+        purge_tenant('biz-2')
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+        purge_tenant('biz-1')
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+
+    def test_purge_product_expires_pages_that_show_it(self):
+        self.get()
+        purge_product('p3')
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+        purge_product('p2')
+        self.assertEqual(self.get()['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.get()['X-Page-Cache'], 'HIT')
+
+    def test_lock_failures_render_uncached(self):
+        locked = sqlite3.OperationalError('database is locked')
+        with patch('storefront.utils.page_cache._acquire', side_effect=locked):
+            response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'BYPASS')
+        self.assertEqual(response.content, b'render 1')
+
+    def test_pages_with_a_csrf_token_are_not_stored(self):
+        @anonymous_page_cache
+        def form_view(request):
+            return HttpResponse(f'<input value="{get_token(request)}">')
+        self.get(view=form_view)
+        self.assertEqual(self.get(view=form_view)['X-Page-Cache'], 'MISS')
+
+
+class StaleWhileRevalidateTests(PageCacheTestCase):
+    def stale_view(self):
+        @anonymous_page_cache(timeout=0, grace=60)
+        def view(request):
+            self.calls += 1
+            return HttpResponse(f'render {self.calls}')
+        return view
+
+    def test_stale_entry_is_served_while_another_request_rebuilds(self):
+        view = self.stale_view()
+        self.get(view=view)
+        lock = _acquire(page_cache_key(self.request(), TENANT))
+        self.assertIsNotNone(lock)
+        response = self.get(view=view)
+        self.assertEqual(response['X-Page-Cache'], 'STALE')
+        self.assertEqual(response.content, b'render 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_entry_is_rebuilt_by_the_first_request(self):
+        view = self.stale_view()
+        self.get(view=view)
+        response = self.get(view=view)
+        self.assertEqual(response['X-Page-Cache'], 'REFRESH')
+        self.assertEqual(response.content, b'render 2')
+
+    def test_concurrent_cold_misses_render_once(self):
+        @anonymous_page_cache
+        def slow_view(request):
+            time.sleep(0.3)
+            self.calls += 1
+            return HttpResponse('built')
+
+        statuses = []
+        threads = [threading.Thread(target=lambda: statuses.append(self.get(view=slow_view)['X-Page-Cache']))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(statuses), ['COALESCED', 'COALESCED', 'COALESCED', 'MISS'])
+
+    def test_shared_cache_page_serves_logged_in_visitors_too(self):
+        @shared_cache_page(60)
+        def feed(request):
+            self.calls += 1
+            return HttpResponse('<xml/>', content_type='application/xml')
+        self.get(view=feed, session={'user_id': 'u1'})
+        response = self.get(view=feed)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertEqual(self.calls, 1)
+
+    def test_shared_cache_page_hits_carry_cache_headers(self):
+        @shared_cache_page(60)
+        def feed(request):
+            return HttpResponse('<xml/>', content_type='application/xml')
+        self.get(view=feed)
+        response = self.get(view=feed)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertTrue(response.has_header('Expires'))
@@ -0,0 +1,81 @@
+from unittest.mock import MagicMock
+from django.test import SimpleTestCase
+from postgrest import SyncPostgrestClient
+
+from storefront.utils.pagination import _after, apply_keyset, decode_cursor, encode_cursor, fetch_page, scan
+
+
+def _posts_query():
+    return SyncPostgrestClient('http://localhost:54321/rest/v1').from_('posts').select('id,created_at')
+
+
+class KeysetPaginationTests(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        row = {'created_at': '2025-01-02T03:04:05.123+00:00', 'id': 'abc'}
+        self.assertEqual(decode_cursor(encode_cursor(row)), ('2025-01-02T03:04:05.123+00:00', 'abc'))
+
+    def test_malformed_cursor_is_rejected(self):
+        for token in (None, '', 'not-base64!', encode_cursor({'created_at': None, 'id': 'x'})):
+            self.assertIsNone(decode_cursor(token))
+
+    def test_first_page_only_orders(self):
+        params = apply_keyset(_posts_query(), None).request.params
+        self.assertEqual(params['order'], 'created_at.desc,id.desc')
+        self.assertNotIn('or', params)
+
+    def test_cursor_filters_after_last_row(self):
+        cursor = ('2025-01-02T03:04:05+00:00', 'abc')
+        params = apply_keyset(_posts_query(), cursor).request.params
+        self.assertEqual(
+            params['or'],
+            '(created_at.lt."2025-01-02T03:04:05+00:00",'
+            'and(created_at.eq."2025-01-02T03:04:05+00:00",id.lt."abc"))',
+        )
+
+    def _fake_query(self, rows):
+        query = MagicMock()
+        query.or_.return_value = query
+        query.order.return_value = query
+        query.limit.return_value = query
+        query.execute.return_value = MagicMock(data=rows)
+        return query
+
+    def test_fetch_page_reports_next_cursor(self):
+        rows = [{'created_at': f'2025-01-0{i}', 'id': str(i)} for i in (3, 2, 1)]
+        query = self._fake_query(rows)
+        page, next_cursor = fetch_page(query, None, limit=2)
+        query.limit.assert_called_once_with(3)
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(decode_cursor(next_cursor), ('2025-01-02', '2'))
+
+    def test_fetch_page_last_page(self):
+        rows = [{'created_at': '2025-01-01', 'id': '1'}]
+        page, next_cursor = fetch_page(self._fake_query(rows), None, limit=2)
+        self.assertEqual(page, rows)
+        self.assertIsNone(next_cursor)
+
+
+class ScanTests(SimpleTestCase):
+    def test_after_filter_for_composite_key(self):
+        self.assertEqual(
+            _after(('business_id', 'id'), ['b1', '7']),
+            'business_id.gt."b1",and(business_id.eq."b1",id.gt."7")',
+        )
+
+    def test_scan_pages_until_a_short_page(self):
+        pages = [[{'business_id': 'a', 'id': '1'}, {'business_id': 'a', 'id': '2'}], [{'business_id': 'b', 'id': '1'}]]
+        queries = []
+
+        def make_query():
+            query = MagicMock()
+            query.or_.return_value = query
+            query.order.return_value = query
+            query.limit.return_value = query
+            query.execute.return_value = MagicMock(data=pages[len(queries)])
+            queries.append(query)
+            return query
+
+        self.assertEqual(list(scan(make_query, ('business_id', 'id'), page_size=2)), pages)
+        self.assertEqual(len(queries), 2)
+        queries[0].or_.assert_not_called()
+        queries[1].or_.assert_called_once_with('business_id.gt."a",and(business_id.eq."a",id.gt."2")')
@@ -0,0 +1,72 @@
+from django.test import SimpleTestCase
+
+from storefront.utils.product_cards import product_card, product_category, product_image_urls
+
+FULL_ROW = {
+    'id': 'p1',
+    'title': 'Column title',
+    'price': 0,
+    'currency': 'UGX',
+    'stock_status': 'in_stock',
+    'data': {
+        'productName': 'Blue Shirt',
+        'productPrice': 25000,
+        'productCurrency': 'USD',
+        'images': [{'url': 'https://cdn.example.com/a.jpg'}, 'https://cdn.example.com/b.jpg'],
+        'thumbnailUrl': 'https://cdn.example.com/thumb.jpg',
+        'category': {'name': 'Shirts'},
+        'textContent': 'x' * 10000,
+    },
+}
+
+# Same product as returned by the PRODUCT_CARD projection (JSON-path extracts)
+CARD_ROW = {
+    'id': 'p1',
+    'title': 'Column title',
+    'price': 0,
+    'currency': 'UGX',
+    'stock_status': 'in_stock',
+    'productName': 'Blue Shirt',
+    'name': None,
+    'productPrice': 25000,
+    'productCurrency': 'USD',
+    'firstImage': {'url': 'https://cdn.example.com/a.jpg'},
+    'thumbnailUrl': 'https://cdn.example.com/thumb.jpg',
+    'imageUrl': None,
+    'videoUrl': None,
+    'categoryName': 'Shirts',
+}
+
+
+class ProductCardTests(SimpleTestCase):
+    def test_card_and_full_rows_agree(self):
+        self.assertEqual(product_card(CARD_ROW), product_card(FULL_ROW))
+
+    def test_card_fields(self):
+        card = product_card(CARD_ROW)
+        self.assertEqual(card['name'], 'Blue Shirt')
+        self.assertEqual(card['price'], 25000)
+        self.assertEqual(card['currency'], 'USD')
+        self.assertEqual(card['image_url'], 'https://cdn.example.com/a.jpg')
+        self.assertEqual(card['category'], 'Shirts')
+
+    def test_columns_fill_in_missing_json(self):
+        row = {'id': 'p2', 'title': 'Mug', 'price': 1500, 'currency': 'KES',
+               'productName': None, 'productPrice': None, 'productCurrency': None,
+               'firstImage': 'https://cdn.example.com/mug.jpg'}
+        card = product_card(row)
+        self.assertEqual((card['name'], card['price'], card['currency']), ('Mug', 1500, 'KES'))
+        self.assertEqual(card['image_url'], 'https://cdn.example.com/mug.jpg')
+
+    def test_image_falls_back_to_thumbnail(self):
+        row = dict(CARD_ROW, firstImage=None)
+        self.assertEqual(product_card(row)['image_url'], 'https://cdn.example.com/thumb.jpg')
+
+    def test_linked_category_wins(self):
+        row = dict(CARD_ROW, categories={'name': 'Tops'})
+        self.assertEqual(product_category(row), 'Tops')
+        self.assertEqual(product_category({'data': {}}), 'General')
+
+    def test_image_urls_skip_relative(self):
+        row = {'images': [{'url': '/local.jpg'}, 'https://cdn.example.com/b.jpg']}
+        self.assertEqual(product_image_urls(row), ['https://cdn.example.com/b.jpg'])
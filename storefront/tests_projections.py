@@ -0,0 +1,51 @@
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from storefront import projections
+from storefront.projections import BUSINESS_FULL, BUSINESS_HEADER, Projection, ProjectedRow, project
+
+
+class ProjectionTests(SimpleTestCase):
+    def setUp(self):
+        projections._warned.clear()
+
+    def test_projection_is_a_select_string(self):
+        self.assertEqual(Projection('P', ('id', 'name')), 'id,name')
+        extended = Projection('P', ('id',)).extend('categories(name)')
+        self.assertEqual(extended, 'id,categories(name)')
+        self.assertEqual(extended.name, 'P')
+
+    @override_settings(PROJECTION_CHECKS=False)
+    def test_rows_untouched_when_checks_off(self):
+        rows = [{'id': 1}]
+        self.assertIs(project(rows, BUSINESS_HEADER), rows)
+
+    @override_settings(PROJECTION_CHECKS=True)
+    def test_star_projection_is_never_wrapped(self):
+        row = {'id': 1}
+        self.assertIs(project(row, BUSINESS_FULL), row)
+
+    @override_settings(PROJECTION_CHECKS=True)
+    def test_unfetched_key_warns_once(self):
+        row = project({'id': 1, 'business_name': 'Shop'}, BUSINESS_HEADER)
+        self.assertIsInstance(row, ProjectedRow)
+        with self.assertLogs('storefront.projections', level='WARNING') as logs:
+            self.assertIsNone(row.get('components'))
+            row.get('components')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('BUSINESS_HEADER', logs.output[0])
+
+    @override_settings(PROJECTION_CHECKS=True)
+    def test_template_lookup_of_unfetched_key_warns(self):
+        rows = project([{'id': 1, 'business_name': 'Shop'}], BUSINESS_HEADER)
+        template = Template('{% for b in rows %}{{ b.business_name }}{{ b.components }}{% endfor %}')
+        with self.assertLogs('storefront.projections', level='WARNING') as logs:
+            html = template.render(Context({'rows': rows}))
+        self.assertEqual(html, 'Shop')
+        self.assertIn("'components'", logs.output[0])
+
+    @override_settings(PROJECTION_CHECKS=True)
+    def test_fetched_keys_and_dict_methods_are_silent(self):
+        row = project({'id': 1, 'business_name': 'Shop'}, BUSINESS_HEADER)
+        with self.assertNoLogs('storefront.projections', level='WARNING'):
+            Template('{{ b.business_name }}{% for k, v in b.items %}{{ k }}{% endfor %}').render(Context({'b': row}))
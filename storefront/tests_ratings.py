@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from postgrest.exceptions import APIError
+
+from storefront.utils import ratings
+from storefront.utils.pagination import decode_cursor, encode_cursor
+from storefront.utils.ratings import business_rating, get_review_aggregates
+from storefront.views.product import _same_category
+
+
+def fake_supabase(rows):
+    supabase = MagicMock()
+    supabase.table.return_value.select.return_value.in_.return_value.execute.return_value.data = rows
+    return supabase
+
+
+@override_settings(REVIEW_AGGREGATES_SERVER_SIDE=False)
+class ReviewAggregateTests(SimpleTestCase):
+    def test_aggregates_many_products_in_one_query(self):
+        supabase = fake_supabase([
+            {'product_id': 'a', 'rating': 4},
+            {'product_id': 'a', 'rating': 2},
+            {'product_id': 'b', 'rating': 5},
+        ])
+        result = get_review_aggregates(supabase, ['a', 'b', 'c', 'a'])
+        self.assertEqual(result['a'], {'count': 2, 'avg': 3})
+        self.assertEqual(result['b'], {'count': 1, 'avg': 5})
+        self.assertEqual(result['c'], {'count': 0, 'avg': 0})
+        supabase.table.assert_called_once_with('reviews')
+        supabase.table.return_value.select.return_value.in_.assert_called_once_with('product_id', ['a', 'b', 'c'])
+
+    def test_no_ids_means_no_query(self):
+        supabase = fake_supabase([])
+        self.assertEqual(get_review_aggregates(supabase, []), {})
+        supabase.table.assert_not_called()
+
+
+class ServerSideAggregateTests(SimpleTestCase):
+    def setUp(self):
+        ratings._server_aggregates = None
+
+    def tearDown(self):
+        ratings._server_aggregates = None
+
+    def test_uses_postgrest_aggregates(self):
+        supabase = fake_supabase([{'product_id': 'a', 'count': 2, 'avg': 3.5}])
+        result = get_review_aggregates(supabase, ['a', 'b'])
+        self.assertEqual(result, {'a': {'count': 2, 'avg': 3.5}, 'b': {'count': 0, 'avg': 0}})
+        supabase.table.return_value.select.assert_called_once_with('product_id,rating.count(),rating.avg()')
+
+    def test_disabled_aggregates_fall_back_for_the_process(self):
+        supabase = MagicMock()
+        disabled = APIError({'code': ratings.AGGREGATES_DISABLED, 'message': 'Use of aggregate functions is not allowed'})
+
+        def select(columns):
+            query = MagicMock()
+            if 'count()' in columns:
+                query.in_.return_value.execute.side_effect = disabled
+            else:
+                query.in_.return_value.execute.return_value.data = [{'product_id': 'a', 'rating': 4}]
+            return query
+
+        supabase.table.return_value.select.side_effect = select
+        self.assertEqual(get_review_aggregates(supabase, ['a'])['a'], {'count': 1, 'avg': 4})
+        self.assertIs(ratings._server_aggregates, False)
+
+        supabase.table.reset_mock()
+        get_review_aggregates(supabase, ['a'])
+        supabase.table.assert_called_once_with('reviews')
+
+    def test_business_rating_reads_denormalized_columns(self):
+        self.assertEqual(business_rating({'average_rating': '4.25', 'total_reviews': 8}), {'count': 8, 'avg': 4.25})
+        self.assertEqual(business_rating(None), {'count': 0, 'avg': 0.0})
+
+
+class UpdateRatingAggregatesCommandTests(SimpleTestCase):
+    def setUp(self):
+        ratings._server_aggregates = None
+
+    def _supabase(self, reviews, business_ids):
+        supabase = MagicMock()
+        updates = []
+
+        def table(name):
+            query = MagicMock()
+            for method in ('select', 'or_', 'order', 'limit', 'in_', 'eq'):
+                getattr(query, method).return_value = query
+            if name == 'reviews':
+                def execute():
+                    # Aggregate call vs. the watermark scan
+                    columns = query.select.call_args[0][0]
+                    if 'count()' in columns:
+                        return MagicMock(data=[{'product_id': 'biz-1', 'count': 2, 'avg': 4.5}])
+                    return MagicMock(data=reviews)
+                query.execute.side_effect = execute
+            else:
+                query.execute.return_value = MagicMock(data=[{'id': b} for b in business_ids])
+                query.update.side_effect = lambda values: updates.append(values) or query
+            return query
+
+        supabase.table.side_effect = table
+        return supabase, updates
+
+    def test_refreshes_touched_businesses_and_saves_watermark(self):
+        reviews = [
+            {'id': 'r1', 'product_id': 'biz-1', 'created_at': '2025-01-01T00:00:00+00:00'},
+            {'id': 'r2', 'product_id': 'post-9', 'created_at': '2025-01-02T00:00:00+00:00'},
+        ]
+        supabase, updates = self._supabase(reviews, ['biz-1'])
+        with tempfile.TemporaryDirectory() as tmp:
+            watermark = os.path.join(tmp, 'watermark.json')
+            with patch('storefront.management.commands.update_rating_aggregates.get_supabase_client', return_value=supabase):
+                call_command('update_rating_aggregates', watermark_file=watermark, stdout=MagicMock())
+            with open(watermark) as f:
+                saved = json.load(f)
+
+        self.assertEqual(updates, [{'average_rating': 4.5, 'total_reviews': 2}])
+        self.assertEqual(decode_cursor(saved['cursor']), ('2025-01-02T00:00:00+00:00', 'r2'))
+
+    def test_resumes_with_an_overlap_before_the_watermark(self):
+        supabase, _ = self._supabase([], [])
+        filters = []
+        table = supabase.table.side_effect
+
+        def recording_table(name):
+            query = table(name)
+            if name == 'reviews':
+                query.or_.side_effect = lambda expression: filters.append(expression) or query
+            return query
+        supabase.table.side_effect = recording_table
+
+        with tempfile.TemporaryDirectory() as tmp:
+            watermark = os.path.join(tmp, 'watermark.json')
+            with open(watermark, 'w') as f:
+                json.dump({'cursor': encode_cursor({'created_at': '2025-01-02T00:10:00+00:00', 'id': 'r2'})}, f)
+            with patch('storefront.management.commands.update_rating_aggregates.get_supabase_client',
+                       return_value=supabase):
+                call_command('update_rating_aggregates', watermark_file=watermark, stdout=MagicMock())
+
+        # Reviews committed late with an older created_at are picked up again; ids are uuids
+        self.assertEqual(filters, [
+            'created_at.gt."2025-01-02T00:00:00+00:00",'
+            'and(created_at.eq."2025-01-02T00:00:00+00:00",id.gt."00000000-0000-0000-0000-000000000000")'
+        ])
+
+
+class RelatedProductsTests(SimpleTestCase):
+    def test_linked_and_legacy_categories_match_by_id_then_name(self):
+        query = MagicMock()
+        _same_category(query, {'category_id': 'cat-1', 'data': {}})
+        query.eq.assert_called_once_with('category_id', 'cat-1')
+
+        query = MagicMock()
+        _same_category(query, {'data': {'category': {'name': 'Tops'}}})
+        query.eq.assert_called_once_with('data->category->>name', 'Tops')
+
+    def test_uncategorized_products_match_uncategorized_posts(self):
+        query = MagicMock()
+        _same_category(query, {'data': {}})
+        query.eq.assert_not_called()
+        query.is_.assert_called_once_with('category_id', 'null')
+        query.is_.return_value.is_.assert_called_once_with('data->category->>name', 'null')
@@ -0,0 +1,275 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from django.utils.dateparse import parse_datetime
+
+BUSINESSES = [
+    {'id': f'biz-{i}', 'domain': f'shop{i}', 'business_name': f'Shop {i}', 'created_at': '2026-01-01T00:00:00Z'}
+    for i in range(6)
+]
+
+
+def _posts(business_id):
+    return [{'id': f'{business_id}-p1', 'created_at': '2026-02-01T00:00:00Z', 'data': {'productName': 'Mug'}}]
+
+
+class FakeClient:
+    """business_profiles -> BUSINESSES; posts -> one product, optionally blocking for one business."""
+
+    def __init__(self, blocked=None):
+        self.blocked = blocked
+        self.release = threading.Event()
+
+    def table(self, name):
+        query = MagicMock()
+        filters = {}
+        for method in ('select', 'order', 'limit'):
+            getattr(query, method).return_value = query
+
+        def eq(column, value):
+            filters[column] = value
+            return query
+        query.eq.side_effect = eq
+
+        def execute():
+            if name == 'business_profiles':
+                return MagicMock(data=BUSINESSES)
+            if filters.get('business_id') == self.blocked:
+                self.release.wait(5)
+            return MagicMock(data=_posts(filters.get('business_id')))
+        query.execute.side_effect = execute
+        return query
+
+
+class ScanClient:
+    """Keyset pages: business_profiles by id, posts by `(business_id, id)`; counts posts reads."""
+
+    def __init__(self, posts, fail_after=None, businesses=BUSINESSES):
+        self.posts = sorted(posts, key=lambda p: (p['business_id'], p['id']))
+        self.fail_after = fail_after
+        self.businesses = businesses
+        self.posts_queries = 0
+
+    def table(self, name):
+        query = MagicMock()
+        state = {'after': None, 'limit': None, 'since': None, 'business_id': None, 'business_ids': None}
+        for method in ('select', 'order'):
+            getattr(query, method).return_value = query
+
+        def in_(column, values):
+            state['business_ids'] = set(values)
+            return query
+        query.in_.side_effect = in_
+
+        def eq(column, value):
+            state[column] = value
+            return query
+        query.eq.side_effect = eq
+
+        def gt(column, value):
+            state['since'] = parse_datetime(value)
+            return query
+        query.gt.side_effect = gt
+
+        def or_(expression):
+            # (business_id, id) keyset for --bulk, (id) within one business otherwise
+            composite = re.search(r'and\(business_id\.eq\."([^"]*)",id\.gt\."([^"]*)"\)', expression)
+            state['after'] = composite.groups() if composite else re.fullmatch(r'id\.gt\."([^"]*)"', expression).group(1)
+            return query
+
+        def limit(n):
+            state['limit'] = n
+            return query
+        query.or_.side_effect = or_
+        query.limit.side_effect = limit
+
+        def execute():
+            if name == 'business_profiles':
+                rows = [b for b in self.businesses if state['after'] is None or b['id'] > state['after']]
+                return MagicMock(data=sorted(rows, key=lambda b: b['id'])[:state['limit']])
+            self.posts_queries += 1
+            if self.fail_after is not None and self.posts_queries > self.fail_after:
+                raise RuntimeError('upstream down')
+            if isinstance(state['after'], tuple):
+                rows = [p for p in self.posts if (p['business_id'], p['id']) > state['after']]
+            else:
+                rows = [p for p in self.posts if state['after'] is None or p['id'] > state['after']]
+            if state['business_id'] is not None:
+                rows = [p for p in rows if p['business_id'] == state['business_id']]
+            if state['business_ids'] is not None:
+                rows = [p for p in rows if p['business_id'] in state['business_ids']]
+            if state['since'] is not None:
+                rows = [p for p in rows if parse_datetime(p['updated_at']) > state['since']]
+            return MagicMock(data=rows[:state['limit']])
+        query.execute.side_effect = execute
+        return query
+
+
+SCAN_POSTS = [
+    {'id': f'p{n}', 'business_id': business_id, 'updated_at': '2026-03-01T00:00:00Z',
+     'images': [f'https://cdn.example/{business_id}/{n}.jpg']}
+    for business_id, count in (('biz-0', 3), ('biz-3', 2), ('biz-gone', 2))
+    for n in range(count)
+]
+
+
+class GenerateStaticSitemapsTests(SimpleTestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, True)
+
+    def read(self, name):
+        path = os.path.join(self.output_dir, name)
+        with (gzip.open(path, 'rt', encoding='utf-8') if name.endswith('.gz') else open(path, encoding='utf-8')) as f:
+            return f.read()
+
+    def run_command(self, client, *args):
+        out = StringIO()
+        with patch('storefront.management.commands.generate_static_sitemaps.get_supabase_client', return_value=client):
+            call_command(
+                'generate_static_sitemaps', '--output-dir', self.output_dir, '--verbose',
+                '--watermark-file', os.path.join(self.output_dir, 'state', 'watermark.json'), *args, stdout=out,
+            )
+        with open(os.path.join(self.output_dir, 'metadata.json')) as f:
+            return out.getvalue(), json.load(f)
+
+    def test_workers_generate_every_business_with_ordered_output(self):
+        output, metadata = self.run_command(FakeClient(), '--workers', '3')
+        self.assertEqual((metadata['successful'], metadata['failed'], metadata['status']), (6, 0, 'success'))
+        self.assertEqual(metadata['workers'], 3)
+        lines = [line for line in output.splitlines() if line.strip().startswith('✓ shop')]
+        self.assertEqual([line.split(':')[0].strip() for line in lines], [f'✓ shop{i}' for i in range(6)])
+        self.assertIn('https://shop4.nexassearch.com/product/biz-4-p1/', self.read('shop4_sitemap_1.xml.gz'))
+
+    def test_slow_business_times_out_without_writing(self):
+        client = FakeClient(blocked='biz-2')
+        self.addCleanup(client.release.set)
+        output, metadata = self.run_command(client, '--workers', '2', '--timeout', '0.5')
+        client.release.set()
+        self.assertEqual((metadata['successful'], metadata['failed'], metadata['status']), (5, 1, 'partial'))
+        self.assertIn('shop2: timed out', output)
+        self.assertFalse([name for name in os.listdir(self.output_dir) if name.startswith('shop2_')])
+
+    def test_single_worker_keeps_the_sequential_path(self):
+        _, metadata = self.run_command(FakeClient())
+        self.assertEqual((metadata['successful'], metadata['workers']), (6, 1))
+
+    def test_bulk_scan_reads_posts_in_pages_not_per_business(self):
+        client = ScanClient(SCAN_POSTS)
+        _, metadata = self.run_command(client, '--bulk', '--page-size', '2')
+        # 7 posts in pages of 2: four round trips for all six businesses
+        self.assertEqual(client.posts_queries, 4)
+        self.assertEqual((metadata['successful'], metadata['failed'], metadata['mode']), (6, 0, 'bulk'))
+        xml = self.read('shop0_sitemap_1.xml.gz')
+        self.assertEqual(xml.count('<url>'), 4)
+        self.assertIn('https://cdn.example/biz-0/2.jpg', xml)
+        self.assertIn('<lastmod>2026-03-01</lastmod>', xml)
+        self.assertNotIn('<image:title>', xml)
+        self.assertEqual(self.read('shop1_sitemap_1.xml.gz').count('<url>'), 1)
+        self.assertFalse(any('gone' in name for name in os.listdir(self.output_dir)))
+
+    def test_bulk_scan_failure_fails_unfinished_businesses(self):
+        _, metadata = self.run_command(ScanClient(SCAN_POSTS, fail_after=1), '--bulk', '--page-size', '2')
+        self.assertEqual((metadata['successful'], metadata['failed']), (0, 6))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'shop0_sitemap.xml.gz')))
+
+    def test_incremental_run_regenerates_only_changed_businesses(self):
+        posts = [dict(post) for post in SCAN_POSTS]
+        self.run_command(ScanClient(posts), '--bulk')
+        shop0 = os.path.join(self.output_dir, 'shop0_sitemap_1.xml.gz')
+        os.utime(shop0, (0, 0))
+
+        output, metadata = self.run_command(ScanClient(posts))
+        self.assertTrue(metadata['incremental'])
+        self.assertEqual((metadata['successful'], metadata['unchanged']), (0, 6))
+
+        posts[4]['updated_at'] = '2099-01-01T00:00:00+00:00'  # a biz-3 post
+        output, metadata = self.run_command(ScanClient(posts))
+        self.assertEqual((metadata['successful'], metadata['unchanged']), (1, 5))
+        self.assertIn('✓ shop3: 3 URLs (2 products, 1 file(s))', output)
+        self.assertEqual(os.path.getmtime(shop0), 0)
+
+        _, metadata = self.run_command(ScanClient(posts), '--full')
+        self.assertEqual((metadata['successful'], metadata['incremental']), (6, False))
+
+    def test_incremental_bulk_run_scans_only_changed_businesses(self):
+        posts = [dict(post) for post in SCAN_POSTS]
+        self.run_command(ScanClient(posts), '--bulk')
+        posts[4]['updated_at'] = '2099-01-01T00:00:00+00:00'  # a biz-3 post
+
+        client = ScanClient(posts)
+        output, metadata = self.run_command(client, '--bulk', '--page-size', '2')
+        self.assertEqual((metadata['successful'], metadata['unchanged']), (1, 5))
+        self.assertIn('✓ shop3: 3 URLs (2 products, 1 file(s))', output)
+        # One page of changed posts, then biz-3's two posts (a full page, so one more read)
+        self.assertEqual(client.posts_queries, 3)
+
+    def test_deactivated_business_file_is_removed(self):
+        self.run_command(ScanClient(SCAN_POSTS))
+        _, metadata = self.run_command(ScanClient(SCAN_POSTS, businesses=BUSINESSES[:5]))
+        # shop5's index and its one shard
+        self.assertEqual((metadata['removed'], metadata['successful']), (2, 0))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'shop5_sitemap.xml.gz')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'shop4_sitemap.xml.gz')))
+        self.assertNotIn('shop5', self.read('sitemap_index.xml'))
+
+    def test_master_index_is_split_at_the_protocol_limit(self):
+        with patch('storefront.management.commands.generate_static_sitemaps.MAX_SITEMAPS', 4):
+            output, _ = self.run_command(FakeClient())
+        self.assertIn('Index split into 2 files: submit sitemap_index_2.xml too', output)
+        self.assertEqual(self.read('sitemap_index.xml').count('<sitemap>'), 4)
+        self.assertEqual(self.read('sitemap_index_2.xml').count('<sitemap>'), 2)
+
+        # Back under the limit: the continuation file goes away
+        self.run_command(FakeClient(), '--full')
+        self.assertEqual(self.read('sitemap_index.xml').count('<sitemap>'), 6)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'sitemap_index_2.xml')))
+
+    def test_temporary_files_of_a_crashed_run_are_swept(self):
+        for name in ('shop0_sitemap_1.xml.gz.tmp', 'shop0_sitemap.xml.gz.tmp', 'notes.tmp'):
+            with open(os.path.join(self.output_dir, name), 'w') as f:
+                f.write('partial')
+        _, metadata = self.run_command(ScanClient(SCAN_POSTS))
+        self.assertEqual(metadata['removed'], 2)
+        self.assertFalse([name for name in os.listdir(self.output_dir) if name.startswith('shop0') and name.endswith('.tmp')])
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'notes.tmp')))
+
+    def test_failed_business_is_retried_next_run(self):
+        client = FakeClient(blocked='biz-2')
+        self.addCleanup(client.release.set)
+        self.run_command(client, '--workers', '2', '--timeout', '0.5')
+        client.release.set()
+        _, metadata = self.run_command(ScanClient(SCAN_POSTS))
+        self.assertEqual((metadata['successful'], metadata['unchanged']), (1, 5))
+
+    def test_large_business_is_sharded_and_indexed(self):
+        posts = [
+            {'id': f'p{n:02d}', 'business_id': 'biz-1', 'updated_at': '2026-03-01T00:00:00Z', 'images': []}
+            for n in range(25)
+        ]
+        with open(os.path.join(self.output_dir, 'shop1_sitemap.xml'), 'w') as f:
+            f.write('old layout')
+        with patch('storefront.utils.sitemap_xml.MAX_URLS', 10):
+            output, metadata = self.run_command(ScanClient(posts), '--page-size', '7')
+        # home page + 25 products in shards of 10, nothing truncated
+        self.assertIn('✓ shop1: 26 URLs (25 products, 3 file(s))', output)
+        self.assertEqual([self.read(f'shop1_sitemap_{n}.xml.gz').count('<url>') for n in (1, 2, 3)], [10, 10, 6])
+        business_index = self.read('shop1_sitemap.xml.gz')
+        self.assertIn('https://shop1.nexassearch.com/sitemap-3.xml', business_index)
+        master = self.read('sitemap_index.xml')
+        self.assertIn('https://shop1.nexassearch.com/sitemap-2.xml', master)
+        self.assertIn('https://shop0.nexassearch.com/sitemap-1.xml', master)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'shop1_sitemap.xml')))
+
+        # A smaller rebuild drops the shards it no longer needs
+        self.run_command(ScanClient(posts[:5]), '--full')
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'shop1_sitemap_2.xml.gz')))
+        self.assertNotIn('sitemap-2.xml', self.read('sitemap_index.xml'))
@@ -0,0 +1,93 @@
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from xml.etree import ElementTree
+
+from unittest.mock import patch
+
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from storefront.utils.sitemap_xml import (
+    ShardedSitemap, save_gzip_index, write_sitemap_index, write_urlset,
+)
+from storefront.views import sitemap_static
+
+NS = {'sm': 'http://www.sitemaps.org/schemas/sitemap/0.9', 'image': 'http://www.google.com/schemas/sitemap-image/1.1'}
+
+
+class SitemapWriterTests(SimpleTestCase):
+    def test_urlset_escapes_text_and_writes_images(self):
+        out = io.StringIO()
+        count = write_urlset(out, [
+            {'loc': 'https://shop.example/?a=1&b=<2>', 'lastmod': '2026-01-31', 'priority': '0.8',
+             'images': [{'loc': 'https://cdn.example/1.jpg', 'title': 'Tom & "Jerry"'}, {'loc': 'https://cdn.example/2.jpg'}]},
+            {'loc': 'https://shop.example/product/1/'},
+        ])
+        self.assertEqual(count, 2)
+        self.assertIn('&amp;b=&lt;2&gt;', out.getvalue())
+        root = ElementTree.fromstring(out.getvalue())
+        urls = root.findall('sm:url', NS)
+        self.assertEqual(urls[0].find('sm:loc', NS).text, 'https://shop.example/?a=1&b=<2>')
+        self.assertEqual([i.find('image:title', NS) is not None for i in urls[0].findall('image:image', NS)], [True, False])
+        self.assertEqual(urls[0].find('image:image/image:title', NS).text, 'Tom & "Jerry"')
+        self.assertIsNone(urls[1].find('sm:lastmod', NS))
+
+    def test_index_writes_into_a_response(self):
+        response = HttpResponse(content_type='application/xml')
+        write_sitemap_index(response, ({'loc': f'https://s{i}.example/sitemap.xml', 'lastmod': '2026-01-01'} for i in range(3)))
+        root = ElementTree.fromstring(response.content)
+        self.assertEqual(len(root.findall('sm:sitemap', NS)), 3)
+
+    def test_sharded_sitemap_splits_at_limits_and_swaps_on_commit(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+
+        def read(number):
+            with gzip.open(os.path.join(directory, f'shop_sitemap_{number}.xml.gz'), 'rt') as f:
+                return ElementTree.fromstring(f.read())
+
+        sitemap = ShardedSitemap(directory, 'shop_sitemap', max_urls=4)
+        sitemap.extend({'loc': f'https://shop.example/product/{i}/'} for i in range(10))
+        self.assertEqual(sitemap.commit(), 3)
+        self.assertEqual([len(read(n).findall('sm:url', NS)) for n in (1, 2, 3)], [4, 4, 2])
+
+        # An unpublished rebuild leaves the old shards alone; a committed one replaces them
+        ShardedSitemap(directory, 'shop_sitemap').extend([{'loc': 'https://shop.example/'}]).discard()
+        self.assertEqual(len(read(1).findall('sm:url', NS)), 4)
+        smaller = ShardedSitemap(directory, 'shop_sitemap', max_bytes=400)
+        smaller.extend({'loc': f'https://shop.example/product/{i}/'} for i in range(6))
+        self.assertEqual(smaller.commit(), 2)
+        self.assertEqual(sorted(os.listdir(directory)), ['shop_sitemap_1.xml.gz', 'shop_sitemap_2.xml.gz'])
+
+
+class StaticSitemapServingTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        patcher = patch.object(sitemap_static, '_sitemaps_dir', return_value=self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        ShardedSitemap(self.directory, 'shop_sitemap').extend([{'loc': 'https://shop.example/'}]).commit()
+        save_gzip_index(os.path.join(self.directory, 'shop_sitemap.xml.gz'), [{'loc': 'https://shop.example/sitemap-1.xml'}])
+
+    def request(self, path, **headers):
+        request = RequestFactory().get(path, **headers)
+        request.subdomain = 'shop'
+        return request
+
+    def test_business_index_is_served_pre_gzipped(self):
+        response = sitemap_static.sitemap_products(self.request('/sitemap.xml', HTTP_ACCEPT_ENCODING='gzip, br'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertIn(b'https://shop.example/sitemap-1.xml', body)
+
+    def test_shard_is_decompressed_for_clients_without_gzip(self):
+        response = sitemap_static.sitemap_shard(self.request('/sitemap-1.xml'), 1)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn(b'<loc>https://shop.example/</loc>', response.content)
+        with self.assertRaises(Http404):
+            sitemap_static.sitemap_shard(self.request('/sitemap-2.xml'), 2)
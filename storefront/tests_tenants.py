@@ -0,0 +1,128 @@
+import time
+from unittest.mock import patch
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory
+
+from core.middleware import SubdomainMiddleware
+from storefront.tenants import TenantRegistry, RejectionCounter, get_tenant
+
+
+class TenantRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = []
+        self.businesses = {'alice': {'id': 'biz-1', 'domain': 'alice', 'components': '[{"type": "ProfileHeroComponent"}]'}}
+
+    def _fetch(self, domain):
+        self.calls.append(domain)
+        row = self.businesses.get(domain)
+        if row is None:
+            return None
+        from storefront.tenants import _parse_business
+        return _parse_business(dict(row))
+
+    def test_resolves_once_and_parses_components(self):
+        registry = TenantRegistry(ttl=60, fetch=self._fetch)
+        first = registry.resolve('alice')
+        second = registry.resolve('alice')
+        self.assertEqual(self.calls, ['alice'])
+        self.assertEqual(first['components'], [{'type': 'ProfileHeroComponent'}])
+        self.assertEqual(registry.stats()['hits'], 1)
+        # Each caller gets its own top-level dict
+        first['reviews_count'] = 3
+        self.assertNotIn('reviews_count', second)
+
+    def test_entries_expire_after_ttl(self):
+        registry = TenantRegistry(ttl=10, fetch=self._fetch)
+        with patch('storefront.tenants.time.monotonic', return_value=100.0):
+            registry.resolve('alice')
+        with patch('storefront.tenants.time.monotonic', return_value=111.0):
+            registry.resolve('alice')
+        self.assertEqual(self.calls, ['alice', 'alice'])
+
+    def test_lru_evicts_oldest(self):
+        self.businesses['bob'] = {'id': 'biz-2', 'domain': 'bob'}
+        registry = TenantRegistry(ttl=60, max_entries=1, fetch=self._fetch)
+        registry.resolve('alice')
+        registry.resolve('bob')
+        registry.resolve('alice')
+        self.assertEqual(self.calls, ['alice', 'bob', 'alice'])
+
+    def test_invalidate_by_business_id(self):
+        registry = TenantRegistry(ttl=60, fetch=self._fetch)
+        registry.resolve('alice')
+        self.assertTrue(registry.invalidate(business_id='biz-1'))
+        registry.resolve('alice')
+        self.assertEqual(self.calls, ['alice', 'alice'])
+
+    def test_upstream_errors_are_not_cached(self):
+        def broken(domain):
+            raise RuntimeError('boom')
+        registry = TenantRegistry(ttl=60, fetch=broken)
+        self.assertIsNone(registry.resolve('alice'))
+        self.assertEqual(registry.stats()['entries'], 0)
+
+    @patch('storefront.tenants.resolve_tenant', return_value={'id': 'biz-1'})
+    def test_get_tenant_resolves_without_middleware(self, mock_resolve):
+        request = RequestFactory().get('/')
+        request.subdomain = 'alice'
+        self.assertEqual(get_tenant(request), {'id': 'biz-1'})
+        get_tenant(request)
+        mock_resolve.assert_called_once_with('alice')
+
+    def test_unknown_domains_are_cached_negatively(self):
+        registry = TenantRegistry(ttl=60, negative_ttl=30, fetch=self._fetch)
+        self.assertIsNone(registry.resolve('ghost'))
+        self.assertIsNone(registry.resolve('ghost'))
+        self.assertEqual(self.calls, ['ghost'])
+        self.assertTrue(registry.is_missing('ghost'))
+        with patch('storefront.tenants.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertFalse(registry.is_missing('ghost'))
+
+    def test_negative_cache_is_bounded(self):
+        registry = TenantRegistry(ttl=60, negative_max_entries=2, fetch=self._fetch)
+        for domain in ('a', 'b', 'c'):
+            registry.resolve(domain)
+        self.assertEqual(registry.stats()['missing_entries'], 2)
+        self.assertFalse(registry.is_missing('a'))
+
+    def test_invalidate_clears_negative_entry(self):
+        registry = TenantRegistry(ttl=60, fetch=self._fetch)
+        registry.resolve('carol')
+        self.businesses['carol'] = {'id': 'biz-3', 'domain': 'carol'}
+        registry.invalidate(domain='carol')
+        self.assertEqual(registry.resolve('carol')['id'], 'biz-3')
+
+
+class SubdomainMiddlewareRejectionTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = TenantRegistry(ttl=60, fetch=lambda domain: {'id': 'biz-1'} if domain == 'alice' else None)
+        self.counter = RejectionCounter()
+        self.middleware = SubdomainMiddleware(lambda request: HttpResponse('view ran'))
+        self.factory = RequestFactory()
+
+    def _call(self, host, path='/'):
+        with patch('core.middleware.registry', self.registry), patch('core.middleware.rejections', self.counter):
+            return self.middleware(self.factory.get(path, HTTP_HOST=host))
+
+    def test_unknown_shop_is_rejected_before_the_view(self):
+        response = self._call('xyz.localhost')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotEqual(response.content, b'view ran')
+        self.assertEqual(self.counter.stats()['total'], 1)
+        self.assertEqual(self.counter.stats()['top_hosts'], {'xyz.localhost': 1})
+
+    def test_known_shop_reaches_the_view(self):
+        response = self._call('alice.localhost')
+        self.assertEqual(response.content, b'view ran')
+
+    def test_upstream_errors_fail_open(self):
+        def broken(domain):
+            raise RuntimeError('down')
+        self.registry = TenantRegistry(ttl=60, fetch=broken)
+        response = self._call('alice.localhost')
+        self.assertEqual(response.content, b'view ran')
+
+    def test_static_paths_and_exempt_subdomains_skip_lookup(self):
+        self.assertEqual(self._call('xyz.localhost', '/static/icon.png').content, b'view ran')
+        self.assertEqual(self._call('www.localhost').content, b'view ran')
+        self.assertEqual(self.counter.stats()['total'], 0)
@@ -0,0 +1,61 @@
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import SimpleTestCase, override_settings
+
+from storefront.tenants import TenantRegistry
+from storefront.utils.warmup import _render, warm_caches
+
+ROWS = [
+    {'id': 'biz-1', 'domain': 'alpha', 'components': '[{"type": "ProfileWebsiteThemeComponent"}]'},
+    {'id': 'biz-2', 'domain': 'beta', 'components': []},
+]
+
+
+@override_settings(WARM_CACHES_HOST='example.test')
+@patch('storefront.utils.warmup.top_businesses', return_value=[dict(r) for r in ROWS])
+class WarmCachesTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = TenantRegistry(fetch=MagicMock(return_value=None))
+        patcher = patch('storefront.utils.warmup.registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('storefront.utils.warmup._render')
+    def test_primes_tenants_and_renders_landing_plus_each_shop(self, render, _top):
+        render.side_effect = lambda host: (200, 'HIT' if host == 'beta.example.test' else 'MISS')
+        report = warm_caches(limit=2, concurrency=2)
+
+        self.assertEqual(self.registry.resolve('alpha')['id'], 'biz-1')
+        self.assertEqual(self.registry.stats()['misses'], 0)
+        self.assertEqual(sorted(call.args[0] for call in render.call_args_list),
+                         ['alpha.example.test', 'beta.example.test', 'example.test'])
+        self.assertEqual((report['tenants'], report['pages_rendered'], report['pages_already_cached']), (2, 2, 1))
+        self.assertEqual(report['errors'], 0)
+
+    @patch('storefront.utils.warmup._render', side_effect=RuntimeError('boom'))
+    def test_failed_pages_are_counted_not_raised(self, render, _top):
+        report = warm_caches(limit=2, concurrency=1)
+        self.assertEqual(report['errors'], 3)
+        self.assertEqual(report['tenants'], 2)
+
+    @patch('storefront.utils.warmup._render')
+    def test_command_reports_duration_and_entries(self, render, _top):
+        out = StringIO()
+        call_command('warm_caches', '--no-pages', stdout=out)
+        render.assert_not_called()
+        self.assertIn('Warmed 2 shops in', out.getvalue())
+        self.assertIn('entries primed', out.getvalue())
+
+
+class RenderTests(SimpleTestCase):
+    @patch('storefront.utils.warmup._get_handler')
+    def test_pages_go_through_the_handler_as_secure_requests(self, get_handler):
+        response = HttpResponse()
+        response['X-Page-Cache'] = 'MISS'
+        get_handler.return_value.get_response.return_value = response
+
+        self.assertEqual(_render('alpha.example.test'), (200, 'MISS'))
+        request = get_handler.return_value.get_response.call_args.args[0]
+        self.assertEqual((request.META['HTTP_HOST'], request.path, request.is_secure()), ('alpha.example.test', '/', True))
@@ -3,14 +3,14 @@ from . import views
 from django.urls import path
 # Import from the NEW files
 from .views.shop import shop_home
-from .views.shop import shop_home
+from .views.shop import shop_home, shop_products_more
 from .views.product import product_detail, category_view, create_order
 from .views.auth import login_view, logout_view, google_login_view, auth_callback_view, confirm_auth_view
 from .views.profile import profile_view
 from .views.contact import contact
 from .views.pages import contact_view as standalone_contact_view
 from .views.wishlist import toggle_wishlist, check_wishlist_status
-from .views.sitemap import sitemap_products  # Dynamic per-business sitemap
+from .views.sitemap_static import sitemap_products, sitemap_shard  # Static (gzipped) per-business sitemap, dynamic fallback
 from .views.sitemap_static import sitemap_index as sitemap_index_view  # Proper sitemapindex format
 from .views.robots import robots_txt
 from .views.order import order_confirmation
@@ -34,9 +34,13 @@ from .views.seo_views import (
     faq_view,
 )
 from .views.google_merchant import export_google_merchant_csv, export_google_merchant_xml
+from .views.metrics import internal_stats
+from .views.fragments import personal_fragments
+from .views.cache_webhook import cache_invalidate
 
 urlpatterns = [
     path('', shop_home, name='shop_home'),
+    path('products/more/', shop_products_more, name='shop_products_more'),
     path('contact/', standalone_contact_view, name='contact'),
     path('product/<uuid:product_id>/', product_detail, name='product_detail'),
     path('product/<uuid:product_id>/order/', create_order, name='create_order'),
@@ -71,9 +75,13 @@ urlpatterns = [
     path('support/', support_view, name='support'),
     path('join-business/', join_business_view, name='join_business'),
     path('sitemap.xml', sitemap_products, name='sitemap_products'),
+    path('sitemap-<int:number>.xml', sitemap_shard, name='sitemap_shard'),
     path('sitemap_index.xml', sitemap_index_view, name='sitemap_index'),
     path('robots.txt', robots_txt, name='robots_txt'),
     path('merchant/products.csv', export_google_merchant_csv, name='merchant_csv'),  # ✅ NEW
     path('merchant/products.xml', export_google_merchant_xml, name='merchant_xml'),  # ✅ NEW
+    path('_internal/stats/', internal_stats, name='internal_stats'),
+    path('_internal/cache/invalidate/', cache_invalidate, name='cache_invalidate'),
+    path('_fragments/', personal_fragments, name='personal_fragments'),
 ]
 # https://nexassearch.com/static/sitemaps/sitemap_index.xml
\ No newline at end of file
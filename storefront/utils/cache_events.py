@@ -0,0 +1,109 @@
+"""
+Database change events -> page cache purges.
+
+Events use the Supabase database webhook / `pg_net` payload shape:
+
+    {"type": "INSERT" | "UPDATE" | "DELETE", "table": "posts", "schema": "public",
+     "record": {...} | null, "old_record": {...} | null}
+
+`invalidations(event)` maps one event to the tags to purge (see
+utils/page_cache.py) and the tenants to invalidate; `apply(event)` performs
+them. Both the new and the old row are considered, so moving a product to
+another shop or renaming a domain clears both sides.
+"""
+import logging
+
+from ..tenants import invalidate_tenant
+from .page_cache import purge_tags
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class InvalidEvent(ValueError):
+    pass
+
+
+def build_event(table, type='UPDATE', record=None, old_record=None, schema='public'):
+    """An event in the webhook payload shape (used by `manage.py publish_cache_event`)."""
+    return {
+        'type': type,
+        'table': table,
+        'schema': schema,
+        'record': record if type != 'DELETE' else None,
+        'old_record': old_record if type != 'INSERT' else None,
+    }
+
+
+def _rows(event):
+    return [row for row in (event.get('record'), event.get('old_record')) if isinstance(row, dict)]
+
+
+def _posts(event, tags, tenants):
+    for row in _rows(event):
+        if row.get('id'):
+            tags.add(f"product:{row['id']}")
+        if row.get('business_id'):
+            tags.add(f"listing:{row['business_id']}")
+
+
+def _business_profiles(event, tags, tenants):
+    rows = _rows(event)
+    for row in rows:
+        if row.get('id') or row.get('domain'):
+            tenants.add((row.get('domain'), row.get('id')))
+    record, old = event.get('record') or {}, event.get('old_record') or {}
+    # The marketplace-wide sitemap index lists shops by domain
+    if (event['type'] != 'UPDATE' or record.get('domain') != old.get('domain')
+            or record.get('status') != old.get('status')):
+        tags.add('listing:all')
+
+
+def _reviews(event, tags, tenants):
+    for row in _rows(event):
+        if row.get('product_id'):
+            tags.add(f"product:{row['product_id']}")
+
+
+def _news_articles(event, tags, tenants):
+    for row in _rows(event):
+        if row.get('id'):
+            tags.add(f"news:{row['id']}")
+    tags.add('news')
+
+
+def _categories(event, tags, tenants):
+    tags.add('categories')
+
+
+HANDLERS = {
+    'posts': _posts,
+    'business_profiles': _business_profiles,
+    'reviews': _reviews,
+    'news_articles': _news_articles,
+    'categories': _categories,
+}
+
+
+def invalidations(event):
+    """`(tags, tenants)` for one event; tenants are `(domain, business_id)` pairs."""
+    if not isinstance(event, dict) or event.get('type') not in EVENT_TYPES or not event.get('table'):
+        raise InvalidEvent('Expected an object with "type" (INSERT/UPDATE/DELETE) and "table"')
+    tags, tenants = set(), set()
+    handler = HANDLERS.get(event['table'])
+    if handler is not None:
+        handler(event, tags, tenants)
+    return tags, tenants
+
+
+def apply(event):
+    """Purge what `event` invalidates; returns the purged tags (tenants as `tenant:<id>`)."""
+    tags, tenants = invalidations(event)
+    purge_tags(tags)
+    purged = set(tags)
+    for domain, business_id in tenants:
+        # Also drops the component tree and the tenant's pages (see apps.py)
+        invalidate_tenant(domain=domain, business_id=business_id)
+        purged.add(f'tenant:{business_id or domain}')
+    return sorted(purged)
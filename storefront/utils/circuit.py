@@ -0,0 +1,198 @@
+"""
+Circuit breakers for upstream (PostgREST) endpoints, with a stale-data fallback.
+
+When PostgREST slows down, every synchronous view waits on it and the
+gunicorn workers queue up behind them. The shared data client's transport
+(storefront/client.py) keeps one breaker per table or RPC endpoint. A breaker
+counts errors: transport errors, 5xx answers and calls slower than
+CIRCUIT_SLOW_CALL. Once CIRCUIT_FAILURE_THRESHOLD of them happen within
+CIRCUIT_WINDOW seconds it opens. While open, calls to that endpoint don't go
+upstream at all. After CIRCUIT_OPEN_SECONDS a single trial call is let
+through: success closes the breaker, failure keeps it open.
+
+Successful reads of FALLBACK_TABLES (tenant profiles, product cards,
+landing lists, categories) are remembered in the shared cache as
+last-known-good answers. A read that is rejected by an open breaker, or
+fails, is answered from there. The request is then marked stale (see
+IdentityMapMiddleware): its response carries `X-Served-Stale` and isn't
+page-cached. Without a fallback the call fails fast with CircuitOpenError.
+
+Breakers are per worker process; the fallback data is shared by all of them.
+The fallback only answers reads made inside a request scope, where the
+staleness can be recorded. Batch jobs (management commands) run inside
+`breakers_bypassed()`: their long scans must not trip breakers, and a failed
+read must fail the job rather than feed it old data.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Reads worth serving stale when upstream is unavailable
+FALLBACK_TABLES = {
+    'business_profiles', 'posts', 'categories', 'reviews',
+    'news_articles', 'lost_found_items', 'community_posts', 'swap_items',
+}
+
+# How often one worker rewrites the same last-known-good entry (seconds)
+FALLBACK_REFRESH = 60
+# Bulk reads (sitemap jobs, feeds) are too big to be worth keeping
+FALLBACK_MAX_BYTES = 256 * 1024
+_MAX_TRACKED_KEYS = 10000
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of calling an endpoint whose breaker is open (and no fallback exists)."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, window=30, slow_call=2.0, open_seconds=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self._failures = deque()
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """True if a call may go upstream now."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, duration=None, failed=False):
+        """Report the outcome of an allowed call."""
+        if not failed and duration is not None and duration > self.slow_call:
+            failed = True
+        with self._lock:
+            self._trial_running = False
+            now = time.monotonic()
+            if not failed:
+                if self.state != 'closed':
+                    logger.info(f"Circuit for {self.name} closed")
+                self.state = 'closed'
+                self._failures.clear()
+                return
+            self._failures.append(now)
+            while self._failures and self._failures[0] < now - self.window:
+                self._failures.popleft()
+            if self.state == 'half_open' or len(self._failures) >= self.failure_threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                    logger.warning(f"Circuit for {self.name} opened after {len(self._failures)} failures")
+                self.state = 'open'
+                self._opened_at = now
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'recent_failures': len(self._failures),
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+# Active breakers_bypassed() blocks in this process (all threads: jobs fan out to pools)
+_bypassed = 0
+
+
+def breakers_enabled():
+    return not _bypassed and getattr(settings, 'CIRCUIT_BREAKER_ENABLED', True)
+
+
+@contextmanager
+def breakers_bypassed():
+    """Send every upstream call straight through, with no breaker and no fallback, until the block exits."""
+    global _bypassed
+    with _breakers_lock:
+        _bypassed += 1
+    try:
+        yield
+    finally:
+        with _breakers_lock:
+            _bypassed -= 1
+
+
+def get_breaker(name):
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                    window=settings.CIRCUIT_WINDOW,
+                    slow_call=settings.CIRCUIT_SLOW_CALL,
+                    open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+                )
+    return breaker
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in sorted(breakers.items())}
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+# --- last-known-good answers ----------------------------------------------
+
+_saved_at = {}
+
+
+def _fallback_key(request_key):
+    return 'upstream:lkg:' + hashlib.sha256(repr(request_key).encode('utf-8')).hexdigest()
+
+
+def remember(request_key, entry):
+    """Keep a successful read as the fallback for the same read."""
+    if len(entry[2]) > FALLBACK_MAX_BYTES:
+        return
+    now = time.monotonic()
+    saved_at = _saved_at.get(request_key)
+    if saved_at is not None and now - saved_at < FALLBACK_REFRESH:
+        return
+    if len(_saved_at) > _MAX_TRACKED_KEYS:
+        _saved_at.clear()
+    _saved_at[request_key] = now
+    try:
+        cache.set(_fallback_key(request_key), entry, settings.CIRCUIT_FALLBACK_TTL)
+    except Exception as e:
+        logger.warning(f"Could not store fallback data: {e}")
+
+
+def last_known_good(request_key):
+    try:
+        return cache.get(_fallback_key(request_key))
+    except Exception as e:
+        logger.warning(f"Could not read fallback data: {e}")
+        return None
@@ -0,0 +1,123 @@
+"""
+Cache of normalized business component trees.
+
+`business_profiles.components` only changes when the owner edits their
+profile, yet every storefront view used to json-parse it, run
+normalize_component_data() over every component (recursing into tabs) and
+then scan it again for the hero, tabs and theme. The prepared structure is
+built once per business version and shared by all views of the worker.
+
+Entries are keyed by `(business_id, version)`, where the version is the
+profile's `updated_at` when present, otherwise a hash of the raw
+components, so an edited profile simply misses and rebuilds.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_TYPES = ('hero', 'tabbedcontent', 'webtheme')
+
+
+def components_version(business):
+    """Version tag for a business's components: `updated_at`, else a content hash."""
+    version = business.get('components_version') or business.get('updated_at')
+    if version:
+        return str(version)
+    raw = business.get('components')
+    if not isinstance(raw, str):
+        raw = json.dumps(raw or [], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _parse(raw):
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw) or []
+        except (TypeError, ValueError):
+            return []
+    return raw if isinstance(raw, list) else []
+
+
+def build_prepared_components(raw_components):
+    """Parse + normalize a components payload and split out the layout pieces."""
+    from ..views.shop import normalize_component_data
+
+    components = []
+    # Deep copy: normalization mutates in place and the raw list may be shared
+    for c in copy.deepcopy(_parse(raw_components)):
+        if not isinstance(c, dict):
+            continue
+        try:
+            components.append(normalize_component_data(c))
+        except Exception as e:
+            logger.warning(f"Failed to normalize component {c.get('type')}: {e}")
+
+    return {
+        'components': components,
+        'hero': next((c for c in components if c.get('clean_type') == 'hero'), None),
+        'tabs': next((c for c in components if c.get('clean_type') == 'tabbedcontent'), None),
+        'theme': next((c for c in components if c.get('clean_type') == 'webtheme'), None),
+        'other': [c for c in components if c.get('clean_type') not in LAYOUT_TYPES],
+    }
+
+
+class ComponentTreeCache:
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, business):
+        """
+        Prepared components for `business` (a business_profiles row).
+
+        The returned structure is shared between requests: read it, don't mutate it.
+        """
+        key = (str(business.get('id')), components_version(business))
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return prepared
+
+        self.misses += 1
+        prepared = build_prepared_components(business.get('components'))
+        with self._lock:
+            self._entries[key] = prepared
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return prepared
+
+    def invalidate(self, business_id):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == str(business_id)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+component_cache = ComponentTreeCache(max_entries=getattr(settings, 'COMPONENT_CACHE_MAX_ENTRIES', 500))
+
+
+def get_prepared_components(business):
+    return component_cache.get(business or {})
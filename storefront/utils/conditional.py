@@ -0,0 +1,165 @@
+"""
+Conditional GET (ETag / Last-Modified -> 304) for storefront pages.
+
+A decorated view first runs a cheap *version function* that selects only
+the version columns of the rows the page is rendered from, and answers
+`If-None-Match` / `If-Modified-Since` with a 304 before any template is
+rendered:
+
+    @conditional_page(_product_version)
+    def product_detail(request, product_id): ...
+
+The version function returns a `PageVersion` (or None to skip validators,
+e.g. when the row doesn't exist and the view is about to 404). The ETag is
+a hash of every part plus PAGE_VERSION_SALT (set it per release so template
+changes invalidate validators). Last-Modified is only sent when every part
+has a timestamp; rows without an `updated_at` contribute to the ETag only.
+
+`business_profiles` has no `updated_at`: a tenant's version is its page
+cache generation token plus a hash of the whole profile row (name, logo,
+contact details, rating columns, components), and its timestamp is when
+this node first saw that version. A shop's catalogue is its newest
+`posts.updated_at` plus its listing generation token, which the cache
+webhook bumps on every post insert, update and delete.
+
+Place it inside `@anonymous_page_cache`, so cached responses carry the
+validators of the render they came from (page_cache answers 304s for hits).
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .page_cache import listing_token, tenant_token
+
+logger = logging.getLogger(__name__)
+
+# How long the first-seen time of a tenant version is remembered (seconds)
+TENANT_SEEN_TTL = 60 * 60 * 24 * 30
+
+
+def parse_timestamp(value):
+    """Epoch seconds from a PostgREST timestamp string, or None."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+class PageVersion:
+    """Accumulates the version parts of one page."""
+
+    def __init__(self):
+        self.parts = []
+        self.timestamps = []
+        self.complete = True
+
+    def add(self, *values, modified=None):
+        """Add version values; `modified` is their timestamp (None if the row has none)."""
+        self.parts.extend(str(v) for v in values)
+        ts = modified if isinstance(modified, (int, float)) else parse_timestamp(modified)
+        if ts is None:
+            self.complete = False
+        else:
+            self.timestamps.append(ts)
+        return self
+
+    def add_row(self, row, timestamp_column='updated_at'):
+        """Add every selected column of `row` (a version-only projection)."""
+        return self.add(*(f'{k}={row[k]}' for k in sorted(row)), modified=row.get(timestamp_column))
+
+    def merge(self, other):
+        """Add the parts of another PageVersion (e.g. one built concurrently)."""
+        self.parts += other.parts
+        self.timestamps += other.timestamps
+        self.complete = self.complete and other.complete
+        return self
+
+    @property
+    def etag(self):
+        raw = '|'.join([getattr(settings, 'PAGE_VERSION_SALT', '')] + self.parts)
+        return quote_etag(hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32])
+
+    @property
+    def last_modified(self):
+        if not self.complete or not self.timestamps:
+            return None
+        return int(max(self.timestamps))
+
+
+def _row_hash(row):
+    raw = json.dumps(row, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def add_business(version, business):
+    """Add a tenant row's version (see module docstring)."""
+    token = tenant_token(business.get('id'))
+    tenant_version = f"{business.get('id')}:{token}:{_row_hash(business)}"
+    seen_key = 'conditional:seen:' + hashlib.sha1(tenant_version.encode('utf-8')).hexdigest()
+    cache.add(seen_key, time.time(), TENANT_SEEN_TTL)
+    return version.add(tenant_version, modified=cache.get(seen_key))
+
+
+def add_shop(version, supabase, business):
+    """Add a tenant plus its catalogue (see module docstring)."""
+    add_business(version, business)
+    business_id = business.get('id')
+    response = supabase.table('posts').select('updated_at')\
+        .eq('business_id', business_id)\
+        .order('updated_at', desc=True)\
+        .limit(1)\
+        .execute()
+    newest = (response.data or [{}])[0].get('updated_at')
+    return version.add(f'posts={newest}:{listing_token(business_id)}', modified=newest or 0)
+
+
+def add_reviews(version, supabase, product_id):
+    """Add a product's reviews: their count and the newest `created_at`."""
+    response = supabase.table('reviews').select('created_at', count='exact')\
+        .eq('product_id', str(product_id))\
+        .order('created_at', desc=True)\
+        .limit(1)\
+        .execute()
+    newest = (response.data or [{}])[0].get('created_at')
+    return version.add(f'reviews={response.count}:{newest}', modified=newest or 0)
+
+
+def set_validators(response, version):
+    if response.status_code in (200, 304) and not response.has_header('ETag'):
+        response['ETag'] = version.etag
+        if version.last_modified is not None:
+            response['Last-Modified'] = http_date(version.last_modified)
+    return response
+
+
+def conditional_page(version_func):
+    """Answer conditional GET/HEAD requests from `version_func(request, *args, **kwargs)`."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            try:
+                version = version_func(request, *args, **kwargs)
+            except Exception as e:
+                logger.warning(f"Could not compute page version for {request.path}: {e}")
+                version = None
+            if version is None:
+                return view(request, *args, **kwargs)
+
+            not_modified = get_conditional_response(request, etag=version.etag, last_modified=version.last_modified)
+            if not_modified is not None:
+                return set_validators(not_modified, version)
+            return set_validators(view(request, *args, **kwargs), version)
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+"""
+Run independent upstream queries concurrently.
+
+Views used to issue their Supabase queries one after another even when none
+depends on another, so page latency was the sum of every round trip.
+`fan_out()` submits them to a small per-worker thread pool (the shared httpx
+client is thread-safe) and waits for all of them, so latency is roughly the
+slowest query instead.
+
+    results = fan_out(
+        {
+            'news': lambda: supabase.table('news_articles').select('*').limit(4).execute().data or [],
+            'items': (lambda: ..., 3),   # (callable, per-query timeout)
+        },
+        defaults={'news': []},
+    )
+
+A query that fails or times out is logged and replaced by its entry in
+`defaults`, the same way the per-query try/except blocks degraded. Queries
+without a default are required: their error is re-raised to the view.
+
+Each query runs in a copy of the caller's context, so contextvars set for
+the request are visible inside it.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_THREAD_PREFIX = 'fanout'
+
+_lock = threading.Lock()
+_executor = None
+_owner_pid = None
+_counters = {'batches': 0, 'tasks': 0, 'failures': 0, 'timeouts': 0}
+
+
+def _get_executor():
+    """Per-process pool, created lazily so it never crosses a gunicorn fork."""
+    global _executor, _owner_pid
+    pid = os.getpid()
+    if _executor is not None and _owner_pid == pid:
+        return _executor
+    with _lock:
+        if _executor is None or _owner_pid != pid:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'FANOUT_MAX_WORKERS', 8),
+                thread_name_prefix=_THREAD_PREFIX,
+            )
+            _owner_pid = pid
+    return _executor
+
+
+def _reset_after_fork():
+    # Threads don't survive fork(); drop the parent's pool without joining it
+    global _executor, _owner_pid
+    _executor = None
+    _owner_pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _in_pool_thread():
+    return threading.current_thread().name.startswith(_THREAD_PREFIX + '_')
+
+
+def _split(task, default_timeout):
+    if isinstance(task, tuple):
+        fn, timeout = task
+        return fn, timeout if timeout is not None else default_timeout
+    return task, default_timeout
+
+
+def _fail(name, defaults, error, timed_out=False):
+    with _lock:
+        _counters['timeouts' if timed_out else 'failures'] += 1
+    if name not in defaults:
+        raise error
+    if timed_out:
+        logger.warning(f"Timed out fetching {name}")
+    else:
+        logger.warning(f"Could not fetch {name}: {error}")
+    return defaults[name]
+
+
+def fan_out(tasks, defaults=None, timeout=None):
+    """
+    Run `tasks` ({name: callable} or {name: (callable, timeout)}) concurrently.
+
+    Returns `{name: result}` in the order of `tasks`. `timeout` is the default
+    per-query limit in seconds (FANOUT_TIMEOUT); a timed-out query keeps running
+    in its thread but its result is discarded.
+    """
+    defaults = defaults or {}
+    if timeout is None:
+        timeout = getattr(settings, 'FANOUT_TIMEOUT', 10)
+
+    with _lock:
+        _counters['batches'] += 1
+        _counters['tasks'] += len(tasks)
+
+    results = {}
+
+    # Nested fan-outs would wait on the pool they are running in; run inline instead
+    if len(tasks) <= 1 or _in_pool_thread():
+        for name, task in tasks.items():
+            fn, _ = _split(task, timeout)
+            try:
+                results[name] = fn()
+            except Exception as e:
+                results[name] = _fail(name, defaults, e)
+        return results
+
+    executor = _get_executor()
+    started = time.monotonic()
+    pending = {}
+    for name, task in tasks.items():
+        fn, task_timeout = _split(task, timeout)
+        # One context copy per task: a Context can't be entered by two threads at once
+        ctx = contextvars.copy_context()
+        pending[name] = (executor.submit(ctx.run, fn), started + task_timeout)
+
+    for name, (future, deadline) in pending.items():
+        try:
+            results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError as e:
+            future.cancel()
+            results[name] = _fail(name, defaults, e, timed_out=True)
+        except Exception as e:
+            results[name] = _fail(name, defaults, e)
+    return results
+
+
+def get_fanout_stats():
+    with _lock:
+        stats = dict(_counters)
+    stats['max_workers'] = getattr(settings, 'FANOUT_MAX_WORKERS', 8)
+    stats['timeout'] = getattr(settings, 'FANOUT_TIMEOUT', 10)
+    return stats
@@ -0,0 +1,210 @@
+"""
+Hedged reads: cut the latency tail of idempotent PostgREST selects.
+
+p99 latency is dominated by the occasional slow response rather than by
+slow queries. For the tables listed in HEDGE_TABLES (opt-in), the shared
+data client's transport (storefront/client.py) sends a read and waits up
+to the endpoint's observed p95 latency. If no answer has arrived by then,
+it sends a duplicate and returns whichever finishes first. A read that
+fails with a transport error is retried once.
+
+Both hedges and retries draw from one process-wide budget: every read
+deposits HEDGE_BUDGET_RATIO of a token, each extra call withdraws a whole
+one, and HEDGE_BUDGET_MIN_PER_SECOND keeps a small floor for quiet
+periods. Extra calls are therefore capped at roughly that share of
+traffic, and none are sent while the endpoint's circuit breaker
+(utils/circuit.py) isn't closed, so an outage is never amplified.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per endpoint, and how many are needed before hedging
+SAMPLE_SIZE = 200
+MIN_SAMPLES = 20
+
+_lock = threading.Lock()
+_executor = None
+_owner_pid = None
+_trackers = {}
+_counters = {'reads': 0, 'hedges_fired': 0, 'hedges_won': 0, 'retries': 0, 'over_budget': 0}
+
+
+class LatencyTracker:
+    """Recent latencies of one endpoint."""
+
+    def __init__(self, size=SAMPLE_SIZE):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._p95 = None
+        self._since_update = 0
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._since_update += 1
+            # Re-sorting on every read would cost more than it tells us
+            if self._p95 is None or self._since_update >= 20:
+                self._since_update = 0
+                if len(self._samples) >= MIN_SAMPLES:
+                    ordered = sorted(self._samples)
+                    self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+
+    @property
+    def p95(self):
+        return self._p95
+
+
+class RetryBudget:
+    """Token bucket shared by hedges and retries."""
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, cap=20.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.cap = cap
+        self.balance = cap
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.cap, self.balance + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            now = time.monotonic()
+            self.balance = min(self.cap, self.balance + (now - self._updated) * self.min_per_second)
+            self._updated = now
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+_budget = None
+
+
+def get_budget():
+    global _budget
+    if _budget is None:
+        with _lock:
+            if _budget is None:
+                _budget = RetryBudget(
+                    ratio=getattr(settings, 'HEDGE_BUDGET_RATIO', 0.1),
+                    min_per_second=getattr(settings, 'HEDGE_BUDGET_MIN_PER_SECOND', 1.0),
+                )
+    return _budget
+
+
+def _get_executor():
+    """Per-process pool, created lazily so it never crosses a gunicorn fork."""
+    global _executor, _owner_pid
+    pid = os.getpid()
+    if _executor is not None and _owner_pid == pid:
+        return _executor
+    with _lock:
+        if _executor is None or _owner_pid != pid:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'HEDGE_MAX_WORKERS', 8),
+                thread_name_prefix='hedge',
+            )
+            _owner_pid = pid
+    return _executor
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def _tracker(endpoint):
+    tracker = _trackers.get(endpoint)
+    if tracker is None:
+        with _lock:
+            tracker = _trackers.setdefault(endpoint, LatencyTracker())
+    return tracker
+
+
+def hedging_enabled(endpoint):
+    return endpoint.split('/')[0] in getattr(settings, 'HEDGE_TABLES', ())
+
+
+def _extra_call_allowed(may_amplify):
+    if not may_amplify():
+        return False
+    if not get_budget().withdraw():
+        _count('over_budget')
+        return False
+    return True
+
+
+def hedged_call(fn, endpoint, may_amplify=lambda: True):
+    """
+    Run `fn` (an idempotent read) with hedging and one retry.
+
+    `may_amplify()` says whether an extra call is acceptable right now
+    (the endpoint's breaker is closed).
+    """
+    tracker = _tracker(endpoint)
+    get_budget().deposit()
+    _count('reads')
+
+    def attempt():
+        started = time.monotonic()
+        result = fn()
+        tracker.record(time.monotonic() - started)
+        return result
+
+    delay = tracker.p95
+    if delay is None:
+        # Not enough samples yet: plain call, retried once on a transport error
+        try:
+            return attempt()
+        except httpx.TransportError:
+            if not _extra_call_allowed(may_amplify):
+                raise
+            _count('retries')
+            return attempt()
+
+    executor = _get_executor()
+    first = executor.submit(attempt)
+    done, _ = wait([first], timeout=max(delay, getattr(settings, 'HEDGE_MIN_DELAY', 0.05)))
+    if done:
+        if not isinstance(first.exception(), httpx.TransportError) or not _extra_call_allowed(may_amplify):
+            return first.result()
+        _count('retries')
+        return attempt()
+
+    if not _extra_call_allowed(may_amplify):
+        return first.result()
+    _count('hedges_fired')
+    second = executor.submit(attempt)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    _count('hedges_won')
+                return future.result()
+            error = error or future.exception()
+    raise error
+
+
+def get_hedging_stats():
+    with _lock:
+        stats = dict(_counters)
+        trackers = dict(_trackers)
+    stats['budget_balance'] = round(get_budget().balance, 2)
+    stats['tables'] = sorted(getattr(settings, 'HEDGE_TABLES', ()))
+    stats['p95'] = {name: round(t.p95, 4) for name, t in sorted(trackers.items()) if t.p95 is not None}
+    return stats
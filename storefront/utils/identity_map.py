@@ -0,0 +1,107 @@
+"""
+Request-scoped identity map for upstream (PostgREST) reads.
+
+Within one request the same row is often fetched more than once: the
+tenant profile by `_get_business_context` and again by `user_id` in
+`profile_view`, the business and product on every `create_order` POST,
+`_get_business_context` on each error branch of the login views.
+
+While a scope is active (IdentityMapMiddleware opens one per request), the
+shared data client's transport (storefront/client.py) answers an identical
+read - same table, filters, projection and headers, i.e. the same URL - with
+the response it already received, instead of calling upstream again. Any
+write clears the map, so a read after an insert or update sees fresh data.
+
+    with request_scope() as memo:
+        ...
+    memo.stats()  # {'reads': 5, 'deduplicated': 2, 'upstream': 3}
+
+The scope lives in a contextvar, so fan_out() queries share it too. It
+also records reads answered with stale fallback data and calls rejected by
+an open circuit breaker (utils/circuit.py).
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('identity_map', default=None)
+
+# Only PostgREST reads are memoized (not auth or storage)
+MEMO_PATH_PREFIX = '/rest/v1/'
+
+# Headers that vary per call without changing the result
+_IGNORED_HEADERS = {'content-length', 'user-agent', 'x-client-info', 'connection', 'accept-encoding'}
+
+
+def request_key(request):
+    """Identity of an upstream call: method, URL and the headers that affect the result."""
+    headers = tuple(sorted(
+        (name.lower(), value) for name, value in request.headers.items()
+        if name.lower() not in _IGNORED_HEADERS
+    ))
+    return request.method, str(request.url), headers
+
+
+class IdentityMap:
+    """Responses of the reads made in one request, keyed by method, URL and headers."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.deduplicated = 0
+        self.writes = 0
+        self.stale = 0
+        self.rejected = 0
+
+    def get(self, key):
+        with self._lock:
+            self.reads += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.deduplicated += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+
+    def clear(self):
+        """Forget every read (called on writes)."""
+        with self._lock:
+            self.writes += 1
+            self._entries.clear()
+
+    def mark_stale(self):
+        with self._lock:
+            self.stale += 1
+
+    def mark_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def stats(self):
+        return {
+            'reads': self.reads,
+            'deduplicated': self.deduplicated,
+            'upstream': self.reads - self.deduplicated,
+            'writes': self.writes,
+            'stale': self.stale,
+            'rejected': self.rejected,
+        }
+
+
+def current_map():
+    """The identity map of the active scope, or None outside one."""
+    return _current.get()
+
+
+@contextmanager
+def request_scope():
+    """Memoize identical upstream reads until the block exits."""
+    memo = IdentityMap()
+    token = _current.set(memo)
+    try:
+        yield memo
+    finally:
+        _current.reset(token)
@@ -0,0 +1,393 @@
+"""
+Full-page cache for anonymous storefront requests.
+
+Most storefront traffic is anonymous browsing, and every hit used to
+re-render the page from upstream. Views decorated with `@anonymous_page_cache`
+store the rendered response in the shared cache (see core/cache.py) and
+serve it to the next anonymous visitor of the same URL.
+
+The key is built from host, path, the normalized query string and the
+tenant version: the tenant's generation token plus its components version,
+so editing the profile or purging the tenant moves every page of the shop to
+new keys. Entries also record the generation token of each tag they carry
+(the products they show via `tag_products`, `listing:<business>` for product
+grids, ...); purging a tag changes its token, and any page carrying it
+misses on the next read:
+
+    purge_tenant(business_id)    # every page of one shop
+    purge_product(product_id)    # product page + listings that include it
+    purge_listing(business_id)   # the shop's grids, sitemaps and feeds
+
+views/cache_webhook.py calls these when the database reports a change.
+
+Only GET/HEAD requests without a logged-in session are served from or
+stored in the cache, and only 200 responses that set no cookies are stored
+(so pages that render a CSRF token are never shared). Pages split into a
+shared shell plus per-visitor fragments (`shell=True`) and
+`@shared_cache_page` responses are served to every visitor. Pages keep the
+view's `Vary` and go out with `Cache-Control: no-cache` unless the view set
+its own (`@shared_cache_page` sends a max-age).
+
+Expiry doesn't stampede upstream. An entry stays in the cache for a grace
+window after it goes stale; the first request to see it stale takes a
+rebuild lock (an atomic `add`, so it holds across threads and workers) and
+re-renders, while everyone else keeps getting the stale copy. On a cold miss
+the lock holder renders and concurrent requests for the same key wait for
+its entry instead of rendering it too.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from functools import wraps
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_response_headers
+from django.utils.http import parse_http_date_safe
+
+from ..tenants import get_tenant
+from .component_cache import components_version
+from .identity_map import current_map
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change the rendered page
+IGNORED_QUERY_PARAMS = {'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga'}
+
+# Session keys that mark a logged-in visitor (see views/auth.py)
+SESSION_USER_KEYS = ('user_id', 'user_email')
+
+# Response headers that belong to one visitor and must not be replayed
+PRIVATE_HEADERS = {'set-cookie'}
+
+
+def _cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def normalize_query(query_string):
+    """Sorted, tracking-free query string: `?b=2&utm_source=x&a=1` and `?a=1&b=2` share a key."""
+    params = [
+        (key, value)
+        for key, value in parse_qsl(query_string, keep_blank_values=False)
+        if not key.startswith('utm_') and key not in IGNORED_QUERY_PARAMS
+    ]
+    return urlencode(sorted(params))
+
+
+# --- generation tokens ----------------------------------------------------
+
+# Tags are "<kind>:<id>": tenant:<business id>, product:<post id>,
+# listing:<business id> (grids, sitemaps, feeds of one shop), listing:all
+# (marketplace-wide indexes) and the global `categories` (pages that show
+# category names).
+
+def _generation_key(tag):
+    return f'pagecache:gen:{tag}'
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def _tokens(tags):
+    """
+    Current token for each tag, creating missing ones.
+
+    A token that was evicted comes back as a fresh value, which can only
+    turn entries stored under the old one into misses, never revive them.
+    """
+    cache = _cache()
+    keys = {_generation_key(tag): tag for tag in tags}
+    found = cache.get_many(keys.keys())
+    for key in keys.keys() - found.keys():
+        cache.add(key, _new_token(), None)
+    if len(found) < len(keys):
+        found = cache.get_many(keys.keys())
+    return {keys[key]: token for key, token in found.items()}
+
+
+def tenant_token(business_id):
+    """Current generation token of a tenant (None if the cache is unavailable)."""
+    tag = f'tenant:{business_id}'
+    return _tokens([tag]).get(tag)
+
+
+def listing_token(business_id):
+    """Current generation token of a shop's listings (changes with any of its posts)."""
+    tag = f'listing:{business_id}'
+    return _tokens([tag]).get(tag)
+
+
+def purge_tags(tags):
+    """Expire every cached page tagged with any of `tags`."""
+    cache = _cache()
+    for tag in tags:
+        cache.set(_generation_key(tag), _new_token(), None)
+
+
+def purge_tenant(business_id):
+    """Expire every cached page of one business."""
+    if business_id:
+        purge_tags([f'tenant:{business_id}'])
+
+
+def purge_product(product_id):
+    """Expire every cached page that shows one product."""
+    if product_id:
+        purge_tags([f'product:{product_id}'])
+
+
+def purge_listing(business_id):
+    """Expire one shop's listings (product grids, sitemaps, feeds), e.g. after a product is added."""
+    if business_id:
+        purge_tags([f'listing:{business_id}'])
+
+
+# --- request helpers ------------------------------------------------------
+
+def tag_page(request, *tags):
+    """Record tags on the page being rendered so purging any of them reaches it."""
+    page_tags = getattr(request, '_page_cache_tags', None)
+    if page_tags is not None:
+        page_tags.update(tags)
+
+
+def tag_products(request, product_ids):
+    """Record the products a view rendered so their purge reaches this page."""
+    tag_page(request, *(f'product:{pid}' for pid in product_ids if pid))
+
+
+def is_anonymous(request):
+    session = getattr(request, 'session', None)
+    if session is not None and any(session.get(key) for key in SESSION_USER_KEYS):
+        return False
+    return 'HTTP_AUTHORIZATION' not in request.META
+
+
+def page_cache_key(request, tenant=None):
+    """Key for this URL and tenant version, or None if the tenant version is unavailable."""
+    tenant_part = '-'
+    if tenant:
+        business_id = tenant.get('id')
+        token = tenant_token(business_id)
+        if token is None:
+            return None
+        tenant_part = f'{business_id}:{token}:{components_version(tenant)}'
+    raw = '|'.join([
+        request.scheme,
+        request.get_host(),
+        request.path,
+        normalize_query(request.META.get('QUERY_STRING', '')),
+        tenant_part,
+    ])
+    return 'pagecache:page:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _tags_current(entry):
+    tags = entry.get('tags') or {}
+    return not tags or _tokens(tags) == tags
+
+
+def _patch_freshness(response, max_age):
+    """
+    `max_age` for `@shared_cache_page` responses. Other pages get `no-cache`
+    unless the view chose its own Cache-Control: they carry validators, and
+    without explicit freshness browsers and proxies would cache them heuristically.
+    """
+    if max_age is not None:
+        patch_response_headers(response, max_age)
+    elif not response.has_header('Cache-Control'):
+        patch_cache_control(response, no_cache=True)
+
+
+def _to_response(request, entry, status, max_age=None):
+    """The cached page, or a 304 if it carries validators the client already has."""
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    # Entries are stored without Expires/max-age: they are relative to the time served
+    _patch_freshness(response, max_age)
+    if response.has_header('ETag') or response.has_header('Last-Modified'):
+        response = get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+            response=response,
+        )
+    response['X-Page-Cache'] = status
+    return response
+
+
+def _cacheable(request, response):
+    return (
+        request.method == 'GET'
+        and response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # get_token() was called: the page embeds a per-visitor CSRF token
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not _rendered_from_stale_data()
+    )
+
+
+def _rendered_from_stale_data():
+    # Built from fallback data while a circuit breaker was open (utils/circuit.py)
+    memo = current_map()
+    return memo is not None and (memo.stale or memo.rejected)
+
+
+def _store(key, request, response, timeout, grace):
+    tags = getattr(request, '_page_cache_tags', set())
+    now = time.time()
+    entry = {
+        'status': response.status_code,
+        'headers': [(h, v) for h, v in response.items() if h.lower() not in PRIVATE_HEADERS],
+        'content': response.content,
+        'tags': _tokens(tags) if tags else {},
+        'stored_at': now,
+        'fresh_until': now + timeout,
+    }
+    # Kept past its freshness for the grace window, when it may be served stale
+    _cache().set(key, entry, timeout + grace)
+
+
+# --- single flight --------------------------------------------------------
+
+def _acquire(key):
+    """Take the rebuild lock for `key`; `add` is atomic across threads and workers."""
+    token = _new_token()
+    if _cache().add(f'{key}:lock', token, settings.PAGE_CACHE_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(key, token):
+    lock_key = f'{key}:lock'
+    if _cache().get(lock_key) == token:
+        _cache().delete(lock_key)
+
+
+def _wait_for_entry(key):
+    """Poll for the entry another request is building; None if it doesn't show up in time."""
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    delay = 0.02
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
+        entry = _cache().get(key)
+        if entry and entry['fresh_until'] > time.time() and _tags_current(entry):
+            return entry
+        if not _cache().has_key(f'{key}:lock'):
+            # The builder gave up (error or uncacheable response): build it ourselves
+            return None
+    return None
+
+
+def _lookup(key):
+    """`(entry, fresh)` for a usable entry, else `(None, False)`."""
+    entry = _cache().get(key)
+    if not entry or not _tags_current(entry):
+        return None, False
+    return entry, entry['fresh_until'] > time.time()
+
+
+def _page_cache(view, timeout, grace, anonymous_only, headers, listing):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        page_timeout = timeout if timeout is not None else settings.PAGE_CACHE_TIMEOUT
+        page_grace = grace if grace is not None else settings.PAGE_CACHE_GRACE
+
+        def render(status, key=None):
+            response = view(request, *args, **kwargs)
+            if key and _cacheable(request, response):
+                try:
+                    _store(key, request, response, page_timeout, page_grace)
+                except Exception as e:
+                    logger.warning(f"Page cache write failed for {request.path}: {e}")
+            _patch_freshness(response, page_timeout if headers else None)
+            response['X-Page-Cache'] = status
+            return response
+
+        if (not getattr(settings, 'PAGE_CACHE_ENABLED', True)
+                or request.method not in ('GET', 'HEAD')
+                or (anonymous_only and not is_anonymous(request))):
+            return render('BYPASS')
+
+        try:
+            tenant = get_tenant(request)
+            key = page_cache_key(request, tenant)
+            entry, fresh = _lookup(key) if key else (None, False)
+        except Exception as e:
+            logger.warning(f"Page cache read failed for {request.path}: {e}")
+            return render('BYPASS')
+        if not key:
+            return render('BYPASS')
+
+        def replay(entry, status):
+            return _to_response(request, entry, status, page_timeout if headers else None)
+
+        if entry and fresh:
+            return replay(entry, 'HIT')
+
+        request._page_cache_tags = set()
+        if listing:
+            # Marketplace-wide listings (sitemap index of all shops) use `listing:all`
+            tag_page(request, f"listing:{tenant.get('id') if tenant else 'all'}")
+        try:
+            lock = _acquire(key)
+            waited = None if lock or entry else _wait_for_entry(key)
+        except Exception as e:
+            logger.warning(f"Page cache lock failed for {request.path}: {e}")
+            return render('BYPASS')
+        if lock is None:
+            if entry:
+                # Someone is already rebuilding it: serve the stale copy meanwhile
+                return replay(entry, 'STALE')
+            if waited:
+                return replay(waited, 'COALESCED')
+        try:
+            return render('REFRESH' if entry else 'MISS', key)
+        finally:
+            if lock:
+                try:
+                    _release(key, lock)
+                except Exception as e:
+                    # The lock expires after PAGE_CACHE_LOCK_TIMEOUT anyway
+                    logger.warning(f"Page cache unlock failed for {request.path}: {e}")
+    return wrapper
+
+
+def anonymous_page_cache(view_func=None, timeout=None, grace=None, shell=False, listing=False):
+    """
+    Serve anonymous GET/HEAD requests of the view from the shared page cache.
+
+    `shell=True` is for views that never read the session and leave the
+    per-visitor parts to /_fragments/ (views/fragments.py): their page is
+    the same for everyone, so logged-in visitors are served from the cache too.
+    `listing=True` marks a product listing of the tenant (see purge_listing).
+
+    Responses carry `X-Page-Cache`: HIT, MISS, BYPASS, STALE (served during
+    the grace window while another request rebuilds the page), REFRESH (this
+    request rebuilt a stale page) or COALESCED (waited for a concurrent build).
+    """
+    def decorator(view):
+        return _page_cache(view, timeout, grace, anonymous_only=not shell, headers=False, listing=listing)
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
+
+
+def shared_cache_page(timeout, grace=None, listing=False):
+    """
+    Drop-in for Django's `@cache_page` on responses that are the same for every
+    visitor (sitemaps, merchant feeds): shared cache, tenant-versioned keys,
+    stale-while-revalidate and single flight.
+    """
+    def decorator(view):
+        return _page_cache(view, timeout, grace, anonymous_only=False, headers=True, listing=listing)
+    return decorator
@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination over `(created_at, id)`.
+
+Offset pagination gets slower with every page and skips or repeats rows
+when products are added between requests. A keyset page instead continues
+strictly after the last row the client saw:
+
+    rows, next_cursor = fetch_page(query, cursor, limit=24)
+
+`query` is an unexecuted PostgREST select (filters applied, no order/limit);
+`cursor` is the opaque token returned with the previous page, or None for the
+first page. `next_cursor` is None on the last page.
+
+Batch jobs that read a whole table use `scan()`, which walks any unique key
+tuple in ascending order one page at a time:
+
+    for rows in scan(lambda: supabase.table('posts').select(...), ('business_id', 'id')):
+        ...
+"""
+import base64
+import binascii
+import json
+
+
+def encode_cursor(row):
+    """Opaque token pointing just after `row`."""
+    raw = json.dumps([row.get('created_at'), str(row.get('id'))], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """`(created_at, id)` from a token, or None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        return None
+    return created_at, row_id
+
+
+def _quote(value):
+    # Timestamps contain ':' and '.', which are reserved inside PostgREST or=()
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def apply_keyset(query, cursor, descending=True):
+    """Order newest first (or oldest first) and, given a decoded cursor, keep only rows after it."""
+    if cursor:
+        created_at, row_id = cursor
+        op = 'lt' if descending else 'gt'
+        query = query.or_(
+            f"created_at.{op}.{_quote(created_at)},"
+            f"and(created_at.eq.{_quote(created_at)},id.{op}.{_quote(row_id)})"
+        )
+    return query.order('created_at', desc=descending).order('id', desc=descending)
+
+
+def fetch_page(query, cursor, limit, descending=True):
+    """Execute one page: returns `(rows, next_cursor)`."""
+    response = apply_keyset(query, cursor, descending).limit(limit + 1).execute()
+    rows = response.data or []
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
+
+
+def _after(keys, values):
+    """PostgREST `or=()` body keeping rows strictly after `values` in `keys` order."""
+    terms = []
+    for i, key in enumerate(keys):
+        conditions = [f"{k}.eq.{_quote(v)}" for k, v in zip(keys[:i], values[:i])]
+        conditions.append(f"{key}.gt.{_quote(values[i])}")
+        terms.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+    return ','.join(terms)
+
+
+def scan(make_query, keys, page_size=1000):
+    """
+    Yield every row of a query in pages of `page_size`, ordered by `keys` ascending.
+
+    `make_query()` returns a fresh unexecuted select (filters applied, no
+    order/limit); builders are mutable, so each page needs a new one. `keys`
+    must identify a row uniquely. Only one page is held at a time.
+    """
+    last = None
+    while True:
+        query = make_query()
+        if last is not None:
+            query = query.or_(_after(keys, last))
+        for key in keys:
+            query = query.order(key)
+        rows = query.limit(page_size).execute().data or []
+        if rows:
+            yield rows
+        if len(rows) < page_size:
+            return
+        last = [str(rows[-1].get(key)) for key in keys]
@@ -0,0 +1,126 @@
+"""
+Listing fields (name, price, currency, image...) from a `posts` row.
+
+Listing queries select the PRODUCT_CARD family of projections, which pull
+the denormalized `title`/`price`/`currency`/`stock_status` columns plus a
+handful of JSON-path extracts (`productName:data->>productName`,
+`firstImage:data->images->0`, ...) instead of the whole `data` blob. The
+extracts are aliased to their `data` key, so the helpers here read a card
+row and a full row (with `data`) the same way.
+
+The JSON values win over the denormalized columns, matching what the pages
+showed before; the columns fill in when the JSON lacks a value.
+"""
+import json
+
+DEFAULT_CURRENCY = 'UGX'
+
+
+def _data(row):
+    data = row['data'] if 'data' in row else None
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except (TypeError, ValueError):
+            data = None
+    return data if isinstance(data, dict) else {}
+
+
+def data_value(row, key, default=None):
+    """`data->key` from a JSON-path extract on the row, else from the `data` blob."""
+    if key in row:
+        value = row[key]
+    else:
+        value = _data(row).get(key)
+    return default if value is None else value
+
+
+def _image_url(image):
+    if isinstance(image, dict):
+        return image.get('url')
+    return str(image) if image else None
+
+
+def _first_image(row):
+    if 'firstImage' in row:
+        return row['firstImage']
+    images = data_value(row, 'images')
+    if isinstance(images, list) and images:
+        return images[0]
+    return None
+
+
+def product_image(row):
+    """First gallery image, then the thumbnail, then the legacy `imageUrl`."""
+    return (_image_url(_first_image(row))
+            or data_value(row, 'thumbnailUrl')
+            or data_value(row, 'imageUrl'))
+
+
+def product_image_urls(row, limit=3):
+    """Absolute gallery image URLs (for sitemaps); needs `images` on the row."""
+    images = data_value(row, 'images')
+    if not isinstance(images, list):
+        return []
+    urls = []
+    for image in images[:limit]:
+        url = _image_url(image)
+        if url and isinstance(url, str) and url.startswith('http'):
+            urls.append(url)
+    return urls
+
+
+def product_name(row, default='Untitled'):
+    return (data_value(row, 'productName')
+            or data_value(row, 'name')
+            or row.get('title')
+            or data_value(row, 'title')
+            or default)
+
+
+def product_price(row):
+    price = data_value(row, 'productPrice')
+    if price is None:
+        price = row.get('price')
+    return price if price is not None else 0
+
+
+def product_currency(row):
+    return data_value(row, 'productCurrency') or row.get('currency') or DEFAULT_CURRENCY
+
+
+def product_category(row, default='General'):
+    """Name of the linked `categories` row, else the legacy `data.category.name`."""
+    linked = row['categories'] if 'categories' in row else None
+    if isinstance(linked, dict) and linked.get('name'):
+        return linked['name']
+    if 'categoryName' in row:
+        return row['categoryName'] or default
+    category = data_value(row, 'category')
+    if isinstance(category, dict):
+        return category.get('name') or default
+    return default
+
+
+def product_card(row, validate_currency=None, default_name='Untitled'):
+    """
+    Template-ready card for a product listing.
+
+    `validate_currency` optionally normalizes the currency code (the product
+    views pass their ISO 4217 validator).
+    """
+    name = product_name(row, default=default_name)
+    currency = product_currency(row)
+    if validate_currency:
+        currency = validate_currency(currency)
+    return {
+        'id': row.get('id'),
+        'name': name,
+        'productName': name,
+        'price': product_price(row),
+        'currency': currency,
+        'image_url': product_image(row),
+        'video_url': data_value(row, 'videoUrl'),
+        'category': product_category(row),
+        'stock_status': row.get('stock_status'),
+    }
@@ -0,0 +1,88 @@
+"""
+Review aggregates (count + average rating).
+
+Businesses: `business_profiles.average_rating` / `total_reviews`, kept up to
+date by the `update_rating_aggregates` command, so pages read them off the
+tenant row without touching `reviews`.
+
+Products: one server-side aggregate call (`rating.count()`, `rating.avg()`
+grouped by `product_id`). PostgREST only allows aggregates when
+`db-aggregates-enabled` is on; if the project rejects them we fall back, for
+the rest of the process, to fetching the `(product_id, rating)` rows of all
+ids in one query and folding them here.
+"""
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# PostgREST error code for "aggregate functions are disabled"
+AGGREGATES_DISABLED = 'PGRST123'
+
+# None = not tried yet in this process, then True/False
+_server_aggregates = None
+
+
+def business_rating(business):
+    """`{'count', 'avg'}` from a business_profiles row's denormalized columns."""
+    business = business or {}
+    return {
+        'count': int(business.get('total_reviews') or 0),
+        'avg': float(business.get('average_rating') or 0),
+    }
+
+
+def _server_side_aggregates(supabase, ids):
+    response = supabase.table('reviews')\
+        .select('product_id,rating.count(),rating.avg()')\
+        .in_('product_id', ids)\
+        .execute()
+    return {
+        str(row.get('product_id')): {'count': int(row.get('count') or 0), 'avg': float(row.get('avg') or 0)}
+        for row in response.data or []
+    }
+
+
+def _folded_aggregates(supabase, ids):
+    response = supabase.table('reviews').select('product_id,rating').in_('product_id', ids).execute()
+
+    totals = {}
+    for row in response.data or []:
+        pid = str(row.get('product_id'))
+        count, total = totals.get(pid, (0, 0))
+        totals[pid] = (count + 1, total + (row.get('rating') or 0))
+
+    return {pid: {'count': count, 'avg': total / count if count else 0} for pid, (count, total) in totals.items()}
+
+
+def get_review_aggregates(supabase, product_ids):
+    """
+    Return `{product_id: {'count': n, 'avg': x}}` for every id, in a single query.
+
+    Ids without reviews map to a zero count/average.
+    """
+    global _server_aggregates
+
+    ids = [str(pid) for pid in dict.fromkeys(product_ids) if pid]
+    aggregates = {pid: {'count': 0, 'avg': 0} for pid in ids}
+    if not ids:
+        return aggregates
+
+    computed = None
+    if _server_aggregates is not False and getattr(settings, 'REVIEW_AGGREGATES_SERVER_SIDE', True):
+        try:
+            computed = _server_side_aggregates(supabase, ids)
+            _server_aggregates = True
+        except Exception as e:
+            if getattr(e, 'code', None) == AGGREGATES_DISABLED:
+                logger.info("PostgREST aggregates are disabled; folding review rows locally")
+                _server_aggregates = False
+            else:
+                logger.warning(f"Server-side review aggregate failed, folding rows instead: {e}")
+
+    if computed is None:
+        computed = _folded_aggregates(supabase, ids)
+
+    aggregates.update(computed)
+    return aggregates
@@ -0,0 +1,243 @@
+"""
+Streaming sitemap writers.
+
+Sitemaps used to be built as a list of up to 50,000 URL dicts and rendered
+with `render_to_string`, holding every entry and the whole document in
+memory and paying template overhead per node. These writers emit each entry
+as it is added, to anything with a `write()` method: an open file, an
+`HttpResponse`, a buffer.
+
+    writer = UrlsetWriter(response)
+    writer.add({'loc': url, 'lastmod': '2026-01-31', 'images': [{'loc': image_url}]})
+    writer.close()
+
+URL entries are dicts with `loc` and optional `lastmod`, `changefreq`,
+`priority` and `images` (dicts with `loc` and an optional `title`, for the
+image extension). `ShardedSitemap` writes a urlset to disk as gzipped
+shards within the protocol limits, swapped in atomically.
+"""
+import gzip
+import os
+from xml.sax.saxutils import escape
+
+URLSET_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+)
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+INDEX_CLOSE = '</sitemapindex>\n'
+
+# Protocol limits per sitemap file (the byte limit is on uncompressed XML)
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+# ... and per sitemap index file
+MAX_SITEMAPS = 50000
+
+# The sitemap protocol asks for all five XML entities to be escaped
+_ENTITIES = {'"': '&quot;', "'": '&apos;'}
+
+
+def _text(value):
+    return escape(str(value), _ENTITIES)
+
+
+def render_url(url):
+    """One `<url>` element."""
+    parts = [f"  <url>\n    <loc>{_text(url['loc'])}</loc>\n"]
+    for tag in ('lastmod', 'changefreq', 'priority'):
+        if url.get(tag):
+            parts.append(f"    <{tag}>{_text(url[tag])}</{tag}>\n")
+    for image in url.get('images') or ():
+        parts.append(f"    <image:image>\n      <image:loc>{_text(image['loc'])}</image:loc>\n")
+        if image.get('title'):
+            parts.append(f"      <image:title>{_text(image['title'])}</image:title>\n")
+        parts.append("    </image:image>\n")
+    parts.append("  </url>\n")
+    return ''.join(parts)
+
+
+def render_sitemap(sitemap):
+    """One `<sitemap>` element of an index."""
+    lastmod = f"    <lastmod>{_text(sitemap['lastmod'])}</lastmod>\n" if sitemap.get('lastmod') else ''
+    return f"  <sitemap>\n    <loc>{_text(sitemap['loc'])}</loc>\n{lastmod}  </sitemap>\n"
+
+
+class _Writer:
+    opening = closing = ''
+
+    def __init__(self, out):
+        self.out = out
+        self.count = 0
+        self.closed = False
+        out.write(self.opening)
+
+    def _render(self, entry):
+        raise NotImplementedError
+
+    def add(self, entry):
+        self.out.write(self._render(entry))
+        self.count += 1
+
+    def extend(self, entries):
+        for entry in entries:
+            self.add(entry)
+        return self
+
+    def close(self):
+        if not self.closed:
+            self.out.write(self.closing)
+            self.closed = True
+
+
+class UrlsetWriter(_Writer):
+    """Writes a `<urlset>` one URL at a time."""
+    opening, closing = URLSET_OPEN, URLSET_CLOSE
+
+    def _render(self, entry):
+        return render_url(entry)
+
+
+class SitemapIndexWriter(_Writer):
+    """Writes a `<sitemapindex>` one sitemap at a time."""
+    opening, closing = INDEX_OPEN, INDEX_CLOSE
+
+    def _render(self, entry):
+        return render_sitemap(entry)
+
+
+def write_urlset(out, urls):
+    """Write a complete urlset; returns the number of URLs."""
+    writer = UrlsetWriter(out).extend(urls)
+    writer.close()
+    return writer.count
+
+
+def write_sitemap_index(out, sitemaps):
+    """Write a complete sitemap index; returns the number of sitemaps."""
+    writer = SitemapIndexWriter(out).extend(sitemaps)
+    writer.close()
+    return writer.count
+
+
+class _GzipWriter:
+    """gzip output that counts uncompressed bytes; fixed mtime, so unchanged content gives identical files."""
+
+    def __init__(self, path):
+        self._raw = open(path, 'wb')
+        self._gzip = gzip.GzipFile(filename='', fileobj=self._raw, mode='wb', compresslevel=6, mtime=0)
+        self.size = 0
+
+    def write(self, text):
+        self.write_bytes(text.encode('utf-8'))
+
+    def write_bytes(self, data):
+        self._gzip.write(data)
+        self.size += len(data)
+
+    def close(self):
+        try:
+            self._gzip.close()
+        finally:
+            self._raw.close()
+
+
+def save_gzip_index(path, sitemaps):
+    """Write a gzipped sitemap index to `path` atomically; returns the number of sitemaps."""
+    tmp_path = f'{path}.tmp'
+    out = _GzipWriter(tmp_path)
+    try:
+        count = write_sitemap_index(out, sitemaps)
+    finally:
+        out.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def shard_path(directory, name, number):
+    return os.path.join(directory, f'{name}_{number}.xml.gz')
+
+
+class ShardedSitemap:
+    """
+    A urlset written as gzipped shards `<name>_<n>.xml.gz` (n from 1).
+
+    A shard is closed before it passes the protocol limits, MAX_URLS URLs or
+    MAX_BYTES uncompressed. Shards are written to temporary files; readers
+    keep seeing the previous set until `commit()` swaps them in and removes
+    shards left over from a bigger previous set. `discard()` drops the
+    partial ones (failed or abandoned builds).
+    """
+
+    def __init__(self, directory, name, max_urls=None, max_bytes=None):
+        self.directory = directory
+        self.name = name
+        self.max_urls = max_urls or MAX_URLS
+        self.max_bytes = max_bytes or MAX_BYTES
+        self.count = 0
+        self._tmp_paths = []
+        self._out = None
+        self._shard_urls = 0
+        self._closing = URLSET_CLOSE.encode('utf-8')
+
+    @property
+    def shards(self):
+        return len(self._tmp_paths)
+
+    def _open_shard(self):
+        tmp_path = shard_path(self.directory, self.name, len(self._tmp_paths) + 1) + '.tmp'
+        self._tmp_paths.append(tmp_path)
+        self._out = _GzipWriter(tmp_path)
+        self._out.write(URLSET_OPEN)
+        self._shard_urls = 0
+
+    def _close_shard(self):
+        self._out.write_bytes(self._closing)
+        self._out.close()
+        self._out = None
+
+    def add(self, url):
+        data = render_url(url).encode('utf-8')
+        if self._out is not None and self._shard_urls and (
+            self._shard_urls >= self.max_urls
+            or self._out.size + len(data) + len(self._closing) > self.max_bytes
+        ):
+            self._close_shard()
+        if self._out is None:
+            self._open_shard()
+        self._out.write_bytes(data)
+        self._shard_urls += 1
+        self.count += 1
+
+    def extend(self, urls):
+        for url in urls:
+            self.add(url)
+        return self
+
+    def commit(self):
+        """Publish the shards; returns how many there are."""
+        if self._out is None and not self._tmp_paths:
+            self._open_shard()
+        if self._out is not None:
+            self._close_shard()
+        for number, tmp_path in enumerate(self._tmp_paths, 1):
+            os.replace(tmp_path, shard_path(self.directory, self.name, number))
+        number = len(self._tmp_paths) + 1
+        while os.path.exists(shard_path(self.directory, self.name, number)):
+            os.remove(shard_path(self.directory, self.name, number))
+            number += 1
+        return len(self._tmp_paths)
+
+    def discard(self):
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        for tmp_path in self._tmp_paths:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
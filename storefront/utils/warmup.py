@@ -0,0 +1,194 @@
+"""
+Cache warm-up after a deploy.
+
+Every deploy starts with cold caches, so the first visitors of each shop
+used to pay full upstream latency. `warm_caches()` primes, for the top
+WARM_CACHES_LIMIT shops:
+
+- this worker's tenant registry and normalized component trees (the theme
+  component included), from one `business_profiles` query;
+- the compiled page templates, `theme_css.html` included (cached loader);
+- the shared page cache: the marketplace landing page and each shop's home
+  page, i.e. its first page of products, rendered in-process through the
+  full middleware stack (as a gunicorn request would be) with at most
+  `concurrency` pages in flight.
+
+There is no visit counter, so "most visited" is approximated by completed
+orders, then followers.
+
+`manage.py warm_caches` runs it by hand. With WARM_CACHES_ON_BOOT on,
+gunicorn.conf.py calls `warm_in_background()` in every worker: each worker
+primes its own in-process caches and the first one to start renders the
+shared pages.
+"""
+import io
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.wsgi import WSGIRequest
+from django.template.loader import get_template
+
+from ..client import get_supabase_client
+from ..projections import BUSINESS_FULL
+from ..tenants import registry
+from .component_cache import get_prepared_components
+
+logger = logging.getLogger(__name__)
+
+WARM_TEMPLATES = (
+    'storefront/theme_css.html',
+    'storefront/main_landing.html',
+    'storefront/shop_home.html',
+    'storefront/partials/mainstore/product_detail.html',
+    'storefront/partials/mainstore/category_list.html',
+)
+
+# Only one worker per boot renders the shared pages
+PAGES_LOCK_KEY = 'warmup:pages'
+PAGES_LOCK_TTL = 300
+
+
+def top_businesses(limit):
+    """The `limit` busiest active shops (full rows, as the tenant registry stores them)."""
+    supabase = get_supabase_client()
+    response = supabase.table('business_profiles').select(BUSINESS_FULL)\
+        .eq('status', 'active')\
+        .not_.is_('domain', 'null')\
+        .order('total_orders_completed', desc=True)\
+        .order('follower_count', desc=True)\
+        .limit(limit)\
+        .execute()
+    return [row for row in response.data or [] if row.get('domain')]
+
+
+def warm_process(rows, report):
+    """Prime this process's tenant registry, component trees and templates."""
+    businesses = []
+    for row in rows:
+        try:
+            business = registry.prime(row)
+            get_prepared_components(business)
+        except Exception as e:
+            report['errors'] += 1
+            logger.warning(f"Could not prime tenant {row.get('domain')}: {e}")
+            continue
+        businesses.append(business)
+        report['tenants'] += 1
+        report['components'] += 1
+
+    for name in WARM_TEMPLATES:
+        try:
+            get_template(name)
+            report['templates'] += 1
+        except Exception as e:
+            report['errors'] += 1
+            logger.warning(f"Could not load template {name}: {e}")
+    return businesses
+
+
+_handler = None
+_handler_lock = threading.Lock()
+
+
+def _get_handler():
+    global _handler
+    with _handler_lock:
+        if _handler is None:
+            handler = BaseHandler()
+            handler.load_middleware()
+            _handler = handler
+    return _handler
+
+
+def _request(host, path):
+    return WSGIRequest({
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': host,
+        'SERVER_PORT': '443',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    })
+
+
+def _render(host, path='/'):
+    response = _get_handler().get_response(_request(host, path))
+    try:
+        return response.status_code, response.get('X-Page-Cache')
+    finally:
+        response.close()
+
+
+def _render_safely(host):
+    try:
+        return _render(host)
+    except Exception as e:
+        logger.warning(f"Warm-up of {host} failed: {e}")
+        return None, None
+
+
+def warm_pages(businesses, concurrency, report):
+    """Render the landing page and each shop's first product page into the shared page cache."""
+    # Shops live on subdomains of the landing host (see core.middleware.SubdomainMiddleware)
+    landing = settings.WARM_CACHES_HOST
+    hosts = [landing] + [f"{b['domain']}.{landing}" for b in businesses]
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='warmup') as pool:
+        for host, (status, page_cache) in zip(hosts, pool.map(_render_safely, hosts)):
+            if status is None:
+                report['errors'] += 1
+            elif status != 200:
+                report['errors'] += 1
+                logger.warning(f"Warm-up of {host} answered {status}")
+            elif page_cache == 'HIT':
+                report['pages_already_cached'] += 1
+            else:
+                report['pages_rendered'] += 1
+
+
+def warm_caches(limit=None, concurrency=None, pages=True):
+    """Warm the caches (see module docstring). Returns a report of what was primed."""
+    limit = limit if limit is not None else settings.WARM_CACHES_LIMIT
+    concurrency = concurrency if concurrency is not None else settings.WARM_CACHES_CONCURRENCY
+    started = time.monotonic()
+    report = {
+        'businesses': 0, 'tenants': 0, 'components': 0, 'templates': 0,
+        'pages_rendered': 0, 'pages_already_cached': 0, 'errors': 0,
+    }
+    try:
+        rows = top_businesses(limit)
+    except Exception as e:
+        logger.error(f"Warm-up could not list businesses: {e}")
+        rows = []
+        report['errors'] += 1
+    report['businesses'] = len(rows)
+
+    businesses = warm_process(rows, report)
+    if pages:
+        warm_pages(businesses, concurrency, report)
+
+    report['seconds'] = round(time.monotonic() - started, 2)
+    return report
+
+
+def warm_in_background():
+    """Warm this worker without delaying it (gunicorn `post_worker_init`)."""
+    def run():
+        try:
+            pages = cache.add(PAGES_LOCK_KEY, True, PAGES_LOCK_TTL)
+        except Exception:
+            pages = False
+        report = warm_caches(pages=pages)
+        logger.info(f"Cache warm-up finished: {report}")
+
+    threading.Thread(target=run, name='cache-warmup', daemon=True).start()
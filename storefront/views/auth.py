@@ -1,7 +1,8 @@
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
-from ..client import get_supabase_client
-from .shop import normalize_component_data
+from ..client import get_supabase_auth_client
+from ..utils.component_cache import get_prepared_components
+from ..tenants import get_tenant
 import logging
 import json
 
@@ -20,7 +21,7 @@ def login_view(request):
                 'business': _get_business_context(request)
             })
         
-        supabase = get_supabase_client()
+        supabase = get_supabase_auth_client()
         
         try:
             # Authenticate with Supabase (handle multiple response shapes)
@@ -123,7 +124,7 @@ def signup_view(request):
                 'business': _get_business_context(request)
             })
 
-        supabase = get_supabase_client()
+        supabase = get_supabase_auth_client()
         
         try:
             res = supabase.auth.sign_up({
@@ -200,41 +201,14 @@ def _get_business_context(request):
         return {}
     
     try:
-        supabase = get_supabase_client()
-        res = supabase.table('business_profiles').select('*').eq('domain', subdomain).execute()
+        biz = get_tenant(request)
         
-        if res.data and len(res.data) > 0:
-            biz = res.data[0]
-            
-            # Safely handle components
+        if biz:
+            # Normalized components + WebTheme (cached per business version)
             try:
-                components_raw = biz.get('components', [])
-                
-                if isinstance(components_raw, str):
-                    try: 
-                        components_raw = json.loads(components_raw)
-                    except: 
-                        components_raw = []
-                
-                if not isinstance(components_raw, list):
-                    components_raw = []
-                
-                # Find the WebTheme component and normalize all components
-                components_list = []
-                for c in components_raw:
-                    if isinstance(c, dict):
-                        try:
-                            normalized = normalize_component_data(c)
-                            if normalized:
-                                components_list.append(normalized)
-                        except Exception as comp_err:
-                            logger.warning(f"Failed to normalize component: {comp_err}")
-                            continue
-                
-                theme_comp = next((c for c in components_list if c.get('clean_type') == 'webtheme'), None)
-                
-                biz['components'] = components_list
-                biz['theme_component'] = theme_comp or {}
+                prepared = get_prepared_components(biz)
+                biz['components'] = prepared['components']
+                biz['theme_component'] = prepared['theme'] or {}
                 
             except Exception as theme_err:
                 logger.warning(f"Error processing business theme: {theme_err}")
@@ -253,7 +227,7 @@ import os
 
 
 def google_login_view(request):
-    supabase = get_supabase_client()
+    supabase = get_supabase_auth_client()
 
     # Build the callback URL based on environment and request
     # IMPORTANT: This must match a URL registered in Supabase OAuth settings
@@ -328,7 +302,7 @@ def confirm_auth_view(request):
             data = json.loads(request.body)
             access_token = data.get('access_token')
             
-            supabase = get_supabase_client()
+            supabase = get_supabase_auth_client()
             # Verify user with Supabase using the token
             res = supabase.auth.get_user(access_token)
             
@@ -0,0 +1,69 @@
+"""
+Cache invalidation webhook.
+
+Point a Supabase database webhook (or a `pg_net` trigger) for `posts`,
+`business_profiles`, `reviews`, `news_articles` and `categories` at
+`/_internal/cache/invalidate/`. Each change event purges the pages it
+affects (utils/cache_events.py), so cached pages can use long TTLs.
+
+Protected by the CACHE_WEBHOOK_SECRET setting, sent as
+`Authorization: Bearer <secret>` or the X-Webhook-Secret header; open
+without a secret only when DEBUG is on. `manage.py publish_cache_event`
+sends events by hand.
+"""
+import hmac
+import json
+import logging
+
+from django.conf import settings
+from django.http import HttpResponseForbidden, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from ..utils.cache_events import InvalidEvent, apply, invalidations
+
+logger = logging.getLogger(__name__)
+
+
+def _is_authorized(request):
+    secret = getattr(settings, 'CACHE_WEBHOOK_SECRET', '')
+    if not secret:
+        return settings.DEBUG
+    supplied = request.headers.get('X-Webhook-Secret', '')
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        supplied = auth[len('Bearer '):]
+    return hmac.compare_digest(supplied, secret)
+
+
+@csrf_exempt
+@require_POST
+def cache_invalidate(request):
+    """Apply one change event, or a list of them."""
+    if not _is_authorized(request):
+        return HttpResponseForbidden('Forbidden')
+
+    try:
+        payload = json.loads(request.body)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    events = payload if isinstance(payload, list) else [payload]
+
+    try:
+        # Reject the whole batch before purging anything
+        for event in events:
+            invalidations(event)
+    except InvalidEvent as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    purged = set()
+    try:
+        for event in events:
+            purged.update(apply(event))
+    except Exception as e:
+        # The sender retries on 5xx; a purge that half-applied is safe to repeat
+        logger.error(f"Cache invalidation failed: {e}")
+        return JsonResponse({'error': 'Invalidation failed'}, status=503)
+
+    logger.info(f"Cache invalidated by {len(events)} event(s): {sorted(purged)}")
+    return JsonResponse({'purged': sorted(purged)})
@@ -1,8 +1,10 @@
 from django.shortcuts import render
 from django.http import Http404
-from ..client import get_supabase_client
+from ..tenants import get_tenant
+from ..utils.page_cache import anonymous_page_cache
 
 
+@anonymous_page_cache
 def contact(request):
     """
     Display business contact information.
@@ -14,16 +16,12 @@ def contact(request):
     if not subdomain:
         raise Http404("No business specified.")
     
-    supabase = get_supabase_client()
+    # Business profile (resolved once per request by SubdomainMiddleware)
+    business = get_tenant(request)
     
-    # Fetch business profile
-    response = supabase.table('business_profiles').select('*').eq('domain', subdomain).execute()
-    
-    if not response.data:
+    if not business:
         raise Http404(f"Business '{subdomain}' not found.")
     
-    business = response.data[0]
-    
     # Extract contact details from business profile
     contact_info = {
         'business_name': business.get('business_name', 'Contact'),
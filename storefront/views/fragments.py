@@ -0,0 +1,88 @@
+"""
+Per-visitor fragments for cached shop pages.
+
+Shop pages are rendered once as a shared shell (no session access, so no
+`Vary: Cookie`) and served to every visitor from the page cache. The parts
+that depend on who is looking are filled in afterwards from this endpoint:
+
+    GET /_fragments/?products=<id>,<id>,...
+
+    {"signed_in": true,
+     "user_chip": "<button class=\"profile-trigger\">...",   # navbar account menu
+     "wishlist": ["<id>", ...],                              # hearts to fill in
+     "order_count": 2}                                       # badge on "My Orders"
+
+It never goes through the page cache and is marked `private, no-store`. It
+also sets the CSRF cookie the wishlist buttons need, since the cached shell
+can't.
+"""
+import logging
+from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.views.decorators.http import require_GET
+from ..client import get_supabase_client
+from ..tenants import get_tenant
+from ..projections import USER_SESSION, WISHLIST_ENTRY, project
+from ..utils.fanout import fan_out
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on product ids checked per call (two shop pages' worth)
+MAX_FRAGMENT_PRODUCTS = 200
+
+
+def _product_ids(request):
+    raw = request.GET.get('products', '')
+    ids = [pid.strip() for pid in raw.split(',') if pid.strip()]
+    return list(dict.fromkeys(ids))[:MAX_FRAGMENT_PRODUCTS]
+
+
+@require_GET
+def personal_fragments(request):
+    """User chip, wishlist state and order badge for the current visitor."""
+    get_token(request)
+    business = get_tenant(request)
+    user_id = request.session.get('user_id')
+    product_ids = _product_ids(request)
+
+    user = {}
+    wishlist = []
+    order_count = 0
+    if user_id:
+        supabase = get_supabase_client()
+        tasks = {
+            'user data': lambda: project(supabase.table('nexususers').select(USER_SESSION).eq('id', user_id).execute().data, USER_SESSION),
+        }
+        if product_ids:
+            tasks['wishlist'] = lambda: supabase.table('wishlists').select(WISHLIST_ENTRY).eq('user_id', user_id).in_('product_id', product_ids).execute().data or []
+        if business:
+            tasks['order count'] = lambda: supabase.table('market_orders').select('id', count='exact', head=True).eq('buyer_id', user_id).eq('business_id', business.get('id')).execute().count or 0
+        # Each fragment degrades on its own: a failed lookup just leaves its default
+        results = fan_out(tasks, defaults={'user data': None, 'wishlist': [], 'order count': 0})
+
+        user_rows = results['user data']
+        if user_rows:
+            user = user_rows[0]
+        else:
+            user = {'name': request.session.get('user_email', 'User')}
+        wishlist = [str(row['product_id']) for row in results.get('wishlist', [])]
+        order_count = results.get('order count', 0)
+
+    user_chip = render_to_string('storefront/partials/user_chip.html', {
+        'signed_in': bool(user_id),
+        'user': user,
+        'business': business or {},
+        'order_count': order_count,
+    }, request=request)
+
+    response = JsonResponse({
+        'signed_in': bool(user_id),
+        'user_chip': user_chip,
+        'wishlist': wishlist,
+        'order_count': order_count,
+    })
+    add_never_cache_headers(response)
+    patch_cache_control(response, private=True)
+    return response
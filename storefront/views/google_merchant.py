@@ -15,13 +15,15 @@ Generates product CSV/XML feed for Google Shopping with all required attributes:
 """
 
 import csv
-import json
 import logging
 from io import StringIO
 from django.http import HttpResponse
-from django.views.decorators.cache import cache_page
+from ..utils.page_cache import shared_cache_page
 from django.template.loader import render_to_string
 from ..client import get_supabase_client
+from ..tenants import get_tenant
+from ..projections import PRODUCT_FEED
+from ..utils.product_cards import data_value, product_currency, product_image, product_name, product_price
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +40,32 @@ def format_date(date_str):
         return ''
 
 
-@cache_page(60 * 60 * 24)  # Cache for 24 hours
+def _availability(stock_status):
+    if stock_status == 'in_stock':
+        return 'in stock'
+    if stock_status == 'out_of_stock':
+        return 'out of stock'
+    return 'preorder'
+
+
+def _feed_item(request, post):
+    """One feed entry from a PRODUCT_FEED row."""
+    return {
+        'id': post.get('id'),
+        'title': product_name(post),
+        'description': data_value(post, 'textContent', '')[:5000],  # Google limit: 5000 chars
+        'link': request.build_absolute_uri(f'/product/{post["id"]}/'),
+        'image_link': product_image(post) or '',
+        'price': product_price(post),
+        'currency': product_currency(post),
+        'availability': _availability(post.get('stock_status') or 'in_stock'),
+        'brand': data_value(post, 'brand', ''),
+        'gtin': data_value(post, 'gtin', ''),
+        'mpi': data_value(post, 'mpi', ''),
+    }
+
+
+@shared_cache_page(60 * 60 * 24, listing=True)  # Cache for 24 hours
 def export_google_merchant_csv(request, subdomain=None):
     """
     Export products as CSV for Google Merchant Center.
@@ -65,21 +92,16 @@ def export_google_merchant_csv(request, subdomain=None):
     try:
         supabase = get_supabase_client()
         
-        # Fetch business
-        biz_response = supabase.table('business_profiles')\
-            .select('*')\
-            .eq('domain', subdomain)\
-            .execute()
+        # Business (resolved once per request by SubdomainMiddleware)
+        business = get_tenant(request)
         
-        if not biz_response.data:
+        if not business:
             return HttpResponse('Business not found', status=404)
-        
-        business = biz_response.data[0]
         business_id = business.get('id')
         
         # Fetch products
         posts_response = supabase.table('posts')\
-            .select('*')\
+            .select(PRODUCT_FEED)\
             .eq('business_id', business_id)\
             .order('updated_at', desc=True)\
             .limit(50000)\
@@ -103,41 +125,19 @@ def export_google_merchant_csv(request, subdomain=None):
         writer.writeheader()
         
         for post in posts_response.data:
-            post_data = post.get('data', {})
-            if isinstance(post_data, str):
-                post_data = json.loads(post_data)
-            
-            # Get images
-            images = post_data.get('images', [])
-            image_url = ''
-            if images and isinstance(images, list) and len(images) > 0:
-                first_img = images[0]
-                image_url = first_img.get('url') if isinstance(first_img, dict) else str(first_img)
-            
-            # Fallback image
-            if not image_url:
-                image_url = post_data.get('thumbnailUrl') or post_data.get('imageUrl') or ''
-            
-            availability = post.get('stock_status', 'in_stock')
-            if availability == 'in_stock':
-                availability = 'in stock'
-            elif availability == 'out_of_stock':
-                availability = 'out of stock'
-            else:
-                availability = 'preorder'
-            
+            item = _feed_item(request, post)
             writer.writerow({
-                'ID': post.get('id'),
-                'Title': post_data.get('productName', 'Untitled'),
-                'Description': post_data.get('textContent', '')[:5000],  # Google limit: 5000 chars
-                'Link': request.build_absolute_uri(f'/product/{post["id"]}/'),
-                'Image Link': image_url,
-                'Price': post_data.get('productPrice', 0),
-                'Currency': post_data.get('productCurrency', 'UGX'),
-                'Availability': availability,
-                'Brand': post_data.get('brand', ''),                    # ✅ NEW
-                'GTIN': post_data.get('gtin', ''),                      # ✅ NEW
-                'MPN': post_data.get('mpi', ''),                        # ✅ NEW
+                'ID': item['id'],
+                'Title': item['title'],
+                'Description': item['description'],
+                'Link': item['link'],
+                'Image Link': item['image_link'],
+                'Price': item['price'],
+                'Currency': item['currency'],
+                'Availability': item['availability'],
+                'Brand': item['brand'],                    # ✅ NEW
+                'GTIN': item['gtin'],                      # ✅ NEW
+                'MPN': item['mpi'],                        # ✅ NEW
             })
         
         response = HttpResponse(output.getvalue(), content_type='text/csv')
@@ -149,7 +149,7 @@ def export_google_merchant_csv(request, subdomain=None):
         return HttpResponse(f'Error: {str(e)}', status=500)
 
 
-@cache_page(60 * 60 * 24)  # Cache for 24 hours
+@shared_cache_page(60 * 60 * 24, listing=True)  # Cache for 24 hours
 def export_google_merchant_xml(request, subdomain=None):
     """
     Export products as XML for Google Merchant Center (alternative format).
@@ -164,63 +164,22 @@ def export_google_merchant_xml(request, subdomain=None):
     try:
         supabase = get_supabase_client()
         
-        # Fetch business
-        biz_response = supabase.table('business_profiles')\
-            .select('*')\
-            .eq('domain', subdomain)\
-            .execute()
+        # Business (resolved once per request by SubdomainMiddleware)
+        business = get_tenant(request)
         
-        if not biz_response.data:
+        if not business:
             return HttpResponse('Business not found', status=404)
-        
-        business = biz_response.data[0]
         business_id = business.get('id')
         
         # Fetch products
         posts_response = supabase.table('posts')\
-            .select('*')\
+            .select(PRODUCT_FEED)\
             .eq('business_id', business_id)\
             .order('updated_at', desc=True)\
             .limit(50000)\
             .execute()
         
-        products = []
-        for post in posts_response.data:
-            post_data = post.get('data', {})
-            if isinstance(post_data, str):
-                post_data = json.loads(post_data)
-            
-            # Get images
-            images = post_data.get('images', [])
-            image_url = ''
-            if images and isinstance(images, list) and len(images) > 0:
-                first_img = images[0]
-                image_url = first_img.get('url') if isinstance(first_img, dict) else str(first_img)
-            
-            if not image_url:
-                image_url = post_data.get('thumbnailUrl') or post_data.get('imageUrl') or ''
-            
-            availability = post.get('stock_status', 'in_stock')
-            if availability == 'in_stock':
-                availability = 'in stock'
-            elif availability == 'out_of_stock':
-                availability = 'out of stock'
-            else:
-                availability = 'preorder'
-            
-            products.append({
-                'id': post.get('id'),
-                'title': post_data.get('productName', 'Untitled'),
-                'description': post_data.get('textContent', '')[:5000],
-                'link': request.build_absolute_uri(f'/product/{post["id"]}/'),
-                'image_link': image_url,
-                'price': post_data.get('productPrice', 0),
-                'currency': post_data.get('productCurrency', 'UGX'),
-                'availability': availability,
-                'brand': post_data.get('brand', ''),
-                'gtin': post_data.get('gtin', ''),
-                'mpi': post_data.get('mpi', ''),
-            })
+        products = [_feed_item(request, post) for post in posts_response.data]
         
         xml_content = render_to_string('storefront/merchant_products.xml', {
             'products': products,
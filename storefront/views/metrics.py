@@ -0,0 +1,41 @@
+"""
+Internal runtime stats for the current worker process.
+
+Protected by the INTERNAL_API_TOKEN setting (sent as the X-Internal-Token
+header); open without a token only when DEBUG is on.
+"""
+import hmac
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse, HttpResponseForbidden
+from ..client import get_pool_stats
+from ..tenants import registry as tenant_registry, rejections
+from ..utils.circuit import breaker_stats
+from ..utils.component_cache import component_cache
+from ..utils.fanout import get_fanout_stats
+from ..utils.hedging import get_hedging_stats
+
+
+def _is_authorized(request):
+    token = getattr(settings, 'INTERNAL_API_TOKEN', '')
+    if not token:
+        return settings.DEBUG
+    supplied = request.headers.get('X-Internal-Token', '')
+    return hmac.compare_digest(supplied, token)
+
+
+def internal_stats(request):
+    """Return pool/cache counters for this worker as JSON."""
+    if not _is_authorized(request):
+        return HttpResponseForbidden('Forbidden')
+
+    return JsonResponse({
+        'supabase_pool': get_pool_stats(),
+        'tenant_registry': tenant_registry.stats(),
+        'rejected_hosts': rejections.stats(),
+        'component_cache': component_cache.stats(),
+        'fanout': get_fanout_stats(),
+        'circuit_breakers': breaker_stats(),
+        'hedging': get_hedging_stats(),
+        'shared_cache': cache.stats() if hasattr(cache, 'stats') else None,
+    })
@@ -2,6 +2,7 @@ import logging
 from django.shortcuts import render
 from django.http import Http404
 from ..client import get_supabase_client
+from ..utils.conditional import PageVersion, conditional_page
 
 logger = logging.getLogger(__name__)
 
@@ -69,6 +70,14 @@ def news_list(request):
 
     return render(request, 'storefront/news.html', context)
 
+def _article_version(request, article_id):
+    response = get_supabase_client().table('news_articles').select('id,updated_at,comment_count').eq('id', article_id).execute()
+    if not response.data:
+        return None
+    return PageVersion().add_row(response.data[0])
+
+
+@conditional_page(_article_version)
 def news_detail(request, article_id):
     """
     Display a single news article with full content.
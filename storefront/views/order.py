@@ -1,21 +1,20 @@
 from django.shortcuts import render
 from django.http import Http404
 from ..client import get_supabase_client
+from ..tenants import get_tenant
+from ..projections import PRODUCT_CARD
+from ..utils.product_cards import product_card
 
 
 def order_confirmation(request, order_id):
     """Display order confirmation with Order and ParcelDelivery JSON-LD."""
-    subdomain = getattr(request, 'subdomain', None)
-    
     supabase = get_supabase_client()
     
-    # Fetch business
-    biz_response = supabase.table('business_profiles').select('*').eq('domain', subdomain).execute()
-    if not biz_response.data:
+    # Business (resolved once per request by SubdomainMiddleware)
+    business = get_tenant(request)
+    if not business:
         raise Http404("Shop not found")
     
-    business = biz_response.data[0]
-    
     # Fetch order
     order_response = supabase.table('market_orders').select('*').eq('id', str(order_id)).execute()
     if not order_response.data:
@@ -24,19 +23,12 @@ def order_confirmation(request, order_id):
     order = order_response.data[0]
     
     # Fetch product
-    product_response = supabase.table('posts').select('*').eq('id', str(order['product_id'])).execute()
+    product_response = supabase.table('posts').select(PRODUCT_CARD).eq('id', str(order['product_id'])).execute()
     product = product_response.data[0] if product_response.data else None
     
     # Extract product data
     if product:
-        product_data = product.get('data', {})
-        product_obj = {
-            'id': product['id'],
-            'name': product_data.get('productName', 'Product'),
-            'price': product_data.get('productPrice', 0),
-            'currency': product_data.get('productCurrency', 'UGX'),
-            'image_url': product_data.get('thumbnailUrl') or product_data.get('imageUrl'),
-        }
+        product_obj = product_card(product, default_name='Product')
     else:
         product_obj = None
     
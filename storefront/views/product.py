@@ -3,7 +3,14 @@ import logging
 from django.shortcuts import render, redirect
 from django.http import Http404
 from ..client import get_supabase_client
-from .shop import normalize_component_data
+from ..tenants import get_tenant
+from ..projections import PRODUCT_CARD, PRODUCT_DETAIL
+from ..utils.component_cache import get_prepared_components
+from ..utils.page_cache import anonymous_page_cache, tag_page, tag_products
+from ..utils.conditional import PageVersion, add_reviews, add_shop, conditional_page
+from ..utils.fanout import fan_out
+from ..utils.ratings import get_review_aggregates
+from ..utils.product_cards import product_card, product_category, product_image
 
 logger = logging.getLogger(__name__)
 
@@ -67,52 +74,9 @@ def get_theme_component(business_data):
     """
     Extract the theme component from business components.
     Returns the theme component dict or a sensible default dark theme if not found.
+    Served from the component tree cache, so the components aren't re-parsed per call.
     """
-    import json
-    components_raw = business_data.get('components')
-    biz_components = []
-    
-    # 1. robust parsing
-    if isinstance(components_raw, str):
-        try:
-            biz_components = json.loads(components_raw) or []
-        except json.JSONDecodeError:
-            print("Error decoding components JSON")
-            biz_components = []
-    elif isinstance(components_raw, list):
-        biz_components = components_raw
-    else:
-        print(f"Unknown components type: {type(components_raw)}")
-        # Return default theme if can't parse
-        return _get_default_theme()
-
-    print(f"Searching for theme in {len(biz_components)} components...")
-    
-    # 2. Iterate and check
-    for c in biz_components:
-        if not isinstance(c, dict):
-            continue
-            
-        raw_type = c.get('type', '')
-        # Check raw type directly first (Most reliable)
-        if raw_type == 'ProfileWebsiteThemeComponent':
-            print(f"Found theme by raw type: {c.get('type')}")
-            return c
-            
-        # Check normalized/cleaned types
-        try:
-            normalized = normalize_component_data(c.copy())
-            clean_type = normalized.get('clean_type', '')
-            
-            if clean_type in ('websitetheme', 'webtheme'):
-                print(f"Found theme by cleanup: {clean_type} (was {raw_type})")
-                return c
-        except Exception as e:
-            print(f"Error normalizing component {raw_type}: {e}")
-            continue
-    
-    print("No theme component found. Using default theme.")
-    return _get_default_theme()
+    return get_prepared_components(business_data)['theme'] or _get_default_theme()
 
 
 def _get_default_theme():
@@ -129,6 +93,44 @@ def _get_default_theme():
         'secondaryColor': '#DA03D0',
     }
 
+def _product_version(request, product_id):
+    """The product row and its reviews, plus the shop (its related products and theme)."""
+    business = get_tenant(request)
+    if not business:
+        return None
+    supabase = get_supabase_client()
+    results = fan_out({
+        'product version': lambda: supabase.table('posts').select('id,updated_at').eq('id', str(product_id)).execute().data,
+        'shop version': lambda: add_shop(PageVersion(), supabase, business),
+        'review version': lambda: add_reviews(PageVersion(), supabase, product_id),
+    })
+    if not results['product version']:
+        return None
+    return PageVersion().add_row(results['product version'][0])\
+        .merge(results['shop version'])\
+        .merge(results['review version'])
+
+
+def _same_category(query, post):
+    """Narrow a posts query to `post`'s category; uncategorized posts match each other."""
+    if post.get('category_id'):
+        return query.eq('category_id', post['category_id'])
+    name = product_category(post, default=None)
+    if name:
+        return query.eq('data->category->>name', name)
+    return query.is_('category_id', 'null').is_('data->category->>name', 'null')
+
+
+def _category_version(request, category_name):
+    """The shop's catalogue (the ETag is per URL, so per category already)."""
+    business = get_tenant(request)
+    if not business:
+        return None
+    return add_shop(PageVersion(), get_supabase_client(), business)
+
+
+@anonymous_page_cache(listing=True)
+@conditional_page(_product_version)
 def product_detail(request, product_id):
     subdomain = getattr(request, 'subdomain', None)
     if not subdomain:
@@ -136,22 +138,16 @@ def product_detail(request, product_id):
 
     supabase = get_supabase_client()
 
-    # Fetch Business
-    biz_response = supabase.table('business_profiles').select('*').eq('domain', subdomain).execute()
-    if not biz_response.data:
+    # Business (resolved once per request by SubdomainMiddleware)
+    business_data = get_tenant(request)
+    if not business_data:
         raise Http404("Shop not found")
-    business_data = biz_response.data[0]
-    
-    # Parse and normalize components for theme detection
-    components_raw = business_data.get('components', [])
-    if isinstance(components_raw, str):
-        try: components_raw = json.loads(components_raw) or []
-        except: components_raw = []
     
-    business_data['components'] = [normalize_component_data(c) for c in components_raw if isinstance(c, dict)]
+    # Normalized components for theme detection (cached per business version)
+    business_data['components'] = get_prepared_components(business_data)['components']
 
     # Fetch Product
-    prod_response = supabase.table('posts').select('*, categories(name)').eq('id', str(product_id)).execute()
+    prod_response = supabase.table('posts').select(PRODUCT_DETAIL.extend('categories(name)')).eq('id', str(product_id)).execute()
     if not prod_response.data:
         raise Http404("Product not found")
 
@@ -159,12 +155,7 @@ def product_detail(request, product_id):
     post_data = post.get('data', {})
 
     # Category Logic
-    cat_linked = post.get('categories')
-    if cat_linked and isinstance(cat_linked, dict):
-         cat_name = cat_linked.get('name', 'General')
-    else:
-        cat_data = post_data.get('category') or {}
-        cat_name = cat_data.get('name', 'General') if isinstance(cat_data, dict) else 'General'
+    cat_name = product_category(post)
 
     # Components Parsing
     components = post_data.get('components', [])
@@ -198,15 +189,6 @@ def product_detail(request, product_id):
 
     display_image = images[0].get('url') if images else (post_data.get('thumbnailUrl') or post_data.get('imageUrl'))
 
-    # Fetch reviews for this product
-    reviews_response = supabase.table('reviews').select('rating').eq('product_id', str(product_id)).execute()
-    reviews_count = 0
-    reviews_avg = 0
-    if reviews_response.data:
-        ratings = [r.get('rating', 0) for r in reviews_response.data]
-        reviews_count = len(ratings)
-        reviews_avg = sum(ratings) / len(ratings) if ratings else 0
-
     product = {
         'id': post.get('id'),
         'name': post_data.get('productName', 'Untitled'),
@@ -222,8 +204,8 @@ def product_detail(request, product_id):
         'comments': post_data.get('comments') or [],
         'author': post_data.get('author') or {},
         'timestamp': post_data.get('timestamp') or post.get('created_at'),
-        'reviews_count': reviews_count,
-        'reviews_avg': reviews_avg,
+        'reviews_count': 0,
+        'reviews_avg': 0,
         'brand': post_data.get('brand', ''),                    # ✅ NEW
         'gtin': post_data.get('gtin', ''),                      # ✅ NEW (barcode/EAN)
         'mpi': post_data.get('mpi', ''),                        # ✅ NEW (manufacturer part number)
@@ -243,42 +225,28 @@ def product_detail(request, product_id):
     product['schema_price'] = 0 if is_swap else product.get('price', 0)
 
 
-    # Fetch Related Products
+    # Fetch Related Products (same category, filtered upstream)
     related_products = []
-    posts_query = supabase.table('posts').select('*').eq('business_id', business_data.get('id')).order('created_at', desc=True).limit(20)
-    related_response = posts_query.execute()
+    posts_query = supabase.table('posts').select(PRODUCT_CARD)\
+        .eq('business_id', business_data.get('id'))\
+        .neq('id', str(product_id))
+    related_response = _same_category(posts_query, post).order('created_at', desc=True).limit(5).execute()
     
     for p in related_response.data:
-        if p.get('id') == str(product_id): continue 
-        p_data = p.get('data', {})
-        p_cat = p_data.get('category', {}).get('name', 'General')
-        
-        # Fetch reviews for related product
-        p_reviews_response = supabase.table('reviews').select('rating').eq('product_id', str(p['id'])).execute()
-        p_reviews_count = 0
-        p_reviews_avg = 0
-        if p_reviews_response.data:
-            p_ratings = [r.get('rating', 0) for r in p_reviews_response.data]
-            p_reviews_count = len(p_ratings)
-            p_reviews_avg = sum(p_ratings) / len(p_ratings) if p_ratings else 0
-        
-        if p_cat == cat_name:
-            img = p_data.get('thumbnailUrl') or p_data.get('imageUrl')
-            if p_data.get('images') and len(p_data['images']) > 0:
-                first = p_data['images'][0]
-                img = first.get('url') if isinstance(first, dict) else first
-
-            related_products.append({
-                'id': p.get('id'),
-                'name': p_data.get('productName'),
-                'price': p_data.get('productPrice'),
-                'currency': validate_currency(p_data.get('productCurrency')),  # ✅ VALIDATED
-                'image_url': img,
-                'category': p_cat,
-                'reviews_count': p_reviews_count,
-                'reviews_avg': p_reviews_avg,
-            })
-            if len(related_products) >= 5: break
+        card = product_card(p, validate_currency=validate_currency)  # ✅ VALIDATED
+        card.update({'category': cat_name, 'reviews_count': 0, 'reviews_avg': 0})
+        related_products.append(card)
+
+    tag_products(request, [product['id']] + [p['id'] for p in related_products])
+    tag_page(request, 'categories')
+
+    # Review aggregates for the product and all related items in ONE query
+    aggregates = get_review_aggregates(supabase, [product['id']] + [p['id'] for p in related_products])
+    for item in [product] + related_products:
+        agg = aggregates.get(str(item['id']))
+        if agg:
+            item['reviews_count'] = agg['count']
+            item['reviews_avg'] = agg['avg']
 
 
     from ..utils.component_renderer import render_component_list
@@ -309,6 +277,8 @@ def product_detail(request, product_id):
     
     return render(request, 'storefront/partials/mainstore/product_detail.html', context)
 
+@anonymous_page_cache(listing=True)
+@conditional_page(_category_version)
 def category_view(request, category_name):
     subdomain = getattr(request, 'subdomain', None)
     if not subdomain:
@@ -316,45 +286,28 @@ def category_view(request, category_name):
 
     supabase = get_supabase_client()
     
-    biz_response = supabase.table('business_profiles').select('*').eq('domain', subdomain).execute()
-    if not biz_response.data:
+    business_data = get_tenant(request)
+    if not business_data:
         raise Http404("Shop not found")
-    business_data = biz_response.data[0]
     business_id = business_data.get('id')
 
-    # Normalize components for theme detection
-    components_raw = business_data.get('components', [])
-    if isinstance(components_raw, str):
-        try: components_raw = json.loads(components_raw) or []
-        except: components_raw = []
-    
-    business_data['components'] = [normalize_component_data(c) for c in components_raw if isinstance(c, dict)]
+    # Normalized components for theme detection (cached per business version)
+    business_data['components'] = get_prepared_components(business_data)['components']
     
     # Get Theme
     theme_component = get_theme_component(business_data)
 
+    tag_page(request, 'categories')
     cat_resp = supabase.table('categories').select('id').ilike('name', category_name).execute()
     
     products = []
     if cat_resp.data:
         cat_id = cat_resp.data[0]['id']
-        posts_resp = supabase.table('posts').select('*').eq('business_id', business_id).eq('category_id', cat_id).execute()
+        posts_resp = supabase.table('posts').select(PRODUCT_CARD).eq('business_id', business_id).eq('category_id', cat_id).execute()
 
         for post in posts_resp.data:
-            post_data = post.get('data', {})
-            img = post_data.get('thumbnailUrl') or post_data.get('imageUrl')
-            if post_data.get('images') and len(post_data['images']) > 0:
-                first = post_data['images'][0]
-                img = first.get('url') if isinstance(first, dict) else first
-            
-            products.append({
-                'id': post['id'],
-                'name': post_data.get('productName', 'Untitled'),
-                'price': post_data.get('productPrice', 0),
-                'currency': validate_currency(post_data.get('productCurrency')),  # ✅ VALIDATED
-                'image_url': img,
-                'video_url': post_data.get('videoUrl'),
-            })
+            products.append(product_card(post, validate_currency=validate_currency))  # ✅ VALIDATED
+        tag_products(request, [p['id'] for p in products])
 
     context = {
         'business': business_data,
@@ -378,20 +331,15 @@ def create_order(request, product_id):
 
     supabase = get_supabase_client()
 
-    # Fetch Business with error handling
-    try:
-        biz_response = supabase.table('business_profiles').select('*').eq('domain', subdomain).execute()
-        if not biz_response.data:
-            raise Http404("Shop not found")
-        business_data = biz_response.data[0]
-        business_id = business_data.get('id')
-    except Exception as e:
-        logger.error(f"Error fetching business: {e}")
+    # Business (resolved once per request by SubdomainMiddleware)
+    business_data = get_tenant(request)
+    if not business_data:
         raise Http404("Shop not found")
+    business_id = business_data.get('id')
 
     # Fetch Product with error handling
     try:
-        prod_response = supabase.table('posts').select('*').eq('id', str(product_id)).execute()
+        prod_response = supabase.table('posts').select(PRODUCT_DETAIL).eq('id', str(product_id)).execute()
         if not prod_response.data:
             raise Http404("Product not found")
         post = prod_response.data[0]
@@ -400,22 +348,13 @@ def create_order(request, product_id):
         logger.error(f"Error fetching product {product_id}: {e}")
         raise Http404("Product not found")
 
-    # Images logic for preview
-    images_raw = post_data.get('images') or []
-    display_image = None
-    if isinstance(images_raw, list) and images_raw:
-        first = images_raw[0]
-        display_image = first.get('url') if isinstance(first, dict) else first
-    if not display_image:
-        display_image = post_data.get('thumbnailUrl') or post_data.get('imageUrl')
-
     product = {
         'id': post.get('id'),
         'name': post_data.get('productName', 'Untitled'),
         'description': post_data.get('textContent', ''),
         'price': post_data.get('productPrice', 0),
         'currency': validate_currency(post_data.get('productCurrency')),  # ✅ VALIDATED
-        'image_url': display_image,
+        'image_url': product_image(post),
         'category_id': post.get('category_id'),
     }
 
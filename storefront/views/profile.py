@@ -1,5 +1,7 @@
 from django.shortcuts import render, redirect
 from ..client import get_supabase_client
+from ..projections import BUSINESS_FULL, PRODUCT_CARD, USER_SESSION, project
+from ..utils.product_cards import product_card, product_currency, product_image, product_name
 from .auth import _get_business_context
 import logging
 
@@ -18,9 +20,9 @@ def profile_view(request):
     # 1. User Profile Data
     user_data = {}
     try:
-        u_res = supabase.table('nexususers').select('*').eq('id', uid).execute()
+        u_res = supabase.table('nexususers').select(USER_SESSION).eq('id', uid).execute()
         if u_res.data:
-            user_data = u_res.data[0]
+            user_data = project(u_res.data[0], USER_SESSION)
             logger.debug(f"Profile View: Found nexususer record for {uid}")
         else:
             user_data = {'name': 'Nexus User', 'email': request.session.get('user_email')}
@@ -46,9 +48,9 @@ def profile_view(request):
             # Map products
             p_map = {}
             if product_ids:
-                p_res = supabase.table('posts').select('id, data').in_('id', product_ids).execute()
+                p_res = supabase.table('posts').select(PRODUCT_CARD).in_('id', product_ids).execute()
                 for p in p_res.data:
-                    p_map[p['id']] = p.get('data', {})
+                    p_map[p['id']] = p
                 logger.debug(f"Profile View: Found {len(p_res.data)} product records in 'posts'")
             
             # Map businesses
@@ -60,10 +62,10 @@ def profile_view(request):
                 logger.debug(f"Profile View: Found {len(b_res.data)} business records")
 
             for o in orders:
-                p_data = p_map.get(o['product_id'], {})
-                o['product_name'] = p_data.get('productName', 'Untitled Product')
-                o['product_image'] = p_data.get('thumbnailUrl') or p_data.get('imageUrl')
-                o['product_currency'] = p_data.get('productCurrency', 'UGX')
+                p = p_map.get(o['product_id'], {})
+                o['product_name'] = product_name(p, default='Untitled Product')
+                o['product_image'] = product_image(p)
+                o['product_currency'] = product_currency(p)
                 
                 biz = b_map.get(o['business_id'], {})
                 o['business_name'] = biz.get('business_name', 'Official Store')
@@ -80,26 +82,9 @@ def profile_view(request):
         logger.debug(f"Profile View: Found {len(w_ids)} wishlist IDs for user {uid}")
         
         if w_ids:
-            p_res = supabase.table('posts').select('*').in_('id', w_ids).execute()
-            for p in p_res.data:
-                p_data = p.get('data', {})
-                
-                # Robust image logic
-                display_image = None
-                img_list = p_data.get('images', [])
-                if isinstance(img_list, list) and img_list:
-                    first = img_list[0]
-                    display_image = first.get('url') if isinstance(first, dict) else first
-                if not display_image:
-                    display_image = p_data.get('thumbnailUrl') or p_data.get('imageUrl')
-
-                wishes.append({
-                    'id': p['id'],
-                    'name': p_data.get('productName', 'Untitled Product'),
-                    'price': p_data.get('productPrice', 0),
-                    'currency': p_data.get('productCurrency', 'UGX'),
-                    'image_url': display_image
-                })
+            p_res = supabase.table('posts').select(PRODUCT_CARD).in_('id', w_ids).execute()
+            for p in project(p_res.data, PRODUCT_CARD):
+                wishes.append(product_card(p, default_name='Untitled Product'))
             logger.debug(f"Profile View: Successfully hydrated {len(wishes)} wishlist items")
     except Exception as e:
         logger.error(f"Wishlist hydration error: {e}")
@@ -110,23 +95,14 @@ def profile_view(request):
     # If no store branding (e.g. on main domain), check if current user has their own business theme
     if not business_ctx or not business_ctx.get('theme_component'):
         try:
-            from .shop import normalize_component_data
-            b_res = supabase.table('business_profiles').select('*').eq('user_id', uid).execute()
+            from ..utils.component_cache import get_prepared_components
+            b_res = supabase.table('business_profiles').select(BUSINESS_FULL).eq('user_id', uid).execute()
             if b_res.data:
                 biz = b_res.data[0]
-                comps = biz.get('components', [])
-                if isinstance(comps, str):
-                    import json
-                    try: comps = json.loads(comps) or []
-                    except: comps = []
-                
-                # Normalize and find theme
-                for c in comps:
-                    normalized = normalize_component_data(c)
-                    if normalized.get('clean_type') == 'webtheme':
-                        biz['theme_component'] = normalized
-                        business_ctx = biz
-                        break
+                theme = get_prepared_components(biz)['theme']
+                if theme:
+                    biz['theme_component'] = theme
+                    business_ctx = biz
         except Exception as be:
             logger.error(f"User business theme fetch error: {be}")
 
@@ -11,6 +11,9 @@ from django.shortcuts import render
 from django.http import Http404
 from django.views.decorators.http import condition
 from ..client import get_supabase_client
+from ..projections import BUSINESS_PROFILE, PRODUCT_CARD, USER_PUBLIC, project
+from ..utils.product_cards import product_card
+from ..utils.conditional import PageVersion, conditional_page
 
 logger = logging.getLogger(__name__)
 
@@ -161,6 +164,17 @@ def build_json_ld_schema(schema_type, data):
     return base_schema
 
 
+def _row_version(table, columns, timestamp_column='updated_at'):
+    """Version function for a detail page rendered from one row, looked up by id."""
+    def version(request, row_id):
+        response = get_supabase().table(table).select(columns).eq('id', row_id).execute()
+        if not response.data:
+            return None
+        return PageVersion().add_row(response.data[0], timestamp_column)
+    return version
+
+
+@conditional_page(_row_version('community_posts', 'id,updated_at,reply_count'))
 def community_detail_view(request, post_id):
     """
     Community Question/Post Detail Page
@@ -197,6 +211,13 @@ def community_detail_view(request, post_id):
         raise Http404("Post not found")
 
 
+# No updated_at on these tables: hash the columns the page shows, ETag only.
+# view_count (and the search vector) change without anything visible changing.
+LOST_FOUND_VERSION = 'id,title,description,category,image_url,status,item_date,location_name,contact_value,created_at'
+SWAP_VERSION = 'id,title,description,condition,image_urls,want_title,location_name,created_at'
+
+
+@conditional_page(_row_version('lost_found_items', LOST_FOUND_VERSION, timestamp_column=None))
 def lost_found_detail_view(request, item_id):
     """
     Lost & Found Item Detail Page
@@ -233,6 +254,7 @@ def lost_found_detail_view(request, item_id):
         raise Http404("Item not found")
 
 
+@conditional_page(_row_version('swap_items', SWAP_VERSION, timestamp_column=None))
 def swap_detail_view(request, swap_id):
     """
     Swap/Exchange Item Detail Page
@@ -284,12 +306,12 @@ def user_profile_view(request, username):
         supabase = get_supabase()
         
         # Fetch the user by slug (username equivalent in nexususers table)
-        response = supabase.table('nexususers').select('*').eq('slug', username).single().execute()
+        response = supabase.table('nexususers').select(USER_PUBLIC).eq('slug', username).single().execute()
         
         if not response.data:
             raise Http404("User not found")
         
-        user = response.data
+        user = project(response.data, USER_PUBLIC)
         user_id = user.get('id')
         
         # Fetch community posts from this user
@@ -326,17 +348,17 @@ def business_profile_view(request, business_slug):
         supabase = get_supabase()
         
         # Fetch the business by slug
-        response = supabase.table('business_profiles').select('*').eq('slug', business_slug).single().execute()
+        response = supabase.table('business_profiles').select(BUSINESS_PROFILE).eq('slug', business_slug).single().execute()
         
         if not response.data:
             raise Http404("Business not found")
         
-        business = response.data
+        business = project(response.data, BUSINESS_PROFILE)
         business_id = business.get('id')
         
         # Fetch business products (posts associated with this business)
-        products_response = supabase.table('posts').select('*').eq('business_id', business_id).limit(12).execute()
-        products = products_response.data or []
+        products_response = supabase.table('posts').select(PRODUCT_CARD).eq('business_id', business_id).limit(12).execute()
+        products = [product_card(p) for p in project(products_response.data or [], PRODUCT_CARD)]
         
         # Build SEO context
         schema = build_json_ld_schema('LocalBusiness', business)
@@ -368,8 +390,8 @@ def category_list_view(request, category_name):
         supabase = get_supabase()
         
         # Fetch items in category
-        response = supabase.table('posts').select('*').eq('category', category_name).execute()
-        items = response.data or []
+        response = supabase.table('posts').select(PRODUCT_CARD).eq('category', category_name).execute()
+        items = [product_card(p) for p in project(response.data or [], PRODUCT_CARD)]
         
         # Build BreadcrumbList schema
         breadcrumb_schema = {
@@ -402,8 +424,8 @@ def category_list_view(request, category_name):
                     "position": idx + 1,
                     "item": {
                         "@type": "Product",
-                        "name": item.get('title', item.get('productName', '')),
-                        "image": item.get('image', ''),
+                        "name": item['name'],
+                        "image": item['image_url'] or '',
                         "url": f"https://nexassearch.com/product/{item.get('id', '')}/",
                     }
                 }
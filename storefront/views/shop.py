@@ -1,9 +1,21 @@
-import json
 import logging
+from urllib.parse import urlencode
+from django.conf import settings
 from django.shortcuts import render, redirect
-from django.http import Http404
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
 from ..client import get_supabase_client
+from ..tenants import get_tenant
+from ..projections import BUSINESS_HEADER, PRODUCT_CARD, project
 from ..utils.component_renderer import render_component_list 
+from ..utils.component_cache import get_prepared_components
+from ..utils.fanout import fan_out
+from ..utils.page_cache import anonymous_page_cache, tag_page, tag_products
+from ..utils.conditional import PageVersion, add_shop, conditional_page
+from ..utils.product_cards import product_card
+from ..utils.pagination import decode_cursor, encode_cursor, fetch_page
+from ..utils.ratings import business_rating
 
 
 logger = logging.getLogger(__name__)
@@ -71,6 +83,73 @@ def normalize_component_data(component):
             
     return component
 
+def _products_query(supabase, business_id, search_query='', category_id=None, category=None):
+    """Unexecuted card query for a shop's grid, optionally narrowed to one category."""
+    query = supabase.table('posts')\
+        .select(PRODUCT_CARD.extend('categories(name)'))\
+        .eq('business_id', business_id)
+    if search_query:
+        query = query.ilike('data->>productName', f"%{search_query}%")
+    if category_id:
+        query = query.eq('category_id', category_id)
+    elif category:
+        # Legacy posts only carry the category name inside their JSON
+        query = query.eq('data->category->>name', category)
+    return query
+
+
+def _more_url(cursor, search_query='', category_id=None, category=None):
+    params = {'cursor': cursor}
+    if category_id:
+        params['category_id'] = category_id
+    elif category:
+        params['category'] = category
+    if search_query:
+        params['q'] = search_query
+    return f"{reverse('shop_products_more')}?{urlencode(params)}"
+
+
+def _product_sections(posts, has_more, search_query=''):
+    """
+    Group a page of posts into category sections, in first-seen order.
+
+    When more pages exist each section gets a `more_url` that continues that
+    category after its last card: every newer product of the category is
+    already on this page, so a per-category keyset page picks up exactly there.
+    """
+    sections = {}
+    for post in posts:
+        card = product_card(post)
+        name = card['category'].title()
+        section = sections.get(name)
+        if section is None:
+            section = sections[name] = {'name': name, 'products': [], 'category_id': None, 'category': None}
+        section['products'].append(card)
+        section['last'] = post
+        if post.get('category_id'):
+            section['category_id'] = post['category_id']
+        elif not section['category']:
+            section['category'] = post.get('categoryName')
+
+    for section in sections.values():
+        last = section.pop('last')
+        section['more_url'] = _more_url(
+            encode_cursor(last), search_query=search_query,
+            category_id=section['category_id'], category=section['category'],
+        ) if has_more else None
+    return list(sections.values())
+
+
+def _shop_version(request):
+    """ETag/Last-Modified inputs for a shop's home page (the landing page has none)."""
+    business = get_tenant(request) if getattr(request, 'subdomain', None) else None
+    if not business:
+        return None
+    return add_shop(PageVersion(), get_supabase_client(), business)
+
+
+@anonymous_page_cache(shell=True, listing=True)
+@conditional_page(_shop_version)
 def shop_home(request):
     subdomain = getattr(request, 'subdomain', None)
     
@@ -78,38 +157,31 @@ def shop_home(request):
     if not subdomain:
         supabase = get_supabase_client()
         
-        # Fetch all businesses (both verified and unverified)
-        businesses_response = supabase.table('business_profiles').select('*').order('created_at', desc=True).execute()
-        businesses = businesses_response.data or []
-        
+        # The four landing queries are independent: run them concurrently.
+        # Businesses are required; the side panels degrade to empty lists.
+        results = fan_out(
+            {
+                # All businesses (both verified and unverified)
+                'businesses': lambda: project(supabase.table('business_profiles').select(BUSINESS_HEADER).order('created_at', desc=True).execute().data or [], BUSINESS_HEADER),
+                # Trending news (latest 4 articles)
+                'trending news': lambda: supabase.table('news_articles').select('*, news_authors(name, avatar_url, is_verified)').order('published_at', desc=True).limit(4).execute().data or [],
+                # Lost items (latest 4)
+                'lost items': lambda: supabase.table('lost_found_items').select('*').order('created_at', desc=True).limit(4).execute().data or [],
+                # Community posts (latest 4)
+                'community posts': lambda: supabase.table('community_posts').select('*, nexususers!community_posts_nexususers_fkey(name, avatar_url)').order('created_at', desc=True).limit(4).execute().data or [],
+            },
+            defaults={'trending news': [], 'lost items': [], 'community posts': []},
+        )
+        businesses = results['businesses']
+        trending_news = results['trending news']
+        tag_page(request, 'news')
+        lost_items = results['lost items']
+        community_posts = results['community posts']
+
         # Separate verified and unverified
         verified_businesses = [b for b in businesses if b.get('is_verified', False)]
         unverified_businesses = [b for b in businesses if not b.get('is_verified', False)]
         
-        # Fetch trending news (latest 4 articles)
-        try:
-            news_response = supabase.table('news_articles').select('*, news_authors(name, avatar_url, is_verified)').order('published_at', desc=True).limit(4).execute()
-            trending_news = news_response.data or []
-        except Exception as e:
-            logger.warning(f"Could not fetch trending news: {e}")
-            trending_news = []
-        
-        # Fetch lost items (latest 4)
-        try:
-            lost_items_response = supabase.table('lost_found_items').select('*').order('created_at', desc=True).limit(4).execute()
-            lost_items = lost_items_response.data or []
-        except Exception as e:
-            logger.warning(f"Could not fetch lost items: {e}")
-            lost_items = []
-        
-        # Fetch community posts (latest 4)
-        try:
-            community_response = supabase.table('community_posts').select('*, nexususers!community_posts_nexususers_fkey(name, avatar_url)').order('created_at', desc=True).limit(4).execute()
-            community_posts = community_response.data or []
-        except Exception as e:
-            logger.warning(f"Could not fetch community posts: {e}")
-            community_posts = []
-        
         context = {
             'verified_businesses': verified_businesses,
             'unverified_businesses': unverified_businesses,
@@ -124,86 +196,34 @@ def shop_home(request):
     supabase = get_supabase_client()
     search_query = request.GET.get('q', '').strip()
 
-    # 1. Fetch Business Profile
-    response = supabase.table('business_profiles').select('*').eq('domain', subdomain).execute()
-    if not response.data:
+    # 1. Business Profile (resolved once per request by SubdomainMiddleware)
+    business_data = get_tenant(request)
+    if not business_data:
         raise Http404(f"Shop '{subdomain}' not found.")
 
-    business_data = response.data[0]
     business_id = business_data.get('id')
 
-    # 2. Fetch Products
-    posts_query = supabase.table('posts')\
-        .select('*, categories(name)')\
-        .eq('business_id', business_id)
+    # 2. Fetch Products (first keyset page; the rest loads through shop_products_more)
+    posts_query = _products_query(supabase, business_id, search_query)
 
-    if search_query:
-        posts_query = posts_query.ilike('data->>productName', f"%{search_query}%")
-        
-    posts_response = posts_query.order('created_at', desc=True).execute()
+    # The page is a shared shell: nothing here reads the session. The user
+    # chip, wishlist hearts and order badge come from /_fragments/.
+    posts, next_cursor = fetch_page(posts_query, None, settings.SHOP_PAGE_SIZE)
+    tag_products(request, [p.get('id') for p in posts])
+    tag_page(request, 'categories')
 
     # --- PROCESS PRODUCTS ---
-    products_by_category = {}
-    for post in posts_response.data:
-        post_data = post.get('data', {})
-        
-        # Category Logic
-        cat_linked = post.get('categories') 
-        if cat_linked and isinstance(cat_linked, dict):
-             cat_name = cat_linked.get('name', 'General')
-        else:
-            cat_info = post_data.get('category')
-            cat_name = cat_info.get('name', 'General') if isinstance(cat_info, dict) else 'General'
-        
-        cat_name = cat_name.title()
-
-        # Image Logic
-        display_image = None
-        images_list = post_data.get('images', [])
-        if images_list and isinstance(images_list, list) and len(images_list) > 0:
-            first = images_list[0]
-            display_image = first.get('url') if isinstance(first, dict) else str(first)
-        if not display_image: display_image = post_data.get('thumbnailUrl')
-        if not display_image: display_image = post_data.get('imageUrl')
-
-        p_name = post_data.get('productName') or post_data.get('name') or post_data.get('title') or 'Untitled'
-        
-        product_obj = {
-            'id': post.get('id'),
-            'name': p_name, 
-            'productName': p_name,
-            'description': post_data.get('textContent', ''),
-            'price': post_data.get('productPrice', 0),
-            'currency': post_data.get('productCurrency', 'UGX'),
-            'image_url': display_image,
-        }
+    product_sections = _product_sections(posts, has_more=bool(next_cursor), search_query=search_query)
+    products_more_url = _more_url(next_cursor, search_query=search_query) if next_cursor else None
 
-        if cat_name not in products_by_category:
-            products_by_category[cat_name] = []
-        products_by_category[cat_name].append(product_obj)
-
-    # 3. Handle Business Components
-    components_raw = business_data.get('components')
-    biz_components = []
-    
-    if isinstance(components_raw, str):
-        try:
-            biz_components = json.loads(components_raw) or []
-        except: 
-            biz_components = []
-    elif isinstance(components_raw, list):
-        biz_components = components_raw
-
-    # Normalize EVERY component (including those inside tabs)
-    biz_components = [normalize_component_data(c) for c in biz_components if isinstance(c, dict)]
-
-    # Separate Components for layout
-    hero_component = next((c for c in biz_components if c.get('clean_type') == 'hero'), None)
-    tab_component = next((c for c in biz_components if c.get('clean_type') == 'tabbedcontent'), None)
-    theme_component = next((c for c in biz_components if c.get('clean_type') == 'webtheme'), None)
+    # 3. Business Components (normalized once per business version, see utils/component_cache.py)
+    prepared = get_prepared_components(business_data)
+    hero_component = prepared['hero']
+    tab_component = prepared['tabs']
+    theme_component = prepared['theme']
     
     # Everything else goes into the main stack
-    other_components = [c for c in biz_components if c.get('clean_type') not in ['hero', 'tabbedcontent', 'webtheme']]
+    other_components = prepared['other']
 
 
     # Render components
@@ -212,15 +232,10 @@ def shop_home(request):
     tabs_html = render_component_list([tab_component], render_ctx) if tab_component else ""
     components_html = render_component_list(other_components, render_ctx)
 
-    # Fetch business reviews for aggregateRating
-    reviews_response = supabase.table('reviews').select('rating').eq('product_id', business_id).execute()
-    if reviews_response.data:
-        ratings = [r.get('rating', 0) for r in reviews_response.data]
-        business_data['reviews_count'] = len(ratings)
-        business_data['reviews_avg'] = sum(ratings) / len(ratings) if ratings else 0
-    else:
-        business_data['reviews_count'] = 0
-        business_data['reviews_avg'] = 0
+    # aggregateRating from the profile's denormalized columns (see utils/ratings.py)
+    rating = business_rating(business_data)
+    business_data['reviews_count'] = rating['count']
+    business_data['reviews_avg'] = rating['avg']
 
     context = {
         'business': business_data,
@@ -230,22 +245,13 @@ def shop_home(request):
         'tabs_html': tabs_html,
         'components': other_components,
         'components_html': components_html,
-        'products_by_category': products_by_category,
+        'product_sections': product_sections,
+        'products_more_url': products_more_url,
         'search_query': search_query,
         'theme_component': theme_component,
-        'user': {},  # Initialize empty user dict (will be populated if user is logged in)
+        'user': {},
+        'page_shell': True,
     }
-    
-    # If user is logged in, fetch their session data
-    user_id = request.session.get('user_id')
-    if user_id:
-        try:
-            user_res = supabase.table('nexususers').select('*').eq('id', user_id).execute()
-            if user_res.data:
-                context['user'] = user_res.data[0]
-        except Exception as e:
-            logger.warning(f"Could not fetch user data: {e}")
-            context['user'] = {'name': request.session.get('user_email', 'User')}
 
     # Breadcrumbs for structured data (Home -> Shop)
     context['breadcrumbs'] = [
@@ -253,4 +259,50 @@ def shop_home(request):
         {'name': business_data.get('business_name', 'Store'), 'url': request.build_absolute_uri()}
     ]
     
-    return render(request, 'storefront/shop_home.html', context) 
\ No newline at end of file
+    return render(request, 'storefront/shop_home.html', context) 
+
+
+def shop_products_more(request):
+    """
+    Next keyset page of a shop's product grid as JSON.
+
+    `cursor` comes from a previous page's `more_url`. With `category_id` (or a
+    legacy `category` name) the page stays within that category; without it the
+    page continues the whole grid. Each section carries the rendered cards
+    (`html`), the full section for categories not on the page yet
+    (`section_html`) and its own `more_url`.
+    """
+    business_data = get_tenant(request)
+    if not business_data:
+        raise Http404("Shop not found")
+
+    cursor = decode_cursor(request.GET.get('cursor'))
+    if not cursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    search_query = request.GET.get('q', '').strip()
+    category_id = request.GET.get('category_id') or None
+    category = request.GET.get('category') or None
+
+    supabase = get_supabase_client()
+    query = _products_query(supabase, business_data.get('id'), search_query, category_id, category)
+    posts, next_cursor = fetch_page(query, cursor, settings.SHOP_MORE_PAGE_SIZE)
+
+    sections = []
+    for section in _product_sections(posts, has_more=bool(next_cursor), search_query=search_query):
+        ctx = {'section': section, 'business': business_data}
+        sections.append({
+            'name': section['name'],
+            'more_url': section['more_url'],
+            'html': ''.join(
+                render_to_string('storefront/partials/mainstore/product_card.html',
+                                 {'product': product, 'business': business_data}, request=request)
+                for product in section['products']
+            ),
+            'section_html': render_to_string('storefront/partials/mainstore/product_section.html', ctx, request=request),
+        })
+
+    more_url = None
+    if next_cursor and not (category_id or category):
+        more_url = _more_url(next_cursor, search_query=search_query)
+    return JsonResponse({'sections': sections, 'more_url': more_url})
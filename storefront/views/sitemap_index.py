@@ -1,8 +1,8 @@
 import logging
 from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.views.decorators.cache import cache_page
+from ..utils.page_cache import shared_cache_page
 from ..client import get_supabase_client
+from ..utils.sitemap_xml import SitemapIndexWriter
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -20,7 +20,7 @@ def format_date(date_str):
         return datetime.now().strftime('%Y-%m-%d')
 
 
-@cache_page(60 * 60 * 6)  # Cache for 6 hours (21600 seconds) - less frequent than per-business sitemaps
+@shared_cache_page(60 * 60 * 6, listing=True)  # Cache for 6 hours (21600 seconds) - less frequent than per-business sitemaps
 def sitemap_index(request):
     """
     Generate sitemap index for all published business sitemaps.
@@ -44,7 +44,8 @@ def sitemap_index(request):
             .limit(50000)\
             .execute()
         
-        sitemaps = []
+        response = HttpResponse(content_type='application/xml; charset=utf-8')
+        writer = SitemapIndexWriter(response)
         latest_update = datetime.now()
         
         for biz in biz_response.data:
@@ -65,19 +66,13 @@ def sitemap_index(request):
                 except:
                     pass
             
-            sitemaps.append({
+            writer.add({
                 'loc': f"https://{domain}.nexassearch.com/sitemap.xml",
                 'lastmod': format_date(biz_updated),
             })
+        writer.close()
         
-        logger.info(f"Sitemap index includes {len(sitemaps)} business sitemaps")
-        
-        sitemap_index_xml = render_to_string('storefront/sitemap_index.xml', {
-            'sitemaps': sitemaps,
-            'now': datetime.now(),
-        })
-        
-        response = HttpResponse(sitemap_index_xml, content_type='application/xml; charset=utf-8')
+        logger.info(f"Sitemap index includes {writer.count} business sitemaps")
         
         # Smart caching: 6-hour browser cache + 1-day CDN cache
         response['Cache-Control'] = 'public, max-age=21600, s-maxage=86400, must-revalidate'
@@ -13,21 +13,32 @@ This approach:
 
 FALLBACK: If static sitemap not found (new business, not yet generated),
 falls back to dynamic generation from database with short-term cache.
+
+Business sitemaps are stored gzipped: `{subdomain}_sitemap.xml.gz` is the
+business's index of its shards `{subdomain}_sitemap_{n}.xml.gz`, served as
+/sitemap.xml and /sitemap-{n}.xml with `Content-Encoding: gzip`.
 """
 
+import gzip
 import os
-import json
 import logging
-from django.http import HttpResponse, Http404
-from django.views.decorators.http import condition
-from django.views.decorators.cache import cache_page
+import re
+from django.http import FileResponse, HttpResponse, Http404
+from ..utils.page_cache import shared_cache_page
 from django.conf import settings
-from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
 from ..client import get_supabase_client
+from ..tenants import get_tenant
+from ..projections import PRODUCT_SITEMAP
+from ..utils.product_cards import data_value, product_image_urls
+from ..utils.sitemap_xml import MAX_URLS, UrlsetWriter, write_sitemap_index
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+_accepts_gzip = re.compile(r'\bgzip\b')
+
 
 def format_date(date_str):
     """Format date to YYYY-MM-DD (Google sitemap standard)."""
@@ -41,13 +52,20 @@ def format_date(date_str):
         return datetime.now().strftime('%Y-%m-%d')
 
 
-def get_sitemap_file(subdomain=None):
+def _sitemaps_dir():
+    return os.path.join(settings.BASE_DIR, 'storefront', 'static', 'sitemaps')
+
+
+def get_sitemap_file(subdomain=None, shard=None):
     """Get the path to the sitemap file."""
-    sitemaps_dir = os.path.join(settings.BASE_DIR, 'storefront', 'static', 'sitemaps')
+    sitemaps_dir = _sitemaps_dir()
     
-    if subdomain:
-        # Business subdomain: {subdomain}_sitemap.xml
-        filename = f"{subdomain}_sitemap.xml"
+    if subdomain and shard:
+        # One shard of a business sitemap: {subdomain}_sitemap_{n}.xml.gz
+        filename = f"{subdomain}_sitemap_{int(shard)}.xml.gz"
+    elif subdomain:
+        # Business subdomain: index of its shards, {subdomain}_sitemap.xml.gz
+        filename = f"{subdomain}_sitemap.xml.gz"
     else:
         # Main domain: sitemap_index.xml
         filename = "sitemap_index.xml"
@@ -61,20 +79,30 @@ def get_sitemap_file(subdomain=None):
     return filepath if os.path.exists(filepath) else None
 
 
-def sitemap_last_modified(request, subdomain=None):
-    """Return the last modified time of the sitemap file."""
-    filepath = get_sitemap_file(subdomain)
-    
-    if not filepath:
-        return None
-    
+def _gzip_file_response(request, filepath):
+    """
+    Serve a pre-gzipped sitemap as is, with `Content-Encoding: gzip`.
+
+    Clients that don't accept gzip get it decompressed. Returns None if the
+    file can't be read.
+    """
     try:
-        return os.path.getmtime(filepath)
-    except (OSError, IOError):
+        if _accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response = FileResponse(open(filepath, 'rb'), content_type='application/xml; charset=utf-8')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            with gzip.open(filepath, 'rb') as f:
+                response = HttpResponse(f.read(), content_type='application/xml; charset=utf-8')
+        response['Last-Modified'] = http_date(os.path.getmtime(filepath))
+    except (OSError, EOFError) as e:
+        logger.error(f'Error reading sitemap {filepath}: {str(e)}')
         return None
+    response['Cache-Control'] = 'public, max-age=86400, must-revalidate'  # 24 hours for static
+    response['X-Sitemap-Generated'] = 'static'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
 
 
-@cache_page(60 * 60)  # Cache for 1 hour (shorter for dynamic fallback)
 def sitemap_products(request, subdomain=None):
     """
     Serve sitemap.xml for business subdomain.
@@ -82,12 +110,13 @@ def sitemap_products(request, subdomain=None):
     Call: GET /sitemap.xml (when on subdomain like alice.nexassearch.com)
     
     Two-tier approach:
-    1. **STATIC** (preferred): Serve pre-generated XML file (24-hour cache, no DB queries)
+    1. **STATIC** (preferred): Serve the pre-generated, pre-gzipped index of the
+       business's shards (24-hour cache, no DB queries)
     2. **DYNAMIC FALLBACK**: Generate on-the-fly for new businesses not yet in static cache
     
     Performance:
-    - Static: No database queries, instant response
-    - Fallback: Database query only for new businesses, 1-hour cache
+    - Static: No database queries, bytes sent straight from disk (the file is its own cache)
+    - Fallback: Database query only for new businesses, 1-hour shared page cache
     - Both: CDN-friendly with proper cache headers
     """
     from django.http import HttpResponsePermanentRedirect
@@ -101,26 +130,34 @@ def sitemap_products(request, subdomain=None):
     filepath = get_sitemap_file(subdomain)
     
     if filepath:
-        # Static sitemap found - serve it
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            return HttpResponse(
-                content,
-                content_type='application/xml; charset=utf-8',
-                headers={
-                    'Cache-Control': 'public, max-age=86400, must-revalidate',  # 24 hours for static
-                    'X-Sitemap-Generated': 'static',
-                }
-            )
-        except IOError as e:
-            logger.error(f'Error reading sitemap {filepath}: {str(e)}')
-            # Fall through to dynamic generation
+        response = _gzip_file_response(request, filepath)
+        if response is not None:
+            return response
+        # Unreadable: fall through to dynamic generation
     
     # Static not found - generate dynamically for new businesses
     logger.info(f'Static sitemap not found for {subdomain}, falling back to dynamic generation')
-    return generate_dynamic_sitemap(request, subdomain)
+    return dynamic_sitemap(request)
+
+
+@shared_cache_page(60 * 60, listing=True)  # Cache for 1 hour (shorter for dynamic fallback)
+def dynamic_sitemap(request):
+    return generate_dynamic_sitemap(request, getattr(request, 'subdomain', None))
+
+
+def sitemap_shard(request, number):
+    """
+    Serve /sitemap-{n}.xml: one pre-gzipped shard of a business sitemap.
+
+    Shards only exist as static files (listed by the business's /sitemap.xml
+    and the master index); there is no dynamic fallback.
+    """
+    subdomain = getattr(request, 'subdomain', None)
+    filepath = get_sitemap_file(subdomain, shard=number) if subdomain and number > 0 else None
+    response = _gzip_file_response(request, filepath) if filepath else None
+    if response is None:
+        raise Http404('Sitemap not found')
+    return response
 
 
 def generate_dynamic_sitemap(request, subdomain):
@@ -135,30 +172,36 @@ def generate_dynamic_sitemap(request, subdomain):
     try:
         supabase = get_supabase_client()
         
-        # Fetch business
-        biz_response = supabase.table('business_profiles')\
-            .select('*')\
-            .eq('domain', subdomain)\
-            .execute()
+        # Business (resolved once per request by SubdomainMiddleware)
+        business = get_tenant(request)
         
-        if not biz_response.data:
+        if not business:
             raise Http404(f"Business '{subdomain}' not found")
-        
-        business = biz_response.data[0]
         business_id = business.get('id')
         
-        # Fetch products
+        # Fetch products: one sitemap file holds MAX_URLS including the homepage.
+        # The static generator shards instead; this fallback only covers new shops.
         posts_response = supabase.table('posts')\
-            .select('id,data,created_at,updated_at')\
+            .select(PRODUCT_SITEMAP)\
             .eq('business_id', business_id)\
             .order('updated_at', desc=True)\
-            .limit(50000)\
+            .limit(MAX_URLS - 1)\
             .execute()
+        if len(posts_response.data) >= MAX_URLS - 1:
+            logger.warning(f'Dynamic sitemap for {subdomain} truncated at {MAX_URLS} URLs')
         
-        urls = []
+        # Entries are written straight into the response as they are built
+        response = HttpResponse(
+            content_type='application/xml; charset=utf-8',
+            headers={
+                'Cache-Control': 'public, max-age=3600, must-revalidate',  # 1 hour for dynamic fallback
+                'X-Sitemap-Generated': 'dynamic-fallback',
+            }
+        )
+        writer = UrlsetWriter(response)
         
         # Add homepage
-        urls.append({
+        writer.add({
             'loc': request.build_absolute_uri('/'),
             'lastmod': format_date(business.get('updated_at')),
             'changefreq': 'weekly',
@@ -168,27 +211,18 @@ def generate_dynamic_sitemap(request, subdomain):
         
         # Add products
         for post in posts_response.data:
-            post_data = post.get('data', {})
-            if isinstance(post_data, str):
-                post_data = json.loads(post_data)
-            
             product_url = request.build_absolute_uri(f'/product/{post["id"]}/')
             
             # Extract images
-            images = []
-            images_list = post_data.get('images', [])
-            if images_list and isinstance(images_list, list):
-                for idx, img in enumerate(images_list[:3]):
-                    img_url = img.get('url') if isinstance(img, dict) else str(img)
-                    if img_url and img_url.startswith('http'):
-                        images.append({
-                            'loc': img_url,
-                            'title': f"{post_data.get('productName', 'Product')} - Image {idx+1}",
-                        })
+            name = data_value(post, 'productName', 'Product')
+            images = [
+                {'loc': img_url, 'title': f"{name} - Image {idx+1}"}
+                for idx, img_url in enumerate(product_image_urls(post, limit=3))
+            ]
             
             lastmod = post.get('updated_at') or post.get('created_at')
             
-            urls.append({
+            writer.add({
                 'loc': product_url,
                 'lastmod': format_date(lastmod),
                 'changefreq': 'weekly',
@@ -196,18 +230,11 @@ def generate_dynamic_sitemap(request, subdomain):
                 'images': images,
             })
         
-        sitemap_xml = render_to_string('storefront/sitemap.xml', {'urls': urls})
+        writer.close()
         
-        logger.info(f'Dynamically generated sitemap for {subdomain} with {len(urls)} URLs')
+        logger.info(f'Dynamically generated sitemap for {subdomain} with {writer.count} URLs')
         
-        return HttpResponse(
-            sitemap_xml,
-            content_type='application/xml; charset=utf-8',
-            headers={
-                'Cache-Control': 'public, max-age=3600, must-revalidate',  # 1 hour for dynamic fallback
-                'X-Sitemap-Generated': 'dynamic-fallback',
-            }
-        )
+        return response
     
     except Http404:
         raise
@@ -216,7 +243,7 @@ def generate_dynamic_sitemap(request, subdomain):
         raise Http404(f"Error generating sitemap for {subdomain}: {str(e)}")
 
 
-@cache_page(60 * 60)  # Cache for 1 hour (shorter for fallback)
+@shared_cache_page(60 * 60, listing=True)  # Cache for 1 hour (shorter for fallback)
 def sitemap_index(request):
     """
     Serve sitemap_index.xml from main domain.
@@ -278,28 +305,26 @@ def generate_dynamic_sitemap_index(request):
             .limit(50000)\
             .execute()
         
-        sitemaps = []
-        for biz in biz_response.data:
-            if biz.get('domain'):
-                sitemaps.append({
-                    'loc': f"https://{biz['domain']}.nexassearch.com/sitemap.xml",
-                    'lastmod': format_date(biz.get('updated_at')),
-                })
-        
-        sitemap_index_xml = render_to_string('storefront/sitemap_index.xml', {
-            'sitemaps': sitemaps,
-        })
-        
-        logger.info(f'Dynamically generated sitemap index with {len(sitemaps)} business sitemaps')
+        sitemaps = (
+            {
+                'loc': f"https://{biz['domain']}.nexassearch.com/sitemap.xml",
+                'lastmod': format_date(biz.get('updated_at')),
+            }
+            for biz in biz_response.data if biz.get('domain')
+        )
         
-        return HttpResponse(
-            sitemap_index_xml,
+        response = HttpResponse(
             content_type='application/xml; charset=utf-8',
             headers={
                 'Cache-Control': 'public, max-age=3600, must-revalidate',  # 1 hour for dynamic fallback
                 'X-Sitemap-Generated': 'dynamic-fallback',
             }
         )
+        count = write_sitemap_index(response, sitemaps)
+        
+        logger.info(f'Dynamically generated sitemap index with {count} business sitemaps')
+        
+        return response
     
     except Exception as e:
         logger.exception(f'Error generating dynamic sitemap index: {e}')
@@ -313,27 +338,35 @@ def serve_sitemap_file(request, filename):
     to the same Django host and serving sitemaps without touching the
     frontend repo or external storage.
     """
-    # Basic filename validation: only allow xml and json files, no traversal
+    # Basic filename validation: only allow xml, gzipped xml and json files, no traversal
     if '..' in filename or '/' in filename or '\\' in filename:
         raise Http404('Invalid filename')
 
-    allowed_ext = ('.xml', '.json')
+    allowed_ext = ('.xml', '.xml.gz', '.json')
     if not filename.lower().endswith(allowed_ext):
         raise Http404('Unsupported file type')
 
-    sitemaps_dir = os.path.join(settings.BASE_DIR, 'storefront', 'static', 'sitemaps')
+    sitemaps_dir = _sitemaps_dir()
     filepath = os.path.join(sitemaps_dir, filename)
 
     if not os.path.exists(filepath):
         raise Http404('Sitemap not found')
 
     try:
-        with open(filepath, 'rb') as f:
-            data = f.read()
-
+        # Streamed from disk in blocks rather than read whole (files reach tens of MB)
+        if filename.lower().endswith('.gz'):
+            # Downloaded as the .gz file it is (crawlers fetch sitemap.xml.gz as gzip)
+            return FileResponse(
+                open(filepath, 'rb'),
+                content_type='application/gzip',
+                headers={
+                    'Cache-Control': 'public, max-age=86400, must-revalidate',
+                    'X-Sitemap-Generated': 'static-file',
+                }
+            )
         content_type = 'application/xml' if filename.lower().endswith('.xml') else 'application/json'
-        return HttpResponse(
-            data,
+        return FileResponse(
+            open(filepath, 'rb'),
             content_type=content_type + '; charset=utf-8' if 'xml' in content_type else content_type,
             headers={
                 'Cache-Control': 'public, max-age=86400, must-revalidate',
@@ -5,6 +5,7 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from ..client import get_supabase_client
+from ..projections import WISHLIST_ENTRY
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +37,7 @@ def toggle_wishlist(request, product_id):
             }, status=404)
         
         # Check if already in wishlist
-        existing = supabase.table('wishlists').select('*').eq('user_id', user_id).eq('product_id', str(product_id)).execute()
+        existing = supabase.table('wishlists').select(WISHLIST_ENTRY).eq('user_id', user_id).eq('product_id', str(product_id)).execute()
         
         if existing.data:
             # Remove from wishlist
@@ -78,7 +79,7 @@ def check_wishlist_status(request, product_id):
     
     try:
         supabase = get_supabase_client()
-        result = supabase.table('wishlists').select('*').eq('user_id', user_id).eq('product_id', str(product_id)).execute()
+        result = supabase.table('wishlists').select(WISHLIST_ENTRY).eq('user_id', user_id).eq('product_id', str(product_id)).execute()
         
         return JsonResponse({
             'in_wishlist': len(result.data) > 0
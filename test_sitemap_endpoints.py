@@ -12,7 +12,8 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 django.setup()
 
 from django.test import RequestFactory
-from storefront.views.sitemap import sitemap_products, sitemap_businesses
+from storefront.views.sitemap import sitemap_businesses
+from storefront.views.sitemap_static import sitemap_products
 from core.middleware import SubdomainMiddleware
 
 # Create test factory
@@ -14,7 +14,8 @@ django.setup()
 
 # Test imports
 try:
-    from storefront.views.sitemap import sitemap_products, sitemap_businesses
+    from storefront.views.sitemap import sitemap_businesses
+    from storefront.views.sitemap_static import sitemap_products
     print("✅ SUCCESS: Both sitemap views import correctly")
     print(f"   - sitemap_products function: {sitemap_products.__name__}")
     print(f"   - sitemap_businesses function: {sitemap_businesses.__name__}")